@@ -0,0 +1,538 @@
+import json
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+# Options understood by adblockparser. Rules carrying any other option are
+# dropped, exactly like AdblockRules(skip_unsupported_rules=True) does, so the
+# engine's decisions stay comparable with the old matcher.
+TYPE_OPTIONS = frozenset([
+    'script', 'image', 'stylesheet', 'object', 'xmlhttprequest', 'object-subrequest',
+    'subdocument', 'document', 'elemhide', 'other', 'background', 'xbl', 'ping',
+    'dtd', 'media', 'websocket',
+])
+SUPPORTED_OPTIONS = TYPE_OPTIONS | frozenset(['third-party', 'match-case', 'domain'])
+
+DEFAULT_LIST_URL = 'https://easylist.to/easylist/easylist.txt'
+# EasyList itself declares "Expires: 4 days"
+LIST_EXPIRY = 4 * 24 * 60 * 60
+CACHE_FORMAT = 2
+
+HIDE_DECLARATION = '{display:none!important}'
+_NO_DOMAINS = frozenset()
+
+_URL_TOKEN_RE = re.compile(r'[a-z0-9%]+')
+_SPECIAL_CHARS_RE = re.compile(r'([.$+?{}()\[\]\\])')
+_PIPE_RE = re.compile(r'(\|)[^$]')
+_HOST_RULE_RE = re.compile(r'^\|\|([a-z0-9][a-z0-9.-]*)\^$')
+
+
+def rule_to_regex(rule):
+    # Same translation as adblockparser.AdblockRule.rule_to_regex
+    if not rule:
+        return rule
+    if rule.startswith('/') and rule.endswith('/') and len(rule) > 1:
+        return rule[1:-1]
+    rule = _SPECIAL_CHARS_RE.sub(r'\\\1', rule)
+    rule = rule.replace('^', r'(?:[^\w\d_\-.%]|$)')
+    rule = rule.replace('*', '.*')
+    if rule[-1] == '|':
+        rule = rule[:-1] + '$'
+    if rule[:2] == '||':
+        if len(rule) > 2:
+            rule = r'^(?:[^:/?#]+:)?(?://(?:[^/?#]*\.)?)?' + rule[2:]
+    elif rule[0] == '|':
+        rule = '^' + rule[1:]
+    return _PIPE_RE.sub(r'\|', rule)
+
+
+def domain_variants(domain):
+    parts = domain.split('.')
+    if len(parts) == 1:
+        yield parts[0]
+    else:
+        for i in range(len(parts), 1, -1):
+            yield '.'.join(parts[-i:])
+
+
+def registrable_domain(host):
+    # Cheap eTLD+1 approximation; good enough to tell first from third party
+    # without shipping the public suffix list.
+    parts = host.rstrip('.').split('.')
+    if len(parts) <= 2:
+        return host
+    if len(parts[-1]) == 2 and len(parts[-2]) <= 3:
+        return '.'.join(parts[-3:])
+    return '.'.join(parts[-2:])
+
+
+def is_third_party(host, first_party_host):
+    if not host or not first_party_host:
+        return None
+    return registrable_domain(host) != registrable_domain(first_party_host)
+
+
+class Filter:
+    __slots__ = ('text', 'is_exception', 'pattern', 'options', 'domains',
+                 'include_types', 'exclude_types', 'third_party', 'match_case',
+                 'regex', '_compiled', 'substring')
+
+    def __init__(self, text):
+        self.text = text
+        self.is_exception = text.startswith('@@')
+        if self.is_exception:
+            text = text[2:]
+        options_text = ''
+        if '$' in text:
+            text, options_text = text.split('$', 1)
+        self.pattern = text
+        self.options = {}
+        self.domains = None
+        for raw in (options_text.split(',') if options_text else ()):
+            raw = raw.strip()
+            if raw.startswith('domain='):
+                self.domains = {}
+                for domain in raw[len('domain='):].split('|'):
+                    if domain.startswith('~'):
+                        self.domains[domain[1:]] = False
+                    elif domain:
+                        self.domains[domain] = True
+                self.options['domain'] = self.domains
+            elif raw.startswith('~'):
+                self.options[raw[1:]] = False
+            elif raw:
+                self.options[raw] = True
+
+        self.include_types = frozenset(k for k, v in self.options.items() if k in TYPE_OPTIONS and v)
+        self.exclude_types = frozenset(k for k, v in self.options.items() if k in TYPE_OPTIONS and not v)
+        self.third_party = self.options.get('third-party')
+        self.match_case = bool(self.options.get('match-case'))
+        self.regex = rule_to_regex(text)
+        self._compiled = None
+
+        # Plain patterns (no anchors, wildcards or separators) are checked with a
+        # substring test, which is far cheaper than the equivalent regex.
+        self.substring = None
+        if text and not any(c in text for c in '*^|') and not (text.startswith('/') and text.endswith('/')):
+            self.substring = text if self.match_case else text.lower()
+
+    @property
+    def supported(self):
+        return bool(self.regex) and all(opt in SUPPORTED_OPTIONS for opt in self.options)
+
+    def tokens(self):
+        # Tokens that must appear as a whole [a-z0-9%]+ run in any matching URL
+        text = self.pattern.lower()
+        if not text or (text.startswith('/') and text.endswith('/')):
+            return []
+        start_anchored = text.startswith('|')
+        body = text.lstrip('|')
+        end_anchored = body.endswith('|')
+        if end_anchored:
+            body = body[:-1]
+        result = []
+        for match in _URL_TOKEN_RE.finditer(body):
+            start, end = match.span()
+            if start == 0 and not start_anchored:
+                continue
+            if start > 0 and body[start - 1] == '*':
+                continue
+            if end == len(body) and not end_anchored:
+                continue
+            if end < len(body) and body[end] == '*':
+                continue
+            result.append(match.group())
+        return result
+
+    def matches(self, url, url_lower, request):
+        resource_type, third_party, first_party_host = request
+        if self.include_types or self.exclude_types:
+            if resource_type is None:
+                return False
+            if self.include_types and resource_type not in self.include_types:
+                return False
+            if resource_type in self.exclude_types:
+                return False
+        if self.third_party is not None and self.third_party != third_party:
+            return False
+        if self.domains is not None:
+            if first_party_host is None or not self._domain_matches(first_party_host):
+                return False
+        if self.substring is not None:
+            return self.substring in (url if self.match_case else url_lower)
+        if self._compiled is None:
+            flags = 0 if self.match_case else re.IGNORECASE
+            self._compiled = re.compile(self.regex, flags)
+        return self._compiled.search(url) is not None
+
+    def _domain_matches(self, domain):
+        for variant in domain_variants(domain):
+            if variant in self.domains:
+                return self.domains[variant]
+        return not any(self.domains.values())
+
+
+class _FilterIndex:
+    def __init__(self, filters=()):
+        # ||host^ rules are looked up by walking the request host's suffixes.
+        # Buckets hold either parsed Filters or, when loaded from the on-disk
+        # cache, the raw rule lines joined by newlines, parsed on first use.
+        self.hosts = {}
+        self.tokens = {}
+        self.fallback = []
+        tokenized = []
+        counts = {}
+        for flt in filters:
+            match = _HOST_RULE_RE.match(flt.pattern.lower())
+            if match:
+                self.hosts.setdefault(match.group(1), []).append(flt)
+                continue
+            tokens = flt.tokens()
+            tokenized.append((flt, tokens))
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+        for flt, tokens in tokenized:
+            if not tokens:
+                self.fallback.append(flt)
+                continue
+            # Bucket under the rarest token so buckets stay small
+            token = min(tokens, key=lambda t: (counts[t], -len(t)))
+            self.tokens.setdefault(token, []).append(flt)
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls()
+        index.hosts = state['hosts']
+        index.tokens = state['tokens']
+        index.fallback = state['fallback']
+        return index
+
+    def state(self):
+        def pack(bucket):
+            return bucket if isinstance(bucket, str) else '\n'.join(flt.text for flt in bucket)
+        return {
+            'hosts': {key: pack(bucket) for key, bucket in self.hosts.items()},
+            'tokens': {key: pack(bucket) for key, bucket in self.tokens.items()},
+            'fallback': pack(self.fallback),
+        }
+
+    def __len__(self):
+        def size(bucket):
+            return bucket.count('\n') + 1 if isinstance(bucket, str) else len(bucket)
+        return (sum(size(v) for v in self.hosts.values())
+                + sum(size(v) for v in self.tokens.values())
+                + (size(self.fallback) if self.fallback else 0))
+
+    @staticmethod
+    def _parse(bucket):
+        return [Filter(text) for text in bucket.split('\n')] if bucket else []
+
+    def _bucket(self, store, key):
+        bucket = store.get(key)
+        if bucket.__class__ is str:
+            bucket = store[key] = self._parse(bucket)
+        return bucket or ()
+
+    def match(self, url, url_lower, host, url_tokens, request):
+        if host and self.hosts:
+            for variant in domain_variants(host):
+                for flt in self._bucket(self.hosts, variant):
+                    if flt.matches(url, url_lower, request):
+                        return flt
+        for token in url_tokens:
+            for flt in self._bucket(self.tokens, token):
+                if flt.matches(url, url_lower, request):
+                    return flt
+        if self.fallback.__class__ is str:
+            self.fallback = self._parse(self.fallback)
+        for flt in self.fallback:
+            if flt.matches(url, url_lower, request):
+                return flt
+        return None
+
+
+class CosmeticFilters:
+    # Element-hiding rules ("##" and "#@#"). Generic selectors apply on every
+    # site; the rest are indexed by domain. stylesheet(host) folds the ones
+    # that apply into a single sheet and caches it per host.
+    def __init__(self, cache_size=256):
+        self.generic = []
+        # generic selector -> domains it is disabled on ("~domain##sel")
+        self.generic_disabled = {}
+        self.specific = {}
+        self.exceptions = {}
+        self.global_exceptions = set()
+        self.cache_size = cache_size
+        self._generic_css = None
+        self._exception_domains = None
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.generic) + sum(len(selectors) for selectors in self.specific.values())
+
+    def add(self, line):
+        if '#@#' in line:
+            domains, _, selector = line.partition('#@#')
+            exception = True
+        else:
+            domains, _, selector = line.partition('##')
+            exception = False
+        selector = selector.strip()
+        # Procedural (":-abp-...") selectors need a script, not a stylesheet
+        if not selector or ':-abp-' in selector:
+            return False
+        include, exclude = [], []
+        for domain in domains.lower().split(','):
+            domain = domain.strip()
+            if domain.startswith('~'):
+                exclude.append(domain[1:])
+            elif domain:
+                include.append(domain)
+
+        if exception:
+            if not include:
+                self.global_exceptions.add(selector)
+            for domain in include:
+                self.exceptions.setdefault(domain, set()).add(selector)
+        elif not include:
+            self.generic.append(selector)
+            if exclude:
+                self.generic_disabled.setdefault(selector, set()).update(exclude)
+        else:
+            for domain in include:
+                self.specific.setdefault(domain, []).append(selector)
+            # "example.com,~shop.example.com##sel"
+            for domain in exclude:
+                self.exceptions.setdefault(domain, set()).add(selector)
+        self._generic_css = None
+        self._exception_domains = None
+        return True
+
+    @classmethod
+    def from_state(cls, state, cache_size=256):
+        filters = cls(cache_size)
+        filters.generic = state['generic']
+        filters.generic_disabled = {selector: set(domains) for selector, domains in state['generic_disabled']}
+        filters.specific = state['specific']
+        filters.exceptions = {domain: set(selectors) for domain, selectors in state['exceptions']}
+        filters.global_exceptions = set(state['global_exceptions'])
+        return filters
+
+    def state(self):
+        return {
+            'generic': self.generic,
+            'generic_disabled': [(selector, sorted(domains)) for selector, domains in self.generic_disabled.items()],
+            'specific': self.specific,
+            'exceptions': [(domain, sorted(selectors)) for domain, selectors in self.exceptions.items()],
+            'global_exceptions': sorted(self.global_exceptions),
+        }
+
+    @staticmethod
+    def _css(selectors):
+        # One rule per selector: a single selector the engine cannot parse
+        # would otherwise void every other selector in its group
+        return ''.join(selector + HIDE_DECLARATION + '\n' for selector in selectors)
+
+    def stylesheet(self, host):
+        host = (host or '').lower()
+        with self._cache_lock:
+            css = self._cache.get(host)
+            if css is not None:
+                self._cache.move_to_end(host)
+                return css
+        css = self._build(host)
+        with self._cache_lock:
+            self._cache[host] = css
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return css
+
+    def _build(self, host):
+        if self._generic_css is None:
+            generic = dict.fromkeys(s for s in self.generic if s not in self.global_exceptions)
+            self._generic_css = self._css(generic)
+            self._exception_domains = set(self.exceptions)
+            for domains in self.generic_disabled.values():
+                self._exception_domains.update(domains)
+
+        variants = list(domain_variants(host)) if host else []
+        excepted = set(self.global_exceptions)
+        for domain in variants:
+            excepted.update(self.exceptions.get(domain, ()))
+        specific = dict.fromkeys(selector for domain in variants for selector in self.specific.get(domain, ())
+                                 if selector not in excepted)
+
+        # Most hosts have no exceptions of their own and share the generic sheet
+        if not any(domain in self._exception_domains for domain in variants):
+            return self._generic_css + self._css(s for s in specific if s not in self.generic)
+        variant_set = set(variants)
+        generic = dict.fromkeys(
+            s for s in self.generic
+            if s not in excepted and not variant_set & self.generic_disabled.get(s, _NO_DOMAINS))
+        return self._css(generic) + self._css(s for s in specific if s not in generic)
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+
+class AdblockEngine:
+    def __init__(self, rules=(), cache_size=4096):
+        block, allow = [], []
+        self.cosmetic = CosmeticFilters()
+        for line in rules:
+            line = line.strip()
+            if not line or line.startswith(('!', '[Adblock')):
+                continue
+            if '##' in line or '#@#' in line:
+                self.cosmetic.add(line)
+                continue
+            flt = Filter(line)
+            if not flt.supported:
+                continue
+            (allow if flt.is_exception else block).append(flt)
+        self.blacklist = _FilterIndex(block)
+        self.whitelist = _FilterIndex(allow)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @classmethod
+    def from_state(cls, state, cache_size=4096):
+        engine = cls(cache_size=cache_size)
+        engine.blacklist = _FilterIndex.from_state(state['blacklist'])
+        engine.whitelist = _FilterIndex.from_state(state['whitelist'])
+        engine.cosmetic = CosmeticFilters.from_state(state['cosmetic'])
+        return engine
+
+    def state(self):
+        return {'blacklist': self.blacklist.state(), 'whitelist': self.whitelist.state(),
+                'cosmetic': self.cosmetic.state()}
+
+    def __len__(self):
+        return len(self.blacklist) + len(self.whitelist)
+
+    def should_block(self, url, resource_type=None, first_party_host=None):
+        key = (url, resource_type, first_party_host)
+        with self._cache_lock:
+            decision = self._cache.get(key)
+            if decision is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return decision
+            self.cache_misses += 1
+
+        decision = self._decide(url, resource_type, first_party_host)
+
+        with self._cache_lock:
+            self._cache[key] = decision
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return decision
+
+    def _decide(self, url, resource_type, first_party_host):
+        url_lower = url.lower()
+        try:
+            host = urlsplit(url_lower).hostname or ''
+        except ValueError:
+            host = ''
+        request = (resource_type, is_third_party(host, first_party_host), first_party_host)
+        url_tokens = set(_URL_TOKEN_RE.findall(url_lower))
+        if self.blacklist.match(url, url_lower, host, url_tokens, request) is None:
+            return False
+        return self.whitelist.match(url, url_lower, host, url_tokens, request) is None
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+        self.cosmetic.clear_cache()
+
+
+class RuleCache:
+    def __init__(self, directory):
+        self.directory = directory
+        self.rules_path = os.path.join(directory, 'easylist.pickle')
+        self.meta_path = os.path.join(directory, 'easylist.json')
+
+    def load(self):
+        try:
+            with open(self.rules_path, 'rb') as f:
+                fmt, state = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+        if fmt != CACHE_FORMAT:
+            return None
+        return AdblockEngine.from_state(state)
+
+    def load_meta(self):
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # A cache written in an older format has to be rebuilt from a full
+        # download, so its ETag and mtime must not be reused
+        return meta if meta.get('format') == CACHE_FORMAT else {}
+
+    def save(self, engine, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self.rules_path, pickle.dumps((CACHE_FORMAT, engine.state()), pickle.HIGHEST_PROTOCOL))
+        self.save_meta(meta)
+
+    def save_meta(self, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self.meta_path, json.dumps(dict(meta, format=CACHE_FORMAT)).encode('utf-8'))
+
+    def is_stale(self, meta, source):
+        if meta.get('source') != source or not os.path.exists(self.rules_path):
+            return True
+        if os.path.exists(source):
+            return meta.get('mtime') != os.path.getmtime(source)
+        return time.time() - meta.get('fetched_at', 0) > LIST_EXPIRY
+
+    @staticmethod
+    def _write(path, data):
+        # Write-then-rename so a crash never leaves a truncated cache behind
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+def fetch_rule_list(source, meta, timeout=30):
+    # Returns (lines, meta); lines is None when the list has not changed.
+    # source is either a local file (air-gapped setups) or a list/mirror URL.
+    if os.path.exists(source):
+        mtime = os.path.getmtime(source)
+        if meta.get('source') == source and meta.get('mtime') == mtime:
+            return None, meta
+        with open(source, encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+        return lines, {'source': source, 'mtime': mtime, 'fetched_at': time.time()}
+
+    # Deferred so startup does not pay for importing requests
+    import requests
+
+    headers = {}
+    if meta.get('source') == source:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    response = requests.get(source, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return None, dict(meta, fetched_at=time.time())
+    response.raise_for_status()
+    return response.text.splitlines(), {
+        'source': source,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched_at': time.time(),
+    }
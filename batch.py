@@ -0,0 +1,224 @@
+import json
+import os
+import re
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import QBuffer, QIODevice, QTimer, QUrl
+
+from metrics import percentile
+
+FORMATS = ('pdf', 'png', 'html', 'text')
+EXTENSIONS = {'pdf': 'pdf', 'png': 'png', 'html': 'html', 'text': 'txt'}
+
+OK = 'ok'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+
+MANIFEST = 'manifest.jsonl'
+
+
+def read_url_list(path):
+    # One URL per line; blank lines and lines starting with # are skipped
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def output_name(index, url):
+    # Numbered so the files sort in list order, with the host to tell them apart
+    host = re.sub(r'[^A-Za-z0-9.-]+', '_', urlsplit(url).hostname or 'page')[:60]
+    return f'{index:06d}-{host}'
+
+
+class BatchItem:
+    __slots__ = ('index', 'url', 'attempts', 'started', 'load_ms', 'error')
+
+    def __init__(self, index, url):
+        self.index = index
+        self.url = url
+        self.attempts = 0
+        self.started = None
+        self.load_ms = None
+        self.error = None
+
+
+class BatchSlot:
+    # One off-screen view of the pool and what it is working on
+    def __init__(self, parent):
+        self.view = None
+        self.item = None
+        # Bumped for every page, so results of an abandoned one are told apart
+        self.generation = 0
+        self.pending = set()
+        self.files = {}
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+
+
+class BatchRenderer(QtCore.QObject):
+    # Renders a list of URLs with a fixed pool of off-screen views fed from a
+    # queue. A page that fails or runs over the timeout goes back to the end
+    # of the queue until it has used up its retries, and its view is replaced
+    # so no late signal from the abandoned load reaches the next page. Every
+    # page's outcome is appended to the manifest as soon as it is known.
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, urls, output_dir, create_view, formats=('pdf',), concurrency=4, timeout=30.0, retries=1,
+                 parent=None):
+        super().__init__(parent)
+        self.queue = deque(BatchItem(index, url) for index, url in enumerate(urls))
+        self.total = len(self.queue)
+        self.output_dir = output_dir
+        self.create_view = create_view
+        self.formats = tuple(formats)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = retries
+        self.slots = []
+        self.manifest = None
+        self.started = None
+        self.done = 0
+        self.failed = 0
+        self.load_times = []
+        self.total_times = []
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.manifest = open(os.path.join(self.output_dir, MANIFEST), 'w', encoding='utf-8')
+        self.started = time.perf_counter()
+        for _ in range(min(self.concurrency, len(self.queue))):
+            slot = BatchSlot(self)
+            slot.timer.timeout.connect(lambda slot=slot: self.fail(slot, TIMEOUT, f"not done in {self.timeout:g} s"))
+            self.replace_view(slot)
+            self.slots.append(slot)
+        for slot in list(self.slots):
+            self.next(slot)
+        if not self.slots:
+            self.finish()
+
+    def replace_view(self, slot):
+        if slot.view is not None:
+            slot.view.loadFinished.disconnect()
+            slot.view.deleteLater()
+        slot.view = self.create_view()
+        slot.view.loadFinished.connect(lambda ok, slot=slot: self.on_load_finished(slot, ok))
+
+    def next(self, slot):
+        slot.item = None
+        if not self.queue:
+            if all(other.item is None for other in self.slots):
+                self.finish()
+            return
+        item = slot.item = self.queue.popleft()
+        item.attempts += 1
+        item.started = time.perf_counter()
+        slot.generation += 1
+        slot.pending = set()
+        slot.files = {}
+        slot.timer.start(int(self.timeout * 1000))
+        slot.view.setUrl(QUrl(item.url))
+
+    def on_load_finished(self, slot, ok):
+        item = slot.item
+        # Only the first result of a load counts; rendering is already under way
+        if item is None or item.load_ms is not None:
+            return
+        if not ok:
+            self.fail(slot, FAILED, "the page did not load")
+            return
+        item.load_ms = (time.perf_counter() - item.started) * 1000
+        slot.pending = set(self.formats)
+        page = slot.view.page()
+        generation = slot.generation
+        for output in self.formats:
+            if output == 'pdf':
+                page.printToPdf(lambda data: self.rendered(slot, generation, 'pdf', bytes(data)))
+            elif output == 'html':
+                page.toHtml(lambda html: self.rendered(slot, generation, 'html', html.encode('utf-8')))
+            elif output == 'text':
+                page.toPlainText(lambda text: self.rendered(slot, generation, 'text', text.encode('utf-8')))
+            elif output == 'png':
+                buffer = QBuffer()
+                buffer.open(QIODevice.WriteOnly)
+                slot.view.grab().save(buffer, 'PNG')
+                self.rendered(slot, generation, 'png', bytes(buffer.data()))
+
+    def rendered(self, slot, generation, output, data):
+        # Callbacks for a page that has since timed out are dropped
+        item = slot.item
+        if item is None or slot.generation != generation or output not in slot.pending:
+            return
+        if not data:
+            self.fail(slot, FAILED, f"rendering {output} produced nothing")
+            return
+        name = f'{output_name(item.index, item.url)}.{EXTENSIONS[output]}'
+        try:
+            with open(os.path.join(self.output_dir, name), 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            self.fail(slot, FAILED, f"could not write {name}: {e}")
+            return
+        slot.files[output] = name
+        slot.pending.discard(output)
+        if not slot.pending:
+            slot.timer.stop()
+            self.record(item, OK, slot.files)
+            self.next(slot)
+
+    def fail(self, slot, status, error):
+        item = slot.item
+        if item is None:
+            return
+        slot.timer.stop()
+        slot.item = None
+        self.replace_view(slot)
+        item.error = error
+        if item.attempts <= self.retries:
+            item.load_ms = None
+            self.queue.append(item)
+        else:
+            self.record(item, status, {})
+        self.next(slot)
+
+    def record(self, item, status, files):
+        total_ms = (time.perf_counter() - item.started) * 1000
+        entry = {'index': item.index, 'url': item.url, 'status': status, 'attempts': item.attempts,
+                 'load_ms': None if item.load_ms is None else round(item.load_ms, 1),
+                 'total_ms': round(total_ms, 1), 'files': files}
+        if status != OK:
+            entry['error'] = item.error
+            self.failed += 1
+        else:
+            self.load_times.append(item.load_ms)
+            self.total_times.append(total_ms)
+        self.manifest.write(json.dumps(entry) + '\n')
+        self.manifest.flush()
+        self.done += 1
+        if self.done % max(1, self.total // 20) == 0 or self.done == self.total:
+            elapsed = time.perf_counter() - self.started
+            print(f"{self.done}/{self.total} pages, {self.failed} failed, {self.done / elapsed:.1f} pages/s",
+                  flush=True)
+
+    def finish(self):
+        if self.manifest is None or self.manifest.closed:
+            return
+        self.manifest.close()
+        for slot in self.slots:
+            slot.view.deleteLater()
+        self.slots = []
+        print(self.report(), flush=True)
+        self.finished.emit()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        lines = [f"Rendered {self.done - self.failed} of {self.total} pages in {elapsed:.1f} s "
+                 f"({self.done / elapsed if elapsed else 0:.1f} pages/s, {self.concurrency} at a time), "
+                 f"{self.failed} failed"]
+        for name, values in (('load', self.load_times), ('load and render', self.total_times)):
+            if values:
+                lines.append(f"  {name:16} p50 {percentile(values, 0.5):7.0f} ms  "
+                             f"p95 {percentile(values, 0.95):7.0f} ms  max {max(values):7.0f} ms")
+        lines.append(f"  manifest         {os.path.join(self.output_dir, MANIFEST)}")
+        return '\n'.join(lines)
@@ -0,0 +1,107 @@
+"""Ad-block decision throughput over a recorded URL corpus.
+
+    python benchmarks/bench_adblock.py [--rules easylist.txt] [--urls corpus.tsv]
+
+Reports decisions per second for cold (uncached) and warm (LRU) lookups, the
+time to build and re-fetch each site's element-hiding stylesheet and, when
+adblockparser is installed, how many decisions differ from it.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from adblock import AdblockEngine, TYPE_OPTIONS, is_third_party  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def load_corpus(path):
+    corpus = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            url, resource_type, first_party_host = line.rstrip('\n').split('\t')
+            corpus.append((url, resource_type or None, first_party_host or None))
+    return corpus
+
+
+def time_decisions(engine, corpus, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for url, resource_type, first_party_host in corpus:
+            engine.should_block(url, resource_type, first_party_host)
+    elapsed = time.perf_counter() - start
+    return rounds * len(corpus) / elapsed
+
+
+def time_stylesheets(engine, hosts):
+    # (slowest first build, slowest cached lookup) in milliseconds
+    first = cached = 0.0
+    for host in hosts:
+        start = time.perf_counter()
+        engine.cosmetic.stylesheet(host)
+        middle = time.perf_counter()
+        engine.cosmetic.stylesheet(host)
+        end = time.perf_counter()
+        first = max(first, (middle - start) * 1000)
+        cached = max(cached, (end - middle) * 1000)
+    return first, cached
+
+
+def compare_with_adblockparser(lines, engine, corpus):
+    try:
+        from adblockparser import AdblockRules
+    except ImportError:
+        return None
+    reference = AdblockRules(lines)
+    mismatches = []
+    for url, resource_type, first_party_host in corpus:
+        host = url.split('/')[2] if '//' in url else ''
+        options = dict((opt, opt == resource_type) for opt in TYPE_OPTIONS)
+        options['third-party'] = bool(is_third_party(host, first_party_host))
+        options['domain'] = first_party_host
+        expected = reference.should_block(url, options)
+        if expected != engine.should_block(url, resource_type, first_party_host):
+            mismatches.append((url, resource_type, first_party_host, expected))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rules', default=os.path.join(DATA_DIR, 'rules.txt'))
+    parser.add_argument('--urls', default=os.path.join(DATA_DIR, 'urls.tsv'))
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.rules, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    corpus = load_corpus(args.urls)
+
+    start = time.perf_counter()
+    engine = AdblockEngine(lines)
+    print(f"compiled {len(engine)} filters in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    cold = AdblockEngine(lines, cache_size=0)
+    print(f"cold: {time_decisions(cold, corpus, args.rounds):,.0f} decisions/s")
+    print(f"warm: {time_decisions(engine, corpus, args.rounds):,.0f} decisions/s")
+
+    hosts = sorted({first_party_host for _, _, first_party_host in corpus if first_party_host})
+    first, cached = time_stylesheets(engine, hosts)
+    print(f"{len(engine.cosmetic)} element-hiding selectors, {len(hosts)} sites: "
+          f"first build max {first:.2f} ms, cached max {cached:.3f} ms")
+
+    mismatches = compare_with_adblockparser(lines, engine, corpus)
+    if mismatches is None:
+        print("adblockparser not installed, skipping comparison")
+    else:
+        print(f"{len(mismatches)} of {len(corpus)} decisions differ from adblockparser")
+        for mismatch in mismatches[:20]:
+            print("  ", *mismatch)
+
+
+if __name__ == '__main__':
+    main()
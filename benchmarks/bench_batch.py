@@ -0,0 +1,129 @@
+"""Headless batch rendering against a local page server, run offscreen.
+
+    python benchmarks/bench_batch.py [--pages 200] [--concurrency 1,4,8] [--format pdf,text]
+
+Serves synthetic pages from a local HTTP server, a few of which stall past
+the timeout or fail on their first request, and runs main.py --headless
+--batch over them with a throwaway profile at each concurrency. Reports
+throughput and page timings from the manifest, and checks that every page
+ended up in it with the expected outcome.
+"""
+import argparse
+import http.server
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from batch import MANIFEST, OK  # noqa: E402
+from bench_dark_mode import synthetic_page  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rules.txt')
+
+
+class Pages(http.server.BaseHTTPRequestHandler):
+    # /page/N?nodes=K; ?stall=1 never answers in time, ?flaky=1 drops the
+    # first request for that page
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        if 'stall' in query:
+            time.sleep(self.server.stall)
+        if 'flaky' in query:
+            with self.server.lock:
+                first = parts.path not in self.server.seen
+                self.server.seen.add(parts.path)
+            if first:
+                self.close_connection = True
+                return
+        body = synthetic_page(int(query.get('nodes', ['1000'])[0])).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_batch(urls_path, output, concurrency, formats, timeout):
+    # A throwaway profile, with its own instance lock so a browser the user
+    # has open does not make the batch refuse to start
+    home = tempfile.mkdtemp(prefix='goon-batch-')
+    env = dict(os.environ, HOME=home, XDG_DATA_HOME=os.path.join(home, 'data'),
+               XDG_CACHE_HOME=os.path.join(home, 'cache'), XDG_RUNTIME_DIR=home, QT_QPA_PLATFORM='offscreen',
+               QTWEBENGINE_DISABLE_SANDBOX='1')
+    try:
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, os.path.join(ROOT, 'main.py'), '--headless', '--batch', urls_path,
+             '--batch-output', output, '--batch-format', formats, '--batch-concurrency', str(concurrency),
+             '--batch-timeout', str(timeout), '--batch-retries', '1', '--easylist', RULES],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    with open(os.path.join(output, MANIFEST)) as f:
+        entries = [json.loads(line) for line in f]
+    return process.returncode, elapsed, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--nodes', type=int, default=2000, help='elements per page')
+    parser.add_argument('--concurrency', default='1,4,8', help='pool sizes to compare')
+    parser.add_argument('--format', default='pdf,text', help='passed to --batch-format')
+    parser.add_argument('--timeout', type=float, default=5.0, help='per-page timeout in seconds')
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Pages)
+    server.daemon_threads = True
+    server.stall = args.timeout * 3
+    server.seen = set()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+
+    work = tempfile.mkdtemp(prefix='goon-batch-out-')
+    try:
+        for concurrency in (int(value) for value in args.concurrency.split(',')):
+            server.seen.clear()
+            urls = [f'{base}/page/{i}?nodes={args.nodes}' for i in range(args.pages)]
+            urls[1] += '&stall=1'
+            urls[2] += '&flaky=1'
+            urls_path = os.path.join(work, 'urls.txt')
+            with open(urls_path, 'w') as f:
+                f.write('\n'.join(urls) + '\n')
+            output = os.path.join(work, f'out-{concurrency}')
+            code, elapsed, entries = run_batch(urls_path, output, concurrency, args.format, args.timeout)
+
+            by_index = {entry['index']: entry for entry in entries}
+            assert sorted(by_index) == list(range(args.pages)), "every page should be in the manifest once"
+            assert by_index[1]['status'] == 'timeout' and by_index[1]['attempts'] == 2, by_index[1]
+            assert by_index[2]['status'] == OK and by_index[2]['attempts'] == 2, by_index[2]
+            assert code == 1, "a failed page should make the batch exit 1"
+            done = [entry for entry in entries if entry['status'] == OK]
+            loads = [entry['load_ms'] for entry in done]
+            totals = [entry['total_ms'] for entry in done]
+            print(f"concurrency {concurrency:2}: {len(done)}/{args.pages} pages in {elapsed:.1f} s "
+                  f"({args.pages / elapsed:.1f} pages/s including startup), "
+                  f"load p50 {percentile(loads, 0.5):.0f} ms p95 {percentile(loads, 0.95):.0f} ms, "
+                  f"load and render p50 {percentile(totals, 0.5):.0f} ms p95 {percentile(totals, 0.95):.0f} ms")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
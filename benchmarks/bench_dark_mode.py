@@ -0,0 +1,107 @@
+"""Dark-mode toggle time on a synthetic page: node walk vs. stylesheet class flip.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_dark_mode.py [--nodes 50000]
+
+Both approaches are timed inside the page with performance.now(), including
+the style recalculation and layout they force.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from PyQt5 import QtWidgets  # noqa: E402
+from PyQt5.QtCore import QEventLoop, QTimer, QUrl  # noqa: E402
+from PyQt5.QtWebEngineWidgets import QWebEnginePage  # noqa: E402
+
+from main import DARK_MODE_CLASS, DARK_MODE_CSS, DARK_MODE_JS, DARK_MODE_TOKEN  # noqa: E402
+
+# The per-node walk dark mode used before the stylesheet engine
+LEGACY_DARK_MODE_JS = """
+(function() {
+    function applyDarkMode(node) {
+        if (node.nodeType === Node.ELEMENT_NODE) {
+            node.style.setProperty('background-color', '#181818', 'important');
+            node.style.setProperty('color', '#FFFFFF', 'important');
+            node.style.setProperty('border-color', '#303030', 'important');
+        }
+        for (let child of node.childNodes) {
+            applyDarkMode(child);
+        }
+    }
+    document.documentElement.style.colorScheme = 'dark';
+    applyDarkMode(document.body);
+    var observer = new MutationObserver(function(mutations) {
+        mutations.forEach(function(mutation) {
+            mutation.addedNodes.forEach(applyDarkMode);
+        });
+    });
+    observer.observe(document.body, { childList: true, subtree: true });
+})();
+"""
+
+TIMED_JS = """
+(function() {
+    var start = performance.now();
+    %s
+    document.body.offsetHeight;
+    return performance.now() - start;
+})();
+"""
+
+
+def synthetic_page(nodes):
+    rows = []
+    for i in range(nodes // 5):
+        rows.append(f'<div class="row"><span>item {i}</span><a href="#{i}">link</a>'
+                    f'<p>text</p><input value="{i}"></div>')
+    return '<!doctype html><html><head></head><body>' + ''.join(rows) + '</body></html>'
+
+
+def run_js(page, script):
+    loop = QEventLoop()
+    result = []
+    page.runJavaScript(script, lambda value: (result.append(value), loop.quit()))
+    QTimer.singleShot(120000, loop.quit)
+    loop.exec_()
+    return result[0] if result else None
+
+
+def load_page(page, html):
+    loop = QEventLoop()
+    page.loadFinished.connect(loop.quit)
+    page.setHtml(html, QUrl('http://localhost/'))
+    loop.exec_()
+    page.loadFinished.disconnect(loop.quit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=50000)
+    parser.add_argument('--toggles', type=int, default=5)
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)  # noqa: F841
+    page = QWebEnginePage()
+    html = synthetic_page(args.nodes)
+
+    load_page(page, html)
+    legacy = [run_js(page, TIMED_JS % LEGACY_DARK_MODE_JS) for _ in range(args.toggles)]
+
+    load_page(page, html)
+    run_js(page, DARK_MODE_JS % ('false', json.dumps(DARK_MODE_CSS), DARK_MODE_CLASS, json.dumps(DARK_MODE_TOKEN)))
+    toggles = []
+    for i in range(args.toggles * 2):
+        enabled = 'true' if i % 2 == 0 else 'false'
+        flip = f"document.documentElement.classList.toggle('{DARK_MODE_CLASS}', {enabled});"
+        toggles.append(run_js(page, TIMED_JS % flip))
+
+    print(f"{args.nodes} nodes")
+    print(f"node walk:  first {legacy[0]:.1f} ms, repeat {sum(legacy[1:]) / max(len(legacy) - 1, 1):.1f} ms")
+    print(f"class flip: mean {sum(toggles) / len(toggles):.1f} ms, max {max(toggles):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Per-request cost of the data saver policy lookup.
+
+    python benchmarks/bench_datasaver.py [--requests 1000000]
+
+Replays synthetic (first-party host, resource type) pairs through
+DataSaver.action with the data saver off, on with only the default policy,
+and on with a thousand per-site policies, and reports the mean cost per call
+with the loop overhead subtracted.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from datasaver import ALLOW, BLOCK, DataSaver  # noqa: E402
+
+TYPES = ['document', 'script', 'image', 'stylesheet', 'xmlhttprequest', 'font', 'media', 'subdocument']
+
+
+def per_call(action, requests, batches):
+    start = time.perf_counter_ns()
+    for _ in range(batches):
+        for host, resource_type in requests:
+            action(host, resource_type)
+    elapsed = time.perf_counter_ns() - start
+    start = time.perf_counter_ns()
+    for _ in range(batches):
+        for host, resource_type in requests:
+            pass
+    overhead = time.perf_counter_ns() - start
+    return (elapsed - overhead) / (batches * len(requests))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    hosts = [f'www.site{i}.example' for i in range(200)] + [f'cdn{i}.site{i}.example' for i in range(200)]
+    requests = [(rng.choice(hosts), rng.choice(TYPES)) for _ in range(10000)]
+    batches = max(1, args.requests // len(requests))
+
+    cases = [('off', DataSaver(enabled=False)), ('default policy', DataSaver(enabled=True))]
+    sites = {f'site{i}.example': {'image': BLOCK, 'media': ALLOW} for i in range(1000)}
+    cases.append(('1000 site policies', DataSaver(enabled=True, sites=sites)))
+    for name, data_saver in cases:
+        print(f"{name:20} {per_call(data_saver.action, requests, batches):6.0f} ns per request")
+
+
+if __name__ == '__main__':
+    main()
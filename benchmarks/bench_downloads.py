@@ -0,0 +1,130 @@
+"""Segmented downloads against a local HTTP server with Range support.
+
+    python benchmarks/bench_downloads.py [--size-mb 64] [--limit-mb 8]
+
+Serves a random file from localhost, with and without Range support, and
+checks that every download arrives intact. Reports throughput for a single
+connection and for parallel segments, resumes a download paused half way
+from its journal, and measures how closely the bandwidth cap is held.
+"""
+import argparse
+import hashlib
+import http.server
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from downloads import DONE, FAILED, DownloadManager  # noqa: E402
+
+RANGE_RE = re.compile(r'bytes=(\d+)-(\d*)')
+
+
+class RangeServer(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        data = self.server.data
+        match = RANGE_RE.match(self.headers.get('Range', ''))
+        if match and self.path.startswith('/ranges/'):
+            start = int(match.group(1))
+            end = int(match.group(2)) + 1 if match.group(2) else len(data)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{len(data)}')
+        else:
+            start, end = 0, len(data)
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start))
+        self.send_header('ETag', '"synthetic"')
+        self.end_headers()
+        # Per-connection speed limit, so more connections really are faster
+        view = memoryview(data)
+        try:
+            for offset in range(start, end, 64 * 1024):
+                self.wfile.write(view[offset:min(end, offset + 64 * 1024)])
+                if self.server.delay:
+                    time.sleep(self.server.delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def wait(download, timeout=120):
+    deadline = time.monotonic() + timeout
+    while download.state not in (DONE, FAILED) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert download.state == DONE, f"{download.name} ended {download.state}: {download.error}"
+
+
+def timed(manager, url, path, expected):
+    start = time.perf_counter()
+    download = manager.add(url, path)
+    wait(download)
+    elapsed = time.perf_counter() - start
+    with open(download.path, 'rb') as f:
+        assert hashlib.sha256(f.read()).hexdigest() == expected, f"{download.name} is corrupt"
+    return download, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=64)
+    parser.add_argument('--limit-mb', type=float, default=8, help='bandwidth cap to check, in MB/s')
+    parser.add_argument('--delay', type=float, default=0.002, help='seconds per 64 KB per connection')
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeServer)
+    server.daemon_threads = True
+    server.data = os.urandom(args.size_mb * 1024 * 1024)
+    server.delay = args.delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    expected = hashlib.sha256(server.data).hexdigest()
+    size_mb = len(server.data) / (1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, url, segments in (('no ranges', f'{base}/plain/file.bin', 4),
+                                     ('1 segment', f'{base}/ranges/file.bin', 1),
+                                     ('4 segments', f'{base}/ranges/file.bin', 4)):
+            manager = DownloadManager(max_segments=segments)
+            download, elapsed = timed(manager, url, os.path.join(directory, 'file.bin'), expected)
+            print(f"{label:12} {len(download.segments)} connections: {size_mb / elapsed:7.1f} MB/s")
+            os.remove(download.path)
+
+        manager = DownloadManager()
+        download = manager.add(f'{base}/ranges/file.bin', os.path.join(directory, 'resumed.bin'))
+        while download.received < len(server.data) // 2:
+            time.sleep(0.005)
+        manager.pause(download)
+        time.sleep(0.2)
+        paused_at = download.received
+        # A fresh manager only has the journal and the partial file to go on
+        manager = DownloadManager()
+        restored = manager.restore(directory)
+        assert len(restored) == 1 and restored[0].received == paused_at, "the journal should match the part file"
+        resumed = restored[0]
+        manager.resume(resumed)
+        wait(resumed)
+        with open(resumed.path, 'rb') as f:
+            assert hashlib.sha256(f.read()).hexdigest() == expected, "the resumed download is corrupt"
+        print(f"resumed:     paused at {paused_at / len(server.data):.0%}, finished intact")
+        os.remove(resumed.path)
+
+        server.delay = 0
+        limit = args.limit_mb * 1024 * 1024
+        manager = DownloadManager(bandwidth=limit)
+        download, elapsed = timed(manager, f'{base}/ranges/file.bin', os.path.join(directory, 'capped.bin'),
+                                  expected)
+        rate = len(server.data) / elapsed / (1024 * 1024)
+        print(f"capped:      {rate:.2f} MB/s against a {args.limit_mb:g} MB/s cap")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""URL-bar completion latency against a large history database.
+
+    python benchmarks/bench_history.py [--rows 1000000] [--db /tmp/goon-history-bench.sqlite]
+
+The synthetic database is built once and reused by later runs. Fails if the
+median lookup of any query is over the 25 ms budget.
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from history import DECAY, HistoryStore, connect, strip_url  # noqa: E402
+
+WORDS = ['github', 'python', 'news', 'mail', 'docs', 'video', 'shop', 'music', 'forum', 'blog',
+         'api', 'cloud', 'stack', 'overflow', 'reddit', 'wiki', 'maps', 'search', 'photo', 'travel']
+QUERIES = ['g', 'gi', 'git', 'github.com/', 'https://www.stack', 'zq', 'wiki maps', 'python news docs', 'maps wikiq',
+           'news 4242', 'python wikiq', 'café', 'xyzzy']
+BUDGET_MS = 25.0
+
+
+def populate(path, rows, seed):
+    HistoryStore(path).close()
+    rng = random.Random(seed)
+    now = time.time()
+    connection = connect(path)
+    batch = []
+    with connection:
+        for i in range(rows):
+            host = rng.choice(WORDS) + ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(0, 3))) + '.com'
+            url = f"https://www.{host}/{rng.choice(WORDS)}/{i}"
+            visit_time = now - rng.random() * 80 * 24 * 60 * 60
+            batch.append((url, strip_url(url), ' '.join(rng.choices(WORDS, k=3)), visit_time, visit_time * DECAY))
+            if len(batch) == 10000:
+                connection.executemany(
+                    'INSERT INTO urls (url, stripped, title, visit_count, last_visit, rank) VALUES (?, ?, ?, 1, ?, ?)',
+                    batch)
+                batch = []
+        if batch:
+            connection.executemany(
+                'INSERT INTO urls (url, stripped, title, visit_count, last_visit, rank) VALUES (?, ?, ?, 1, ?, ?)',
+                batch)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--db', default=os.path.join('/tmp', 'goon-history-bench.sqlite'))
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        start = time.perf_counter()
+        populate(args.db, args.rows, args.seed)
+        print(f"built {args.rows} rows in {time.perf_counter() - start:.1f} s")
+
+    # Earlier versions of this script left their test visits at the top
+    connection = connect(args.db)
+    with connection:
+        connection.execute("DELETE FROM urls WHERE url LIKE 'https://bench.example/%'")
+    connection.close()
+
+    store = HistoryStore(args.db)
+    # Waits out the full-text index rebuild a database from an older version gets
+    start = time.perf_counter()
+    store.flush()
+    if store.has_fts and time.perf_counter() - start > 1:
+        print(f"rebuilt the full-text index in {time.perf_counter() - start:.1f} s")
+    slowest = 0.0
+    for query in QUERIES:
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            results = store.complete(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        slowest = max(slowest, statistics.median(timings))
+        print(f"{query!r:22} {len(results):2} results  best {min(timings):7.2f} ms  worst {max(timings):7.2f} ms")
+    store.close()
+
+    # Written to a throwaway database so the synthetic one stays as built
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(os.path.join(directory, 'history.sqlite'))
+        start = time.perf_counter()
+        for i in range(10000):
+            store.record_visit(f"https://bench.example/{i}", "bench")
+        enqueue = (time.perf_counter() - start) * 1000
+        store.flush()
+        print(f"enqueued 10000 visits in {enqueue:.1f} ms, "
+              f"flushed in {(time.perf_counter() - start) * 1000 - enqueue:.1f} ms")
+        store.close()
+
+    if slowest > BUDGET_MS:
+        print(f"a median lookup of {slowest:.1f} ms is over the {BUDGET_MS:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
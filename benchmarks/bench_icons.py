@@ -0,0 +1,82 @@
+"""Toolbar icon loading: full-size decodes against the pre-scaled icon cache.
+
+    python benchmarks/bench_icons.py [--size 64] [--toggles 20]
+
+Loads every icon the window uses the way the buttons used to, with a QIcon
+per file painted at the button size, and then through IconRegistry with an
+empty cache (first start) and a filled one (every later start). Reports the
+time until every icon has been painted once, the decoded pixels each way
+keeps in memory, and the cost of the dark mode toggle swapping its icon.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from PyQt5.QtGui import QIcon, QImageReader  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+from icons import ASSET_DIR, SCALES, IconRegistry  # noqa: E402
+
+# What main.py asks for: the toolbar and bottom bar at the button size, the
+# sidebar and tab icons at 16
+BUTTON_ICONS = ['voicesearch.jpeg', 'newtab.jpeg', 'fullscreen.jpeg', 'darkmode.jpeg', 'vpn.png', 'home.png',
+                'zoomin.jpeg', 'zoomout.jpeg']
+SMALL_ICONS = ['pie_chart.png', 'stats.png', 'calendar.png', 'tab_icon.png']
+
+
+def paint_all(icons):
+    # Asking for a pixmap is what painting does, and what forces the decode
+    return sum(icon.pixmap(size, size).cacheKey() != 0 for icon, size in icons)
+
+
+def full_size_bytes(name):
+    size = QImageReader(os.path.join(ASSET_DIR, name)).size()
+    return size.width() * size.height() * 4 if size.isValid() else 0
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=64, help='button icon size')
+    parser.add_argument('--toggles', type=int, default=20, help='dark mode toggles to time')
+    args = parser.parse_args()
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QApplication(sys.argv[:1])  # noqa: F841
+    requests = [(name, args.size) for name in BUTTON_ICONS] + [(name, 16) for name in SMALL_ICONS]
+
+    before_ms, _ = timed(lambda: paint_all([(QIcon(os.path.join(ASSET_DIR, name)), size)
+                                            for name, size in requests]))
+    before_bytes = sum(full_size_bytes(name) for name, _ in requests)
+    toggle_before, _ = timed(lambda: [paint_all([(QIcon(os.path.join(ASSET_DIR, name)), args.size)])
+                                      for name in ('lightmode.png', 'darkmode.jpeg') * (args.toggles // 2)])
+    print(f"before: {before_ms:.1f} ms to paint {len(requests)} icons, "
+          f"{before_bytes / 1024 / 1024:.1f} MB of decoded full-size images; "
+          f"{args.toggles} dark mode toggles {toggle_before:.1f} ms")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ('after, empty cache', 'after, warm cache'):
+            registry = IconRegistry(cache_dir)
+            elapsed, _ = timed(lambda: paint_all([(registry.icon(name, size), size) for name, size in requests]))
+            kept = sum(size * scale * size * scale * 4 for name, size in requests if name not in registry.missing
+                       for scale in SCALES)
+            toggle_ms, _ = timed(lambda: [paint_all([(registry.icon(name, args.size), args.size)])
+                                          for name in ('lightmode.png', 'darkmode.jpeg') * (args.toggles // 2)])
+            print(f"{label}: {elapsed:.1f} ms to paint {len(requests)} icons ({registry.built} decoded from the "
+                  f"originals, {len(registry.missing)} glyphs), {kept / 1024:.0f} KB of pre-scaled pixels; "
+                  f"{args.toggles} toggles {toggle_ms:.2f} ms")
+        assert registry.built == 0, "a warm cache should not decode any original"
+        assert registry.icon('home.png', args.size) is registry.icon('home.png', args.size)
+        assert not registry.icon('home.png', args.size).isNull()
+
+
+if __name__ == '__main__':
+    main()
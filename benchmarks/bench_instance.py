@@ -0,0 +1,130 @@
+"""Single-instance hand-off between launches.
+
+    python benchmarks/bench_instance.py [--forwards 200] [--launches 10]
+
+Runs a stand-in for the first browser in a child process, holding the lock
+and listening on a throwaway socket name. Reports how long a later launch
+takes to hand over its URLs, checks that a first instance killed with
+SIGKILL leaves nothing that stops the next one from taking over, and that of
+two launches started together exactly one becomes the first instance. Then
+times `python main.py URL` from process start to exit against a stand-in
+holding the real lock and socket names, in a private runtime directory; the
+hand-off has to happen before QtWebEngine is imported, so the budget is
+500 ms.
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from instance import NEW_WINDOW, OPEN, SingleInstance, server_name  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'main.py')
+LAUNCH_BUDGET_MS = 500.0
+
+
+def serve(name):
+    # The child: forwards an existing instance's way, or becomes the first
+    from PyQt5.QtCore import QCoreApplication
+    app = QCoreApplication(sys.argv[:1])
+    instance = SingleInstance(name)
+    if not instance.acquire():
+        print('forwarded' if instance.forward(['https://example.com/']) else 'unanswered', flush=True)
+        return
+    instance.received.connect(lambda request: print(request['action'], *request['urls'], flush=True))
+    if not instance.listen():
+        print('failed', flush=True)
+        return
+    print('listening', flush=True)
+    app.exec_()
+
+
+def start_server(name, env=None):
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', name],
+                            stdout=subprocess.PIPE, text=True, env=env)
+
+
+def time_launches(count):
+    # The lock file lives in XDG_RUNTIME_DIR and the socket in TMPDIR, so a
+    # private directory for both keeps a browser the user has open out of it
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, XDG_RUNTIME_DIR=directory, TMPDIR=directory)
+        server = start_server(server_name(), env)
+        assert server.stdout.readline().strip() == 'listening'
+        times = []
+        for i in range(count):
+            url = f'https://example.com/launch/{i}'
+            start = time.perf_counter()
+            launch = subprocess.run([sys.executable, MAIN, url], env=env, capture_output=True, text=True)
+            times.append((time.perf_counter() - start) * 1000)
+            assert launch.returncode == 0, launch.stdout + launch.stderr
+            assert server.stdout.readline().split()[-1] == url
+        server.terminate()
+        server.wait()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--forwards', type=int, default=200, help='requests handed to the first instance')
+    parser.add_argument('--launches', type=int, default=10, help='forwarded launches of main.py to time')
+    parser.add_argument('--serve', metavar='NAME', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve)
+        return
+
+    name = f'goon-bench-{os.getpid()}'
+    server = start_server(name)
+    assert server.stdout.readline().strip() == 'listening'
+
+    client = SingleInstance(name)
+    assert not client.acquire(), "the lock should be held by the first instance"
+    times = []
+    for i in range(args.forwards):
+        start = time.perf_counter()
+        assert client.forward([f'https://example.com/{i}'], NEW_WINDOW if i % 2 else OPEN)
+        times.append((time.perf_counter() - start) * 1000)
+        assert server.stdout.readline().split()[-1] == f'https://example.com/{i}'
+    print(f"hand-off: median {statistics.median(times):.2f} ms, p99 {percentile(times, 0.99):.2f} ms, "
+          f"max {max(times):.2f} ms over {len(times)} launches")
+
+    # A crash leaves both the lock file and the socket file behind
+    server.send_signal(signal.SIGKILL)
+    server.wait()
+    start = time.perf_counter()
+    server = start_server(name)
+    assert server.stdout.readline().strip() == 'listening', "a crashed instance should not block the next"
+    print(f"after SIGKILL: the next launch was listening in {(time.perf_counter() - start) * 1000:.0f} ms")
+    assert SingleInstance(name).forward(['https://example.com/after-crash'])
+    server.stdout.readline()
+    server.terminate()
+    server.wait()
+
+    # Two launches at once: one serves, the other hands its URL to it
+    first, second = start_server(name), start_server(name)
+    outcomes = sorted([first.stdout.readline().strip(), second.stdout.readline().strip()])
+    print(f"simultaneous launches: {', '.join(outcomes)}")
+    assert outcomes == ['forwarded', 'listening'], outcomes
+    for process in (first, second):
+        process.terminate()
+        process.wait()
+
+    times = time_launches(args.launches)
+    median = statistics.median(times)
+    print(f"forwarded launch of main.py, start to exit: median {median:.0f} ms, max {max(times):.0f} ms "
+          f"over {len(times)} launches")
+    if median > LAUNCH_BUDGET_MS:
+        print(f"median is over the {LAUNCH_BUDGET_MS:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
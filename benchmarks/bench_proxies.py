@@ -0,0 +1,140 @@
+"""Proxy pool routing and failover against local stand-in proxies.
+
+    python benchmarks/bench_proxies.py [--requests 200]
+
+Starts a local HTTP origin, a fast and a slow HTTP proxy, a SOCKS5 proxy and
+a dead port, all on localhost. Checks that probing ranks them by latency,
+times requests through the relay, then kills the fastest proxy and checks
+that traffic fails over without errors.
+"""
+import argparse
+import http.server
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from metrics import percentile  # noqa: E402
+from proxies import ProxyPool, ProxyRelay, _read_head, _recv_exactly, _relay  # noqa: E402
+
+
+class Origin(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'hello from the origin'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInHttpProxy(socketserver.BaseRequestHandler):
+    def handle(self):
+        time.sleep(self.server.delay)
+        head, rest = _read_head(self.request)
+        method, target, _ = head.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+        if method == 'CONNECT':
+            host, _, port = target.rpartition(':')
+            upstream = socket.create_connection((host, int(port)))
+            self.request.sendall(b'HTTP/1.1 200 Connection Established\r\n\r\n')
+        else:
+            parts = urllib.request.urlparse(target)
+            upstream = socket.create_connection((parts.hostname, parts.port or 80))
+            upstream.sendall(head + rest)
+        with upstream:
+            _relay(self.request, upstream)
+
+
+class StandInSocksProxy(socketserver.BaseRequestHandler):
+    def handle(self):
+        time.sleep(self.server.delay)
+        sock = self.request
+        _recv_exactly(sock, 3)
+        sock.sendall(b'\x05\x00')
+        _, _, _, address_type = _recv_exactly(sock, 4)
+        host = _recv_exactly(sock, _recv_exactly(sock, 1)[0]).decode('idna')
+        port = struct.unpack('!H', _recv_exactly(sock, 2))[0]
+        upstream = socket.create_connection((host, port))
+        sock.sendall(b'\x05\x00\x00\x01' + socket.inet_aton('127.0.0.1') + struct.pack('!H', 0))
+        with upstream:
+            _relay(sock, upstream)
+
+
+def serve(handler, delay=0.0):
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def dead_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def fetch(opener, url, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        with opener.open(url, timeout=10) as response:
+            response.read()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    origin = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Origin)
+    threading.Thread(target=origin.serve_forever, daemon=True).start()
+    fast = serve(StandInHttpProxy)
+    slow = serve(StandInHttpProxy, delay=0.05)
+    socks = serve(StandInSocksProxy, delay=0.01)
+    proxies = [f'http://127.0.0.1:{slow.server_address[1]}', f'socks5://127.0.0.1:{socks.server_address[1]}',
+               f'http://127.0.0.1:{fast.server_address[1]}', f'http://127.0.0.1:{dead_port()}']
+
+    # Nothing is bypassed: every stand-in lives on localhost
+    pool = ProxyPool(proxies, bypass=(), probe_target=origin.server_address, timeout=2.0)
+    start = time.perf_counter()
+    pool.probe_all()
+    print(f"probed {len(proxies)} proxies in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for proxy in pool.ranked():
+        latency = f"{proxy.latency * 1000:.1f} ms" if proxy.latency is not None else "-"
+        print(f"  {str(proxy):32} healthy={proxy.healthy!s:5} latency={latency}")
+    assert pool.best() is pool.proxies[2], "the fast proxy should be ranked first"
+
+    relay = ProxyRelay(pool)
+    relay.start()
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({'http': f'http://127.0.0.1:{relay.port}'}))
+    url = f'http://127.0.0.1:{origin.server_address[1]}/'
+
+    timings = fetch(opener, url, args.requests)
+    print(f"{args.requests} requests via {pool.best()}: p50 {percentile(timings, 0.5):.2f} ms, "
+          f"p99 {percentile(timings, 0.99):.2f} ms")
+
+    fast.shutdown()
+    fast.server_close()
+    timings = fetch(opener, url, args.requests)
+    print(f"after killing the fast proxy, {args.requests} requests via {pool.best()}: "
+          f"p50 {percentile(timings, 0.5):.2f} ms, worst {timings[-1]:.2f} ms")
+    assert pool.best() is pool.proxies[1], "traffic should fail over to the SOCKS5 proxy"
+    relay.stop()
+    pool.stop()
+
+
+if __name__ == '__main__':
+    main()
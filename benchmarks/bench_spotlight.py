@@ -0,0 +1,88 @@
+"""Spotlight keystroke-to-model latency with a large fuzzy index.
+
+    python benchmarks/bench_spotlight.py [--entries 10000]
+
+Types each query one character at a time and times the index search plus the
+model update the dialog does per keystroke. The budget is 5 ms. Then visits
+new pages with the recent group full, each evicting the oldest entry, and
+times the index update done on the GUI thread per navigation; its budget is
+1 ms.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from metrics import percentile  # noqa: E402
+from spotlight import ACTION, RECENT, TAB, FuzzyIndex, PaletteEntry, PaletteModel  # noqa: E402
+
+WORDS = ['github', 'python', 'news', 'mail', 'docs', 'video', 'shop', 'music', 'forum', 'blog',
+         'api', 'cloud', 'stack', 'overflow', 'reddit', 'wiki', 'maps', 'search', 'photo', 'travel']
+QUERIES = ['github python', 'gthb', 'stack overflow docs', 'zoom in', 'new tab', 'wiki maps travel', 'xyzzy']
+BUDGET_MS = 5.0
+EVICT_BUDGET_MS = 1.0
+NAVIGATIONS = 2000
+
+
+def synthetic_entries(count, rng):
+    entries = []
+    for i in range(count):
+        slug = ''.join(rng.choices(string.ascii_lowercase, k=6))
+        url = f"https://{rng.choice(WORDS)}.{rng.choice(WORDS)}.com/{rng.choice(WORDS)}/{slug}"
+        title = ' '.join(rng.choices(WORDS, k=3)).title()
+        kind = TAB if i % 50 == 0 else RECENT
+        entries.append(PaletteEntry(kind, title, url))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = FuzzyIndex()
+    recent = synthetic_entries(args.entries, rng)
+    start = time.perf_counter()
+    index.replace('recent', recent)
+    index.replace('actions', [PaletteEntry(ACTION, name) for name in ('New Tab', 'Zoom In', 'Zoom Out')])
+    print(f"indexed {len(index)} entries in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    model = PaletteModel()
+    latencies = []
+    for query in QUERIES:
+        for length in range(1, len(query) + 1):
+            start = time.perf_counter()
+            model.set_entries(index.search(query[:length]))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    p50, p99, worst = percentile(latencies, 0.5), percentile(latencies, 0.99), max(latencies)
+    print(f"{len(latencies)} keystrokes: p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {worst:.2f} ms")
+    if p99 > BUDGET_MS:
+        print(f"p99 is over the {BUDGET_MS:.0f} ms budget")
+        sys.exit(1)
+
+    # The same bookkeeping as BrowserApp.remember_recent_url once the group is full
+    updates = []
+    for entry in synthetic_entries(NAVIGATIONS, rng):
+        start = time.perf_counter()
+        index.remove('recent', recent.pop(0))
+        index.add('recent', entry)
+        updates.append((time.perf_counter() - start) * 1000)
+        recent.append(entry)
+    assert len(index) == args.entries + 3, len(index)
+
+    p50, p99, worst = percentile(updates, 0.5), percentile(updates, 0.99), max(updates)
+    print(f"{len(updates)} evictions: p50 {p50:.3f} ms, p99 {p99:.3f} ms, max {worst:.1f} ms")
+    if p99 > EVICT_BUDGET_MS:
+        print(f"p99 is over the {EVICT_BUDGET_MS:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Stall watchdog: detection of injected event-loop stalls and its overhead.
+
+    python benchmarks/bench_stalls.py [--seconds 5] [--threshold 100]
+
+Runs a Qt event loop that now and then blocks in a named function for a
+known time, with the watchdog on, and checks that every stall over the
+threshold is logged with that function on the captured stack and none under
+it is. Then compares the process CPU time of an idle event loop with the
+watchdog off and on.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from PyQt5.QtCore import QCoreApplication, QTimer  # noqa: E402
+
+from responsiveness import StallWatchdog  # noqa: E402
+
+
+def blocking_handler(seconds):
+    time.sleep(seconds)
+
+
+def run_loop(app, seconds):
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    start = time.process_time()
+    app.exec_()
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0, help='length of each run')
+    parser.add_argument('--threshold', type=int, default=100, metavar='MS')
+    args = parser.parse_args()
+    app = QCoreApplication(sys.argv[:1])
+    rng = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, 'stalls.log')
+        watchdog = StallWatchdog(log_path, args.threshold)
+        watchdog.start()
+        # Half the injected stalls are well over the threshold, half well under
+        injected = [rng.choice((args.threshold * 0.3, args.threshold * 3)) / 1000 for _ in range(20)]
+        for i, seconds in enumerate(injected):
+            QTimer.singleShot(int(args.seconds * 1000 * (i + 1) / (len(injected) + 2)),
+                              lambda seconds=seconds: blocking_handler(seconds))
+        run_loop(app, args.seconds)
+        watchdog.stop()
+        with open(log_path) as f:
+            log = f.read()
+        expected = sum(seconds * 1000 >= args.threshold for seconds in injected)
+        logged = log.count('event loop stalled')
+        with_stack = log.count('in blocking_handler')
+        print(f"{expected} stalls over {args.threshold} ms injected: {watchdog.stalls} detected, {logged} logged, "
+              f"{with_stack} with the blocking function on the stack")
+        print(watchdog.summary())
+        assert watchdog.stalls == expected == logged, log
+        assert with_stack >= expected
+
+        idle_off = run_loop(app, args.seconds)
+        watchdog = StallWatchdog(log_path, args.threshold)
+        watchdog.start()
+        idle_on = run_loop(app, args.seconds)
+        watchdog.stop()
+        print(f"idle CPU over {args.seconds:g} s: {idle_off * 1000:.0f} ms off, {idle_on * 1000:.0f} ms on "
+              f"({(idle_on - idle_off) / args.seconds * 100:.2f}% of a core)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Cold startup to first paint, run offscreen.
+
+    python benchmarks/bench_startup.py [--runs 5] [--budget 1500] [--json startup.json]
+
+Launches main.py with --profile-startup and a throwaway profile directory,
+reads the startup timeline it prints after the first paint and stops it.
+Reports the median of every phase; exits 1 if first paint is over --budget ms.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rules.txt')
+MARK_RE = re.compile(r'^\s*([\d.]+) ms\s+\+\s*([\d.]+) ms\s+(.+)$')
+
+
+def run_once(timeout):
+    home = tempfile.mkdtemp(prefix='goon-startup-')
+    env = dict(os.environ, HOME=home, XDG_DATA_HOME=os.path.join(home, 'data'),
+               XDG_CACHE_HOME=os.path.join(home, 'cache'), QT_QPA_PLATFORM='offscreen',
+               QTWEBENGINE_DISABLE_SANDBOX='1')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'main.py'), '--profile-startup', '--no-restore', '--new-instance',
+         '--easylist', RULES],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    phases = {}
+    deadline = time.monotonic() + timeout
+    try:
+        for line in process.stdout:
+            match = MARK_RE.match(line)
+            if match:
+                phases[match.group(3).strip()] = float(match.group(1))
+                if match.group(3).strip() == 'first paint':
+                    break
+            if time.monotonic() > deadline:
+                break
+    finally:
+        process.kill()
+        process.wait()
+        shutil.rmtree(home, ignore_errors=True)
+    if 'first paint' not in phases:
+        raise RuntimeError(f"main.py exited with {process.returncode} before the first paint")
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--budget', type=float, default=1500.0, metavar='MS')
+    parser.add_argument('--json', metavar='PATH', help='write the median timeline here')
+    args = parser.parse_args()
+
+    runs = [run_once(args.timeout) for _ in range(args.runs)]
+    medians = {}
+    for phase in runs[0]:
+        values = [run[phase] for run in runs if phase in run]
+        medians[phase] = statistics.median(values)
+        print(f"{phase:16} {medians[phase]:8.1f} ms  (min {min(values):.1f}, max {max(values):.1f})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': args.runs, 'median_ms': medians}, f, indent=2)
+    if medians['first paint'] > args.budget:
+        print(f"first paint is over the {args.budget:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Page summarization against a local stub model server.
+
+    python benchmarks/bench_summarize.py [--words 20000] [--token-delay 0.005]
+
+Starts a stub speaking Ollama's streaming /api/generate protocol, which
+answers every prompt with a canned reply one word at a time. Reports time to
+first token and total time for a short and a long page, how many requests
+chunking the long page took, how quickly a cancelled summary stops, and the
+time of a cache hit.
+"""
+import argparse
+import http.server
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from summarize import (OllamaBackend, SummaryCache, SummaryCancelled, chunk_text,  # noqa: E402
+                       summarize, summary_key)
+
+REPLY = ("The page explains how the feature works, who it is for and what it costs. "
+         "It lists three limitations and ends with a comparison against the alternatives.").split()
+
+
+class StubModel(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.prompts.append(request['prompt'])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for word in REPLY:
+                time.sleep(self.server.token_delay)
+                self.send_chunk({'model': request['model'], 'response': word + ' ', 'done': False})
+            self.send_chunk({'model': request['model'], 'response': '', 'done': True})
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.aborted += 1
+            self.close_connection = True
+
+    def send_chunk(self, message):
+        data = json.dumps(message).encode('utf-8') + b'\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def synthetic_text(words, rng):
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9)))
+                  for _ in range(2000)]
+    paragraphs = []
+    written = 0
+    while written < words:
+        length = rng.randint(40, 160)
+        paragraphs.append(' '.join(rng.choice(vocabulary) for _ in range(length)) + '.')
+        written += length
+    return '\n'.join(paragraphs)
+
+
+def timed_summary(backend, text, budget):
+    start = time.perf_counter()
+    first = []
+    summary = summarize(backend, 'Synthetic page', text, budget,
+                        on_token=lambda piece: first or first.append(time.perf_counter()))
+    return (first[0] - start) * 1000, (time.perf_counter() - start) * 1000, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--words', type=int, default=20000, help='length of the long page')
+    parser.add_argument('--budget', type=int, default=6000, help='tokens per chunk')
+    parser.add_argument('--token-delay', type=float, default=0.005, help='seconds between stub tokens')
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubModel)
+    server.daemon_threads = True
+    server.prompts = []
+    server.aborted = 0
+    server.token_delay = args.token_delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend = OllamaBackend(model='stub', url=f'http://127.0.0.1:{server.server_address[1]}')
+
+    rng = random.Random(11)
+    for name, words in (('short', 500), ('long', args.words)):
+        text = synthetic_text(words, rng)
+        chunks = chunk_text(text, args.budget, backend.count_tokens)
+        assert all(backend.count_tokens(chunk) <= args.budget for chunk in chunks), "a chunk is over budget"
+        del server.prompts[:]
+        first_ms, total_ms, summary = timed_summary(backend, text, args.budget)
+        assert summary.split() == REPLY, "the streamed summary should be the stub's reply"
+        print(f"{name} page, {words} words in {len(chunks)} chunks: {len(server.prompts)} requests, "
+              f"first token {first_ms:.0f} ms, done {total_ms:.0f} ms")
+
+    cancel = threading.Event()
+    received = []
+
+    def on_token(piece):
+        received.append(piece)
+        if len(received) == 3:
+            cancel.set()
+    start = time.perf_counter()
+    try:
+        summarize(backend, 'Synthetic page', synthetic_text(500, rng), args.budget, on_token=on_token,
+                  cancelled=cancel.is_set)
+    except SummaryCancelled:
+        pass
+    time.sleep(args.token_delay * 4)
+    print(f"cancelled after {len(received)} tokens in {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"stub saw {server.aborted} aborted responses")
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SummaryCache(directory)
+        text = synthetic_text(args.words, rng)
+        start = time.perf_counter()
+        key = summary_key(backend, 'Synthetic page', text)
+        cache.put(key, ' '.join(REPLY))
+        stored_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        hit = cache.get(summary_key(backend, 'Synthetic page', text))
+        hit_ms = (time.perf_counter() - start) * 1000
+        assert hit == ' '.join(REPLY)
+        print(f"cache: stored in {stored_ms:.2f} ms, hit in {hit_ms:.2f} ms including hashing")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
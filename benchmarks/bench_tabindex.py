@@ -0,0 +1,101 @@
+"""Cross-tab text index: indexing, updates, queries and memory for many tabs.
+
+    python benchmarks/bench_tabindex.py [--tabs 200] [--words 15000]
+
+Indexes synthetic pages with a Zipf-like vocabulary, one per tab, then
+reports the time to index a tab, to re-index one after its page changed and
+to remove one, query latency for one and two word queries (the last word
+typed as a prefix), and the index's estimated and measured memory next to
+its cap.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from metrics import percentile  # noqa: E402
+from tabindex import MAX_INDEX_BYTES, TextIndex  # noqa: E402
+
+
+def vocabulary(rng, size=50000):
+    return [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10)))
+            for _ in range(size)]
+
+
+def synthetic_page(rng, words, weights, length):
+    chosen = rng.choices(words, weights=weights, k=length)
+    lines = []
+    for start in range(0, length, 12):
+        lines.append(' '.join(chosen[start:start + 12]).capitalize() + '.')
+    return '\n'.join(lines)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tabs', type=int, default=200)
+    parser.add_argument('--words', type=int, default=15000, help='words per page')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--max-mb', type=int, default=MAX_INDEX_BYTES // (1024 * 1024), help='index cap')
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    words = vocabulary(rng)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    # Traced from here so the page text the index keeps for snippets counts
+    tracemalloc.start()
+    pages = [synthetic_page(rng, words, weights, args.words) for _ in range(args.tabs)]
+    index = TextIndex(args.max_mb * 1024 * 1024)
+    index_times = [timed(index.update, tab_id, f'https://example.com/{tab_id}', f'Page {tab_id}', text)[0]
+                   for tab_id, text in enumerate(pages)]
+    measured = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"indexed {len(index)} of {args.tabs} tabs of {args.words} words: "
+          f"median {statistics.median(index_times):.1f} ms, max {max(index_times):.1f} ms per tab; "
+          f"{len(index.postings)} terms")
+    print(f"memory: estimated {index.size / 1024 / 1024:.1f} MB, measured {measured / 1024 / 1024:.1f} MB, "
+          f"cap {args.max_mb} MB")
+
+    changed = synthetic_page(rng, words, weights, args.words)
+    update_ms, _ = timed(index.update, 0, 'https://example.com/0', 'Page 0', changed)
+    unchanged_ms, _ = timed(index.update, 0, 'https://example.com/0', 'Page 0', changed)
+    remove_ms, _ = timed(index.remove, 1)
+    print(f"re-index a changed tab {update_ms:.1f} ms, an unchanged one {unchanged_ms:.2f} ms, "
+          f"remove a tab {remove_ms:.1f} ms")
+
+    for terms in (1, 2):
+        latencies = []
+        matched = 0
+        for _ in range(args.queries):
+            query = ' '.join(rng.choices(words[:5000], k=terms))
+            # The last word is usually still being typed
+            query = query[:max(len(query) - rng.randint(0, 3), 1)]
+            elapsed, hits = timed(index.search, query)
+            latencies.append(elapsed)
+            matched += bool(hits)
+        print(f"{terms}-word queries: p50 {statistics.median(latencies):.2f} ms, "
+              f"p95 {percentile(latencies, 0.95):.2f} ms, {matched}/{args.queries} with hits")
+
+    hits = index.search(pages[5].split()[40])
+    assert any(hit.tab_id == 5 for hit in hits), "a word from a page should find its tab"
+    assert all(hit.snippet for hit in hits)
+
+    small = TextIndex(max_bytes=index.size // 4)
+    for tab_id, text in enumerate(pages):
+        small.update(tab_id, '', '', text)
+    assert small.size <= small.max_bytes and args.tabs - 1 in small.documents
+    print(f"with a quarter of that as the cap: {len(small)} most recent tabs kept")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Cost of recording one request in the telemetry ring buffer.
+
+    python benchmarks/bench_telemetry.py [--requests 1000000]
+
+Replays synthetic requests through RequestTelemetry.record and reports the
+mean cost per call with the loop overhead subtracted. The budget is 1 us.
+Then replays them into a telemetry with a small counter cap and checks that
+folding counters, and closing a tab, keep the totals.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from telemetry import TAB_ID, RequestTelemetry  # noqa: E402
+
+TYPES = ['document', 'script', 'image', 'stylesheet', 'xmlhttprequest', 'font', 'media', 'other']
+BUDGET_NS = 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sites = [f'site{i}.example' for i in range(20)]
+    hosts = [f'cdn{i}.example' for i in range(500)]
+    requests = [(rng.randrange(10), rng.choice(sites), rng.choice(hosts), rng.choice(TYPES), rng.random() < 0.2,
+                 int(rng.lognormvariate(8, 1))) for _ in range(10000)]
+    batches = max(1, args.requests // len(requests))
+
+    telemetry = RequestTelemetry()
+    record = telemetry.record
+    start = time.perf_counter_ns()
+    for _ in range(batches):
+        for tab, site, host, resource_type, blocked, elapsed_ns in requests:
+            record(tab, site, host, resource_type, blocked, elapsed_ns)
+    recorded = time.perf_counter_ns() - start
+
+    start = time.perf_counter_ns()
+    for _ in range(batches):
+        for tab, site, host, resource_type, blocked, elapsed_ns in requests:
+            pass
+    overhead = time.perf_counter_ns() - start
+
+    count = batches * len(requests)
+    per_call = (recorded - overhead) / count
+    total, blocked = telemetry.totals()
+    print(f"{count} requests ({blocked} blocked): {per_call:.0f} ns per record()")
+    start = time.perf_counter()
+    telemetry.snapshot()
+    print(f"snapshot of {len(telemetry.counts)} counters in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if per_call > BUDGET_NS:
+        print(f"record() is over the {BUDGET_NS} ns budget")
+        sys.exit(1)
+
+    folded = RequestTelemetry(max_counters=1000)
+    for request in requests:
+        folded.record(*request)
+    expected = (len(requests), sum(1 for request in requests if request[4]))
+    assert folded.totals() == expected, (folded.totals(), expected)
+    assert len(folded.counts) <= folded.max_counters, len(folded.counts)
+    folded.close_tab(0)
+    assert folded.totals() == expected and 0 not in folded.table(TAB_ID)
+    print(f"folded to {len(folded.counts)} counters with the totals intact")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Voice command parsing from recognizer transcripts.
+
+    python benchmarks/bench_voice.py [--rounds 1000]
+
+Runs a table of transcripts through a stand-in RecognizerBackend, the way
+VoiceSession hands a finished phrase to the browser, and checks the
+(action, argument) that parse_voice_command returns and
+process_voice_command branches on. Reports the time parse_voice_command
+takes.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from voice import RecognizerBackend, parse_voice_command  # noqa: E402
+
+# (transcript, action, argument); the order of the checks in
+# parse_voice_command decides the overlapping ones
+COMMANDS = [
+    ("search for cheap flights to Lisbon", 'search', "cheap flights to lisbon"),
+    ("search for open source browsers", 'search', "open source browsers"),
+    ("open wikipedia.org", 'open', "wikipedia.org"),
+    ("play lo-fi beats", 'play', "lo-fi beats"),
+    ("what's the time", 'time', None),
+    ("what is the time now", 'time', None),
+    ("close tab", 'close_tab', None),
+    ("new tab please", 'new_tab', None),
+    ("weather in Berlin tomorrow", 'web_search', "weather in berlin tomorrow"),
+]
+
+
+class ScriptedBackend(RecognizerBackend):
+    # Answers every phrase with the next transcript it was given
+    name = 'scripted'
+
+    def __init__(self, transcripts):
+        self.transcripts = list(transcripts)
+
+    def finish(self, audio):
+        return self.transcripts.pop(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=1000, help='times to parse each transcript')
+    args = parser.parse_args()
+
+    backend = ScriptedBackend(transcript for transcript, _, _ in COMMANDS)
+    for transcript, action, argument in COMMANDS:
+        backend.start(16000, 2)
+        parsed = parse_voice_command(backend.finish(None))
+        print(f"{transcript!r} -> {parsed}")
+        assert parsed == (action, argument), f"{transcript!r}: expected {(action, argument)}, got {parsed}"
+
+    times = []
+    for transcript, _, _ in COMMANDS:
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            parse_voice_command(transcript)
+        times.append((time.perf_counter() - start) / args.rounds * 1e6)
+    print(f"{len(COMMANDS)} commands: parse_voice_command median {statistics.median(times):.2f} us")
+
+
+if __name__ == '__main__':
+    main()
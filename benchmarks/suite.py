@@ -0,0 +1,313 @@
+"""Headless benchmark suite for the browser's hot paths.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/suite.py [--only adblock,spotlight]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.10]
+
+Runs offscreen against a local HTTP server serving synthetic pages:
+
+  tabs       add_new_tab latency, page load time and RSS per tab
+  newtab     add_new_tab to a loaded goon://newtab page, with no network
+  adblock    decisions/s and p99 decision latency over the recorded URL corpus
+  dark_mode  dark-mode apply and toggle time on 1k, 10k and 100k node pages
+  spotlight  keystroke-to-model latency with 10k palette entries
+  startup    cold start of main.py to first paint
+
+Results are written as JSON. With --baseline, every metric is compared with
+the stored run and the suite exits 1 if any got worse by more than
+--tolerance (a fraction). Cases that need QtWebEngine are reported as skipped
+when it cannot be loaded.
+"""
+import argparse
+import http.server
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+
+import bench_adblock  # noqa: E402
+import bench_spotlight  # noqa: E402
+import bench_startup  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+
+
+def metric(value, unit, higher_is_better=False):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+class SyntheticPages(http.server.BaseHTTPRequestHandler):
+    # /page/<anything>?nodes=N serves a page of about N elements
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        nodes = int(parse_qs(parts.query).get('nodes', ['1000'])[0])
+        body = self.server.synthetic_page(nodes).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class WebEngineContext:
+    # One QApplication, page server and throwaway profile shared by the
+    # cases that need a real renderer
+    def __init__(self):
+        self.home = tempfile.mkdtemp(prefix='goon-suite-')
+        os.environ['XDG_DATA_HOME'] = os.path.join(self.home, 'data')
+        os.environ['XDG_CACHE_HOME'] = os.path.join(self.home, 'cache')
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        os.environ.setdefault('QTWEBENGINE_DISABLE_SANDBOX', '1')
+        from PyQt5 import QtWidgets
+        # Loads QtWebEngine and registers goon://, both of which have to
+        # happen before the QApplication exists
+        import bench_dark_mode
+        from main import register_url_schemes
+        register_url_schemes()
+        self.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([sys.argv[0]])
+        self.app.setApplicationName("Goon")
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SyntheticPages)
+        self.server.synthetic_page = bench_dark_mode.synthetic_page
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, name, nodes):
+        return f'http://127.0.0.1:{self.server.server_address[1]}/page/{name}?nodes={nodes}'
+
+    def wait(self, signal, timeout=60):
+        from PyQt5.QtCore import QEventLoop, QTimer
+        loop = QEventLoop()
+        signal.connect(loop.quit)
+        QTimer.singleShot(timeout * 1000, loop.quit)
+        loop.exec_()
+        signal.disconnect(loop.quit)
+
+
+def case_adblock(args, context):
+    with open(os.path.join(DATA_DIR, 'rules.txt'), encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    corpus = bench_adblock.load_corpus(os.path.join(DATA_DIR, 'urls.tsv'))
+    from adblock import AdblockEngine
+    start = time.perf_counter()
+    engine = AdblockEngine(lines)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    results = {'adblock.compile_ms': metric(compile_ms, 'ms')}
+    for name, cache_size in (('cold', 0), ('warm', 4096)):
+        engine = AdblockEngine(lines, cache_size=cache_size)
+        timings = []
+        clock = time.perf_counter_ns
+        start = clock()
+        for _ in range(args.rounds):
+            for url, resource_type, first_party_host in corpus:
+                begin = clock()
+                engine.should_block(url, resource_type, first_party_host)
+                timings.append(clock() - begin)
+        elapsed = (clock() - start) / 1e9
+        results[f'adblock.{name}.decisions_per_s'] = metric(len(timings) / elapsed, 'decisions/s', True)
+        results[f'adblock.{name}.p99_us'] = metric(percentile(timings, 0.99) / 1000, 'us')
+    return results
+
+
+def case_spotlight(args, context):
+    from spotlight import ACTION, FuzzyIndex, PaletteEntry, PaletteModel
+    rng = random.Random(3)
+    index = FuzzyIndex()
+    start = time.perf_counter()
+    index.replace('recent', bench_spotlight.synthetic_entries(10000, rng))
+    index.replace('actions', [PaletteEntry(ACTION, name) for name in ('New Tab', 'Zoom In', 'Zoom Out')])
+    index_ms = (time.perf_counter() - start) * 1000
+    model = PaletteModel()
+    latencies = []
+    for query in bench_spotlight.QUERIES:
+        for length in range(1, len(query) + 1):
+            start = time.perf_counter()
+            model.set_entries(index.search(query[:length]))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        'spotlight.index_ms': metric(index_ms, 'ms'),
+        'spotlight.keystroke_p50_ms': metric(percentile(latencies, 0.5), 'ms'),
+        'spotlight.keystroke_p99_ms': metric(percentile(latencies, 0.99), 'ms'),
+    }
+
+
+def case_tabs(args, context):
+    from main import BrowserApp, renderer_rss
+    browser = BrowserApp(adblock_source=os.path.join(DATA_DIR, 'rules.txt'), max_live_tabs=args.tabs + 1,
+                         restore_session=False)
+    browser.show()
+    # Keep the first tab off the network as well
+    from PyQt5.QtCore import QUrl
+    browser.current_web_view().load(QUrl(context.url('start', 1000)))
+    context.wait(browser.current_web_view().loadFinished)
+
+    def rss():
+        pids = {view.page().renderProcessPid() for view in browser.web_views()}
+        return renderer_rss(pids | {os.getpid()})
+
+    before = rss()
+    add_ms = []
+    load_ms = []
+    for i in range(args.tabs):
+        start = time.perf_counter()
+        tab = browser.add_new_tab(context.url(f'tab{i}', 1000))
+        add_ms.append((time.perf_counter() - start) * 1000)
+        context.wait(tab.view.loadFinished)
+        load_ms.append((time.perf_counter() - start) * 1000)
+    per_tab = (rss() - before) / args.tabs / (1024 * 1024)
+    browser.close()
+    browser.deleteLater()
+    return {
+        'tabs.add_new_tab_p50_ms': metric(statistics.median(add_ms), 'ms'),
+        'tabs.add_new_tab_max_ms': metric(max(add_ms), 'ms'),
+        'tabs.load_p50_ms': metric(statistics.median(load_ms), 'ms'),
+        'tabs.rss_per_tab_mb': metric(per_tab, 'MB'),
+    }
+
+
+def case_newtab(args, context):
+    from main import BrowserApp
+    browser = BrowserApp(adblock_source=os.path.join(DATA_DIR, 'rules.txt'), max_live_tabs=args.tabs + 1,
+                         restore_session=False)
+    browser.show()
+    context.wait(browser.current_web_view().loadFinished)
+    load_ms = []
+    for _ in range(args.tabs):
+        start = time.perf_counter()
+        tab = browser.add_new_tab()
+        context.wait(tab.view.loadFinished)
+        load_ms.append((time.perf_counter() - start) * 1000)
+    browser.close()
+    browser.deleteLater()
+    return {
+        'newtab.load_p50_ms': metric(statistics.median(load_ms), 'ms'),
+        'newtab.load_max_ms': metric(max(load_ms), 'ms'),
+    }
+
+
+def case_dark_mode(args, context):
+    from PyQt5.QtCore import QUrl
+    from PyQt5.QtWebEngineWidgets import QWebEnginePage
+    import bench_dark_mode
+    from main import DARK_MODE_CLASS, DARK_MODE_CSS, DARK_MODE_JS, DARK_MODE_TOKEN
+    results = {}
+    for nodes in (1000, 10000, 100000):
+        page = QWebEnginePage()
+        page.load(QUrl(context.url('dark', nodes)))
+        context.wait(page.loadFinished)
+        apply = bench_dark_mode.run_js(page, bench_dark_mode.TIMED_JS % (
+            DARK_MODE_JS % ('true', json.dumps(DARK_MODE_CSS), DARK_MODE_CLASS, json.dumps(DARK_MODE_TOKEN))))
+        toggles = []
+        for i in range(args.toggles * 2):
+            enabled = 'false' if i % 2 == 0 else 'true'
+            flip = f"document.documentElement.classList.toggle('{DARK_MODE_CLASS}', {enabled});"
+            toggles.append(bench_dark_mode.run_js(page, bench_dark_mode.TIMED_JS % flip))
+        label = f'{nodes // 1000}k'
+        results[f'dark_mode.{label}.apply_ms'] = metric(apply, 'ms')
+        results[f'dark_mode.{label}.toggle_mean_ms'] = metric(sum(toggles) / len(toggles), 'ms')
+        page.deleteLater()
+    return results
+
+
+def case_startup(args, context):
+    runs = [bench_startup.run_once(60) for _ in range(args.startup_runs)]
+    return {'startup.first_paint_ms': metric(statistics.median(run['first paint'] for run in runs), 'ms')}
+
+
+# name -> (function, needs QtWebEngine in this process)
+CASES = {
+    'tabs': (case_tabs, True),
+    'newtab': (case_newtab, True),
+    'adblock': (case_adblock, False),
+    'dark_mode': (case_dark_mode, True),
+    'spotlight': (case_spotlight, False),
+    'startup': (case_startup, False),
+}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results['metrics'].items():
+        previous = baseline.get('metrics', {}).get(name)
+        if previous is None or not previous['value']:
+            print(f"  {name:36} {current['value']:12.2f} {current['unit']:12} (new)")
+            continue
+        change = (current['value'] - previous['value']) / previous['value']
+        worse = -change if current['higher_is_better'] else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:36} {previous['value']:12.2f} -> {current['value']:12.2f} {current['unit']:12} "
+              f"{change * 100:+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', help='comma-separated cases to run: ' + ', '.join(CASES))
+    parser.add_argument('--output', default='benchmark-results.json', metavar='PATH')
+    parser.add_argument('--baseline', metavar='PATH', help='earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    parser.add_argument('--rounds', type=int, default=20, help='passes over the ad-block corpus')
+    parser.add_argument('--tabs', type=int, default=10)
+    parser.add_argument('--toggles', type=int, default=5)
+    parser.add_argument('--startup-runs', type=int, default=3)
+    args = parser.parse_args()
+
+    selected = args.only.split(',') if args.only else list(CASES)
+    unknown = [name for name in selected if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    results = {
+        'created_at': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'metrics': {},
+        'skipped': {},
+    }
+    context = None
+    for name in selected:
+        function, needs_webengine = CASES[name]
+        try:
+            if needs_webengine and context is None:
+                context = WebEngineContext()
+            start = time.perf_counter()
+            metrics = function(args, context)
+        except (ImportError, RuntimeError) as e:
+            print(f"{name}: skipped ({e})")
+            results['skipped'][name] = str(e)
+            continue
+        print(f"{name}: {time.perf_counter() - start:.1f} s")
+        for metric_name, value in metrics.items():
+            print(f"  {metric_name:36} {value['value']:12.2f} {value['unit']}")
+        results['metrics'].update(metrics)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"compared with {args.baseline}:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import json
+import os
+from collections import Counter
+
+from adblock import domain_variants
+
+ALLOW = 'allow'
+DEFER = 'defer'
+BLOCK = 'block'
+ACTIONS = (ALLOW, DEFER, BLOCK)
+
+# Resource types the data saver acts on, named as in the ad-block options.
+# Blocking happens in the request interceptor; deferring relies on the
+# page's own lazy loading, which only images, frames and media have.
+SAVER_TYPES = ('image', 'media', 'font', 'subdocument')
+DEFERRABLE = ('image', 'media', 'subdocument')
+
+# Rough transfer size of one blocked request, for the bytes-saved estimate
+TYPICAL_BYTES = {
+    'image': 30 * 1024,
+    'media': 1024 * 1024,
+    'font': 40 * 1024,
+    'subdocument': 60 * 1024,
+}
+
+DEFAULT_POLICY = {'image': DEFER, 'media': BLOCK, 'font': BLOCK, 'subdocument': DEFER}
+
+# The memo of host lookups is dropped once it grows past this
+MAX_RESOLVED_HOSTS = 4096
+
+
+def parse_policy(text, base=None):
+    # "image=block,media=defer" on top of base; raises ValueError
+    policy = dict(base or {})
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        resource_type, _, action = item.partition('=')
+        resource_type, action = resource_type.strip(), action.strip()
+        if resource_type not in SAVER_TYPES:
+            raise ValueError(f"unknown resource type {resource_type!r}, expected one of {', '.join(SAVER_TYPES)}")
+        if action not in ACTIONS or (action == DEFER and resource_type not in DEFERRABLE):
+            raise ValueError(f"cannot {action!r} {resource_type}")
+        policy[resource_type] = action
+    return policy
+
+
+class DataSaver:
+    # Per-site policies override the default for a host and its subdomains.
+    # A host's effective policy is resolved once and memoised, so the
+    # request path costs one attribute check when off and two dict lookups
+    # when on.
+    def __init__(self, enabled=False, default=None, sites=None):
+        self.enabled = enabled
+        self.default = dict(DEFAULT_POLICY if default is None else default)
+        self.sites = dict(sites or {})
+        self._resolved = {}
+
+    def set_default(self, policy):
+        self.default = dict(policy)
+        self._resolved = {}
+
+    def set_site_policy(self, host, policy):
+        # None goes back to the default for that host
+        if policy is None:
+            self.sites.pop(host, None)
+        else:
+            self.sites[host] = dict(policy)
+        self._resolved = {}
+
+    def policy_for(self, host):
+        resolved = self._resolved
+        policy = resolved.get(host)
+        if policy is None:
+            policy = self.default
+            for domain in domain_variants(host or ''):
+                if domain in self.sites:
+                    policy = self.sites[domain]
+                    break
+            if len(resolved) >= MAX_RESOLVED_HOSTS:
+                resolved = self._resolved = {}
+            resolved[host] = policy
+        return policy
+
+    def action(self, host, resource_type):
+        if not self.enabled:
+            return ALLOW
+        return self.policy_for(host).get(resource_type, ALLOW)
+
+    def state(self):
+        return {'enabled': self.enabled, 'default': self.default, 'sites': self.sites}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state.get('enabled', False), state.get('default'), state.get('sites'))
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return cls.from_state(json.load(f))
+        except (OSError, ValueError, AttributeError):
+            return cls()
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state(), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+class SavedBytes:
+    # Requests the data saver blocked for one tab, and their estimated size
+    def __init__(self):
+        self.requests = Counter()
+
+    def add(self, resource_type):
+        self.requests[resource_type] += 1
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    @property
+    def total_bytes(self):
+        return sum(TYPICAL_BYTES.get(resource_type, 0) * count for resource_type, count in self.requests.items())
@@ -0,0 +1,454 @@
+import collections
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from PyQt5 import QtCore
+
+# Files smaller than this are fetched over one connection
+SEGMENT_MIN_SIZE = 4 * 1024 * 1024
+MAX_SEGMENTS = 4
+CHUNK_SIZE = 64 * 1024
+# A segment whose connection drops is retried this many times before the
+# whole download is marked failed
+SEGMENT_RETRIES = 3
+# The journal is rewritten at most this often while data arrives
+JOURNAL_INTERVAL = 1.0
+JOURNAL_FORMAT = 1
+PART_SUFFIX = '.part'
+JOURNAL_SUFFIX = '.part.json'
+# Throughput is averaged over this many seconds
+THROUGHPUT_WINDOW = 3.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+PAUSED = 'paused'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+class DownloadError(Exception):
+    pass
+
+
+class FileChanged(DownloadError):
+    # The server answered a ranged request with the whole file, so what is
+    # on disk belongs to an older version
+    pass
+
+
+class TokenBucket:
+    # Shared by every connection so the cap is global. Readers take what
+    # they read and sleep off any debt; at most a second's worth of unused
+    # bandwidth is saved up. A rate of 0 means unlimited.
+    def __init__(self, rate=0):
+        self.rate = rate
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+    def consume(self, amount):
+        with self._lock:
+            rate = self.rate
+            if not rate:
+                return
+            now = time.monotonic()
+            self._tokens = min(rate, self._tokens + (now - self._updated) * rate) - amount
+            self._updated = now
+            wait = -self._tokens / rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+def split_segments(size, max_segments):
+    # [start, end, next] triples with end exclusive; next is where the
+    # segment's following byte goes
+    count = max(1, min(max_segments, size // SEGMENT_MIN_SIZE))
+    bounds = [size * i // count for i in range(count + 1)]
+    return [[bounds[i], bounds[i + 1], bounds[i]] for i in range(count)]
+
+
+def preallocate(fd, size):
+    # Reserves the whole file up front so parallel segments never extend it
+    # and a full disk is found before the transfer rather than during it
+    if not size:
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        os.ftruncate(fd, size)
+
+
+def unique_path(path, taken=()):
+    root, ext = os.path.splitext(path)
+    candidate = path
+    number = 1
+    while candidate in taken or os.path.exists(candidate) or os.path.exists(candidate + PART_SUFFIX):
+        candidate = f"{root} ({number}){ext}"
+        number += 1
+    return candidate
+
+
+class Download:
+    def __init__(self, url, path):
+        self.url = url
+        self.path = path
+        self.size = None
+        self.ranges = False
+        self.validator = None
+        self.segments = []
+        self.state = QUEUED
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._samples = collections.deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._journal_at = 0.0
+
+    @property
+    def part_path(self):
+        return self.path + PART_SUFFIX
+
+    @property
+    def journal_path(self):
+        return self.path + JOURNAL_SUFFIX
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    @property
+    def received(self):
+        return sum(segment[2] - segment[0] for segment in list(self.segments))
+
+    def throughput(self):
+        # Bytes per second over the last few seconds
+        if self.state != RUNNING:
+            return 0.0
+        samples = list(self._samples)
+        if len(samples) < 2:
+            return 0.0
+        (first_at, first), (last_at, last) = samples[0], samples[-1]
+        return (last - first) / (last_at - first_at) if last_at > first_at else 0.0
+
+    def eta(self):
+        # Seconds left at the current throughput, or None if unknown
+        rate = self.throughput()
+        if not self.size or not rate:
+            return None
+        return (self.size - self.received) / rate
+
+    def _sample(self):
+        now = time.monotonic()
+        samples = self._samples
+        if samples and now - samples[-1][0] < 0.25:
+            return
+        samples.append((now, self.received))
+        while samples and now - samples[0][0] > THROUGHPUT_WINDOW:
+            samples.popleft()
+
+    def journal(self):
+        return {
+            'format': JOURNAL_FORMAT,
+            'url': self.url,
+            'size': self.size,
+            'ranges': self.ranges,
+            'validator': self.validator,
+            'segments': [list(segment) for segment in self.segments],
+            'paused': self.state == PAUSED,
+        }
+
+    def save_journal(self):
+        with self._lock:
+            data = json.dumps(self.journal())
+            tmp_path = self.journal_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.journal_path)
+            self._journal_at = time.monotonic()
+
+    @classmethod
+    def from_journal(cls, path):
+        # The download a journal describes, or None if it cannot be resumed
+        try:
+            with open(path + JOURNAL_SUFFIX, encoding='utf-8') as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if journal.get('format') != JOURNAL_FORMAT or not os.path.exists(path + PART_SUFFIX):
+            return None
+        download = cls(journal['url'], path)
+        # Without range support the only way to resume is to start over
+        if journal.get('ranges'):
+            download.size = journal['size']
+            download.ranges = True
+            download.validator = journal.get('validator')
+            download.segments = [list(segment) for segment in journal['segments']]
+        download.state = PAUSED if journal.get('paused') else QUEUED
+        return download
+
+
+class DownloadManager(QtCore.QObject):
+    # Each running download has one thread per segment; at most max_active
+    # downloads run at once and the rest wait in order. Progress lives on the
+    # Download objects for the UI to poll; only state changes are signalled.
+    added = QtCore.pyqtSignal(object)
+    finished = QtCore.pyqtSignal(object)
+
+    def __init__(self, max_active=3, max_segments=MAX_SEGMENTS, bandwidth=0, header_source=None, parent=None):
+        super().__init__(parent)
+        self.max_active = max_active
+        self.max_segments = max_segments
+        self.bucket = TokenBucket(bandwidth)
+        self.header_source = header_source
+        self.proxy = None
+        self.downloads = []
+        self._lock = threading.Lock()
+
+    def set_bandwidth(self, rate):
+        self.bucket.set_rate(rate)
+
+    def throughput(self):
+        return sum(download.throughput() for download in list(self.downloads))
+
+    def add(self, url, path):
+        with self._lock:
+            taken = {download.path for download in self.downloads if download.state not in (DONE, CANCELLED)}
+        download = Download(url, unique_path(path, taken))
+        self._add(download)
+        return download
+
+    def restore(self, directory):
+        # Brings back the downloads whose journals were left in directory
+        try:
+            names = [name for name in os.listdir(directory) if name.endswith(JOURNAL_SUFFIX)]
+        except OSError:
+            return []
+        restored = []
+        for name in names:
+            download = Download.from_journal(os.path.join(directory, name[:-len(JOURNAL_SUFFIX)]))
+            if download is not None:
+                self._add(download)
+                restored.append(download)
+        return restored
+
+    def _add(self, download):
+        with self._lock:
+            self.downloads.append(download)
+        self.added.emit(download)
+        self._schedule()
+
+    def pause(self, download):
+        if download.state in (QUEUED, RUNNING):
+            download.state = PAUSED
+            download._stop.set()
+            if download.segments:
+                self._save_journal(download)
+
+    def resume(self, download):
+        if download.state in (PAUSED, FAILED):
+            download.state = QUEUED
+            download.error = None
+            self._schedule()
+
+    def cancel(self, download):
+        running = download.state == RUNNING
+        download.state = CANCELLED
+        download._stop.set()
+        # A running download cleans up after its threads have stopped
+        if not running:
+            self._remove_files(download)
+
+    def shutdown(self):
+        # Stops everything, leaving journals so running downloads resume on
+        # the next start
+        for download in list(self.downloads):
+            if download.state in (QUEUED, RUNNING):
+                download._stop.set()
+                if download.segments:
+                    self._save_journal(download)
+
+    def _schedule(self):
+        with self._lock:
+            active = sum(1 for download in self.downloads if download.state == RUNNING)
+            for download in self.downloads:
+                if active >= self.max_active:
+                    break
+                if download.state == QUEUED:
+                    download.state = RUNNING
+                    download._stop.clear()
+                    download.started_at = download.started_at or time.time()
+                    threading.Thread(target=self._run, args=(download,), daemon=True).start()
+                    active += 1
+
+    def _run(self, download):
+        try:
+            try:
+                self._fetch(download)
+            except FileChanged:
+                print(f"{download.url} changed on the server, downloading it again")
+                download.segments = []
+                download._stop.clear()
+                self._fetch(download)
+        except (DownloadError, OSError) as e:
+            if download.state == RUNNING:
+                download.state = FAILED
+                download.error = str(e)
+                print(f"Download of {download.url} failed: {e}")
+        if download.state == CANCELLED:
+            self._remove_files(download)
+        elif download.state != DONE and download.segments:
+            self._save_journal(download)
+        download._samples.clear()
+        self.finished.emit(download)
+        self._schedule()
+
+    def _save_journal(self, download):
+        try:
+            download.save_journal()
+        except OSError as e:
+            print(f"Could not save download progress for {download.name}: {e}")
+
+    def _remove_files(self, download):
+        for path in (download.part_path, download.journal_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _open(self, download, start, end=None, validator=None):
+        headers = dict(self.header_source(download.url)) if self.header_source is not None else {}
+        headers['Range'] = f'bytes={start}-' + (str(end - 1) if end is not None else '')
+        if validator:
+            headers['If-Range'] = validator
+        handlers = [urllib.request.ProxyHandler({'http': self.proxy, 'https': self.proxy})] if self.proxy else []
+        opener = urllib.request.build_opener(*handlers)
+        try:
+            return opener.open(urllib.request.Request(download.url, headers=headers), timeout=30)
+        except urllib.error.HTTPError as e:
+            e.close()
+            raise DownloadError(f"the server answered {e.code} {e.reason}")
+
+    def _probe(self, download):
+        # The first request asks for everything from byte 0; a 206 answer
+        # means ranges work and the response goes on to feed the first segment
+        response = self._open(download, 0)
+        length = response.headers.get('Content-Length')
+        match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+        download.ranges = response.status == 206 and match is not None
+        if download.ranges:
+            download.size = int(match.group(3))
+        else:
+            download.size = int(length) if length and length.isdigit() else None
+        etag = response.headers.get('ETag')
+        # If-Range only accepts strong validators
+        download.validator = etag if etag and not etag.startswith('W/') else response.headers.get('Last-Modified')
+        if download.ranges:
+            download.segments = split_segments(download.size, self.max_segments)
+        else:
+            download.segments = [[0, download.size, 0]]
+        return response
+
+    def _fetch(self, download):
+        directory = os.path.dirname(download.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(download.part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            first = None
+            # Without range support a download can only start from the top
+            if not download.ranges:
+                download.segments = []
+            if not download.segments:
+                os.ftruncate(fd, 0)
+                first = self._probe(download)
+                preallocate(fd, download.size)
+            errors = []
+            threads = []
+            for index, segment in enumerate(download.segments):
+                if segment[1] is not None and segment[2] >= segment[1]:
+                    continue
+                response = first if index == 0 else None
+                thread = threading.Thread(target=self._fetch_segment, args=(download, fd, segment, response, errors),
+                                          daemon=True)
+                thread.start()
+                threads.append(thread)
+            if first is not None and not threads:
+                first.close()
+            for thread in threads:
+                thread.join()
+            if errors and download.state == RUNNING:
+                raise errors[0]
+            if download._stop.is_set():
+                return
+            if download.size is not None and download.received != download.size:
+                raise DownloadError(f"got {download.received} of {download.size} bytes")
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(download.part_path, download.path)
+        try:
+            os.remove(download.journal_path)
+        except OSError:
+            pass
+        download.state = DONE
+        download.finished_at = time.time()
+
+    def _fetch_segment(self, download, fd, segment, response, errors):
+        attempt = 0
+        while not download._stop.is_set() and not errors:
+            try:
+                if response is None:
+                    response = self._open(download, segment[2], segment[1], download.validator)
+                    if download.ranges and response.status != 206:
+                        response.close()
+                        raise FileChanged("the file changed on the server")
+                self._read_segment(download, fd, segment, response)
+                return
+            except FileChanged as e:
+                errors.append(e)
+                download._stop.set()
+                return
+            except (DownloadError, OSError) as e:
+                attempt += 1
+                if attempt > SEGMENT_RETRIES or not download.ranges:
+                    errors.append(e)
+                    download._stop.set()
+                    return
+                time.sleep(2 ** attempt * 0.25)
+            finally:
+                if response is not None:
+                    response.close()
+                    response = None
+
+    def _read_segment(self, download, fd, segment, response):
+        while not download._stop.is_set():
+            want = CHUNK_SIZE if segment[1] is None else min(CHUNK_SIZE, segment[1] - segment[2])
+            if want <= 0:
+                return
+            data = response.read(want)
+            if not data:
+                if segment[1] is not None:
+                    raise DownloadError("the connection closed early")
+                return
+            os.pwrite(fd, data, segment[2])
+            # Only this thread moves this segment forward
+            segment[2] += len(data)
+            download._sample()
+            if download.ranges and time.monotonic() - download._journal_at > JOURNAL_INTERVAL:
+                self._save_journal(download)
+            self.bucket.consume(len(data))
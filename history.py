@@ -0,0 +1,344 @@
+import math
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+# Frecency decays with a 30 day half-life. Rows store
+#   rank = ln(score) + visit_time * DECAY
+# so older scores never need rewriting: comparing ranks compares scores decayed
+# to any common point in time.
+HALF_LIFE = 30 * 24 * 60 * 60
+DECAY = math.log(2) / HALF_LIFE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    stripped TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    visit_count INTEGER NOT NULL DEFAULT 0,
+    last_visit REAL NOT NULL,
+    rank REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_stripped ON urls (stripped);
+CREATE INDEX IF NOT EXISTS urls_rank ON urls (rank);
+CREATE INDEX IF NOT EXISTS urls_last_visit ON urls (last_visit);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS urls_fts USING fts5(
+    title, stripped, content='urls', content_rowid='id', tokenize='unicode61', prefix='1 2 3 4'
+);
+CREATE TRIGGER IF NOT EXISTS urls_ai AFTER INSERT ON urls BEGIN
+    INSERT INTO urls_fts (rowid, title, stripped) VALUES (new.id, new.title, new.stripped);
+END;
+CREATE TRIGGER IF NOT EXISTS urls_ad AFTER DELETE ON urls BEGIN
+    INSERT INTO urls_fts (urls_fts, rowid, title, stripped) VALUES ('delete', old.id, old.title, old.stripped);
+END;
+CREATE TRIGGER IF NOT EXISTS urls_au AFTER UPDATE OF title ON urls BEGIN
+    INSERT INTO urls_fts (urls_fts, rowid, title, stripped) VALUES ('delete', old.id, old.title, old.stripped);
+    INSERT INTO urls_fts (rowid, title, stripped) VALUES (new.id, new.title, new.stripped);
+END;
+"""
+DROP_FTS = """
+DROP TRIGGER IF EXISTS urls_ai;
+DROP TRIGGER IF EXISTS urls_ad;
+DROP TRIGGER IF EXISTS urls_au;
+DROP TABLE IF EXISTS urls_fts;
+"""
+
+# Prefixes matching more rows than this walk the rank index and stop at the
+# first hits; rarer ones are read from the prefix index and sorted
+DENSE_PREFIX_ROWS = 2000
+
+# Word searches first look for matches among this many most frecent rows,
+# which finds common words without sorting every row that contains them;
+# rarer words are looked up in the full-text index, reading at most
+# FTS_CANDIDATES of its newest matches
+FRECENT_ROWS = 1000
+FTS_CANDIDATES = 2000
+# Longest prefix urls_fts keeps an index for
+FTS_PREFIX_CHARS = 4
+
+# Most likely destination for a typed host prefix: its most frecent page, the
+# site's origin, the site's share of the frecency of all matching sites and
+# its total visit count
+Prediction = namedtuple('Prediction', 'url origin share visits')
+
+
+def strip_url(url):
+    # What people actually type: no scheme, no "www."
+    stripped = url.split('://', 1)[-1].lower()
+    return stripped[4:] if stripped.startswith('www.') else stripped
+
+
+def fold(text):
+    # Case and accents are ignored the way the unicode61 tokenizer does
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def should_record(url):
+    return urlsplit(url).scheme in ('http', 'https')
+
+
+def connect(path):
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+class HistoryStore:
+    def __init__(self, path, retention_days=90, max_entries=1000000, flush_interval=2.0, batch_size=256):
+        self.path = path
+        self.retention = retention_days * 24 * 60 * 60
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        writer = connect(path)
+        # Must be set before the first table exists to take effect
+        writer.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        writer.executescript(SCHEMA)
+        outdated = False
+        try:
+            existing = writer.execute("SELECT sql FROM sqlite_master WHERE name = 'urls_fts'").fetchone()
+            writer.executescript(FTS_SCHEMA)
+            # Without prefix indexes every prefix query merges the postings of
+            # all the words it expands to; older tables are rebuilt with them
+            # on the writer thread and word search uses LIKE until then
+            outdated = existing is not None and 'prefix=' not in existing[0]
+            self.has_fts = not outdated
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: word search falls back to LIKE
+            self.has_fts = False
+        writer.commit()
+        self._writer = writer
+        self._reader = connect(path)
+        self._reader_lock = threading.Lock()
+
+        # The GUI thread only ever enqueues; all writes happen on this thread
+        self._queue = queue.Queue()
+        if outdated:
+            self._queue.put(('rebuild', None, None, None))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record_visit(self, url, title='', visit_time=None):
+        if should_record(url):
+            self._queue.put(('visit', url, title, visit_time or time.time()))
+
+    def update_title(self, url, title):
+        if title and should_record(url):
+            self._queue.put(('title', url, title, None))
+
+    def compact(self):
+        self._queue.put(('compact', None, None, None))
+
+    def flush(self):
+        done = threading.Event()
+        self._queue.put(('flush', done, None, None))
+        done.wait()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._reader.close()
+
+    def _run(self):
+        pending = []
+        deadline = None
+        stop = False
+        while not stop:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+            if item is None:
+                stop = True
+            elif item:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                # Batch visits until the interval passes or the batch fills up
+                urgent = item[0] in ('flush', 'compact', 'rebuild')
+                if not urgent and len(pending) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            if pending:
+                self._write(pending)
+                pending = []
+            deadline = None
+
+    def _write(self, items):
+        waiters = []
+        compact = rebuild = False
+        try:
+            with self._writer:
+                for kind, url, title, visit_time in items:
+                    if kind == 'visit':
+                        self._write_visit(url, title, visit_time)
+                    elif kind == 'title':
+                        self._writer.execute('UPDATE urls SET title = ? WHERE url = ? AND title != ?',
+                                             (title, url, title))
+                    elif kind == 'flush':
+                        waiters.append(url)
+                    elif kind == 'compact':
+                        compact = True
+                    elif kind == 'rebuild':
+                        rebuild = True
+            if rebuild:
+                self._rebuild_fts()
+            if compact:
+                self._compact()
+        except sqlite3.Error as e:
+            print(f"Could not write browsing history: {e}")
+        finally:
+            for done in waiters:
+                done.set()
+
+    def _write_visit(self, url, title, visit_time):
+        row = self._writer.execute('SELECT rank, title FROM urls WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            self._writer.execute(
+                'INSERT INTO urls (url, stripped, title, visit_count, last_visit, rank) VALUES (?, ?, ?, 1, ?, ?)',
+                (url, strip_url(url), title or '', visit_time, visit_time * DECAY))
+            return
+        rank, old_title = row
+        score = math.exp(rank - visit_time * DECAY) + 1.0
+        self._writer.execute(
+            'UPDATE urls SET visit_count = visit_count + 1, last_visit = ?, rank = ?, title = ? WHERE url = ?',
+            (visit_time, math.log(score) + visit_time * DECAY, title or old_title, url))
+
+    def _rebuild_fts(self):
+        try:
+            self._writer.executescript(
+                'BEGIN;' + DROP_FTS + FTS_SCHEMA + "INSERT INTO urls_fts (urls_fts) VALUES ('rebuild'); COMMIT;")
+        except sqlite3.Error:
+            self._writer.rollback()
+            raise
+        self.has_fts = True
+
+    def _compact(self):
+        cutoff = time.time() - self.retention
+        with self._writer:
+            self._writer.execute('DELETE FROM urls WHERE last_visit < ?', (cutoff,))
+            count = self._writer.execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+            if count > self.max_entries:
+                self._writer.execute(
+                    'DELETE FROM urls WHERE id IN (SELECT id FROM urls ORDER BY rank LIMIT ?)',
+                    (count - self.max_entries,))
+        if self.has_fts:
+            with self._writer:
+                self._writer.execute("INSERT INTO urls_fts (urls_fts) VALUES ('optimize')")
+        self._writer.execute('PRAGMA incremental_vacuum')
+        self._writer.execute('PRAGMA optimize')
+        self._writer.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def complete(self, text, limit=10):
+        # URL-bar completions: prefix matches on the stripped URL first, then
+        # title/word matches, both ordered by frecency
+        prefix = strip_url(text.strip())
+        if not prefix:
+            return []
+        with self._reader_lock:
+            rows = self._prefix_rows(prefix, 'url, title', limit)
+            if len(rows) < limit:
+                seen = {url for url, _ in rows}
+                rows += [row for row in self._search_words(text, limit) if row[0] not in seen]
+        return rows[:limit]
+
+    def predict(self, text, candidates=20):
+        # Only a bare host prefix ("git", "github.co") is a prediction; once a
+        # path or a space is typed the user knows where they are going
+        prefix = strip_url(text.strip())
+        if not prefix or '/' in prefix or ' ' in prefix:
+            return None
+        with self._reader_lock:
+            rows = self._prefix_rows(prefix, 'url, stripped, visit_count, rank', candidates)
+        if not rows:
+            return None
+        now = time.time() * DECAY
+        sites = {}
+        for url, stripped, visits, rank in rows:
+            host = stripped.split('/', 1)[0]
+            score = math.exp(rank - now)
+            if host in sites:
+                sites[host][0] += score
+                sites[host][1] += visits
+            else:
+                # Rows come most frecent first, so this is the site's best page
+                sites[host] = [score, visits, url]
+        score, visits, url = max(sites.values(), key=lambda site: site[0])
+        parts = urlsplit(url)
+        return Prediction(url, f'{parts.scheme}://{parts.netloc}/', score / sum(site[0] for site in sites.values()),
+                          visits)
+
+    def _prefix_rows(self, prefix, columns, limit):
+        # Callers hold the reader lock
+        bounds = (prefix, prefix + '\uffff')
+        matching = self._reader.execute(
+            'SELECT COUNT(*) FROM (SELECT 1 FROM urls INDEXED BY urls_stripped '
+            'WHERE stripped >= ? AND stripped < ? LIMIT ?)',
+            bounds + (DENSE_PREFIX_ROWS,)).fetchone()[0]
+        index = 'urls_rank' if matching >= DENSE_PREFIX_ROWS else 'urls_stripped'
+        return self._reader.execute(
+            f'SELECT {columns} FROM urls INDEXED BY {index} WHERE stripped >= ? AND stripped < ? '
+            'ORDER BY rank DESC LIMIT ?',
+            bounds + (limit,)).fetchall()
+
+    def _search_words(self, text, limit):
+        # Callers hold the reader lock
+        words = [word for word in text.replace('"', ' ').split() if word]
+        if not words:
+            return []
+        if not self.has_fts:
+            pattern = f'%{words[0]}%'
+            return self._reader.execute(
+                'SELECT url, title FROM urls WHERE title LIKE ? OR stripped LIKE ? ORDER BY rank DESC LIMIT ?',
+                (pattern, pattern, limit)).fetchall()
+        # Rows count as a match when every word starts one of their tokens,
+        # as in an FTS prefix query
+        patterns = [re.compile(r'(?<![^\W_])' + re.escape(fold(word))) for word in words]
+        conditions = ' AND '.join('(title LIKE ? OR stripped LIKE ?)' for _ in words)
+        # LIKE narrows the most frecent rows down cheaply
+        candidates = self._reader.execute(
+            'SELECT url, title, stripped FROM (SELECT url, title, stripped, rank FROM urls INDEXED BY urls_rank '
+            f'ORDER BY rank DESC LIMIT ?) WHERE {conditions} ORDER BY rank DESC',
+            [FRECENT_ROWS] + [f'%{word}%' for word in words for _ in range(2)])
+        rows = self._matching_rows(candidates, patterns, limit, set())
+        if len(rows) < limit:
+            # Everything the walk missed ranks below the rows it read, so
+            # these go after its hits. Words are cut to the longest indexed
+            # prefix, so the query never merges every word sharing a long
+            # prefix, and the patterns check the rest
+            query = ' '.join(f'"{word[:FTS_PREFIX_CHARS]}"*' for word in words)
+            candidates = self._reader.execute(
+                'SELECT urls.url, urls.title, urls.stripped FROM (SELECT rowid FROM urls_fts WHERE urls_fts MATCH ? '
+                'ORDER BY rowid DESC LIMIT ?) AS hits JOIN urls ON urls.id = hits.rowid ORDER BY urls.rank DESC',
+                (query, FTS_CANDIDATES))
+            rows += self._matching_rows(candidates, patterns, limit - len(rows), {url for url, _ in rows})
+        return rows
+
+    def _matching_rows(self, candidates, patterns, limit, seen):
+        rows = []
+        for url, title, stripped in candidates:
+            text = fold(f'{title} {stripped}')
+            if url not in seen and all(pattern.search(text) for pattern in patterns):
+                rows.append((url, title))
+                if len(rows) == limit:
+                    break
+        return rows
+
+    def top(self, limit):
+        with self._reader_lock:
+            return self._reader.execute(
+                'SELECT url, title FROM urls ORDER BY rank DESC LIMIT ?', (limit,)).fetchall()
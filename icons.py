@@ -0,0 +1,136 @@
+import hashlib
+import os
+
+from PyQt5.QtCore import QRectF, QSize, Qt
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QIcon, QImageReader, QPainter, QPixmap
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+# Every icon is built for these device pixel ratios
+SCALES = (1, 2)
+
+# Drawn in place of an asset that is missing or cannot be decoded, keyed by
+# the file name without its extension
+GLYPHS = {
+    'calendar': '▦',
+    'darkmode': '☾',
+    'fullscreen': '⛶',
+    'home': '⌂',
+    'lightmode': '☀',
+    'newtab': '+',
+    'pie_chart': '◔',
+    'stats': '≡',
+    'tab_icon': '▢',
+    'voicesearch': '●',
+    'vpn': '⛨',
+    'zoomin': '+',
+    'zoomout': '−',
+}
+GLYPH_BACKGROUND = '#FFA45B'
+GLYPH_COLOR = '#FFFFFF'
+
+
+class IconRegistry:
+    # Icons are built once per (asset, size): the full-size image is decoded
+    # straight to each device pixel ratio's size and the results are kept as
+    # small PNGs in the cache directory, named after the asset's size and
+    # modification time, so later starts never decode the original. The
+    # same QIcon is handed to every widget that asks for it.
+    def __init__(self, cache_dir, asset_dir=ASSET_DIR):
+        self.cache_dir = cache_dir
+        self.asset_dir = asset_dir
+        self._icons = {}
+        self.built = 0
+        self.missing = set()
+
+    def icon(self, name, size):
+        key = (name, size)
+        icon = self._icons.get(key)
+        if icon is None:
+            icon = self._icons[key] = self._load(name, size)
+        return icon
+
+    def _load(self, name, size):
+        path = os.path.join(self.asset_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.missing.add(name)
+            return self.glyph(name, size)
+        digest = hashlib.sha1(f'{name}:{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8')).hexdigest()[:12]
+        stem = os.path.splitext(name)[0]
+        icon = QIcon()
+        for scale in SCALES:
+            pixels = size * scale
+            cached = os.path.join(self.cache_dir, f'{stem}-{digest}-{pixels}.png')
+            if os.path.exists(cached):
+                # Loaded on first paint, and only the variant the screen needs
+                icon.addFile(cached, QSize(pixels, pixels))
+                continue
+            image = self._build(path, cached, pixels)
+            if image is None:
+                self.missing.add(name)
+                return self.glyph(name, size)
+            icon.addPixmap(QPixmap.fromImage(image))
+        return icon
+
+    def _build(self, path, cached, pixels):
+        reader = QImageReader(path)
+        source = reader.size()
+        if source.isValid():
+            # JPEG decodes straight to the smaller size, skipping the full image
+            reader.setScaledSize(source.scaled(pixels, pixels, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            print(f"Could not decode {path}: {reader.errorString()}")
+            return None
+        if image.width() > pixels or image.height() > pixels:
+            image = image.scaled(pixels, pixels, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.built += 1
+        # Without a cache the icon still works, it is just built again next time
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = cached + '.tmp'
+            if image.save(tmp_path, 'PNG'):
+                os.replace(tmp_path, cached)
+                self.prune(cached)
+        except OSError as e:
+            print(f"Could not cache icon {cached}: {e}")
+        return image
+
+    def prune(self, cached):
+        # Drops this size's variant built from an older version of the asset
+        name = os.path.basename(cached)
+        stem, _, suffix = name.rsplit('-', 2)
+        for entry in os.scandir(self.cache_dir):
+            parts = entry.name.rsplit('-', 2)
+            if entry.name != name and len(parts) == 3 and parts[0] == stem and parts[2] == suffix:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def glyph(self, name, size):
+        stem = os.path.splitext(os.path.basename(name))[0]
+        text = GLYPHS.get(stem) or stem[:1].upper() or '?'
+        icon = QIcon()
+        for scale in SCALES:
+            pixels = size * scale
+            font = QFont()
+            font.setPixelSize(max(6, pixels * 3 // 5))
+            font.setBold(True)
+            # Symbols the font cannot draw fall back to the asset's initial
+            if not QFontMetrics(font).inFontUcs4(ord(text[0])):
+                text = stem[:1].upper() or '?'
+            pixmap = QPixmap(pixels, pixels)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(GLYPH_BACKGROUND))
+            painter.drawRoundedRect(QRectF(0, 0, pixels, pixels), pixels / 4, pixels / 4)
+            painter.setPen(QColor(GLYPH_COLOR))
+            painter.setFont(font)
+            painter.drawText(QRectF(0, 0, pixels, pixels), Qt.AlignCenter, text)
+            painter.end()
+            icon.addPixmap(pixmap)
+        return icon
@@ -0,0 +1,130 @@
+import getpass
+import json
+import os
+import tempfile
+import time
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import QUrl
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+OPEN = 'open'
+NEW_WINDOW = 'new-window'
+ACTIONS = (OPEN, NEW_WINDOW)
+
+# The first instance holds the lock a little before it starts listening, so a
+# launch that finds the lock taken keeps trying to connect for this long
+CONNECT_TIMEOUT = 5.0
+REPLY_TIMEOUT_MS = 2000
+# A connection that sends this much without a newline is dropped
+MAX_MESSAGE = 1024 * 1024
+
+
+def server_name():
+    # One browser per user; other users on the machine get their own
+    try:
+        user = getpass.getuser()
+    except (KeyError, OSError):
+        user = str(os.getuid())
+    return f'goon-{user}'
+
+
+def resolve_urls(urls, directory):
+    # Relative paths mean files in the directory the launch came from, not
+    # the running browser's
+    return [QUrl.fromUserInput(url, directory).toString() for url in urls]
+
+
+class SingleInstance(QtCore.QObject):
+    # The first browser a user starts holds a lock file and listens on a local
+    # socket; later launches find the lock taken, send their URLs to the
+    # socket and exit. The lock dies with its process, so after a crash the
+    # next launch takes it over, and only the lock holder ever removes a
+    # socket file left behind.
+    received = QtCore.pyqtSignal(dict)
+
+    def __init__(self, name=None, parent=None):
+        super().__init__(parent)
+        self.name = name or server_name()
+        directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+        self._lock = QtCore.QLockFile(os.path.join(directory, self.name + '.lock'))
+        # Stale only once the process that took it is gone, however old
+        self._lock.setStaleLockTime(0)
+        self._locked = False
+        self._server = None
+
+    def acquire(self):
+        # True when no other instance is running
+        self._locked = self._lock.tryLock(0)
+        if not self._locked and self._lock.error() != QtCore.QLockFile.LockFailedError:
+            print("Could not take the instance lock, other launches will start their own browser")
+            return True
+        return self._locked
+
+    def forward(self, urls, action=OPEN, timeout=CONNECT_TIMEOUT):
+        # Hands the request to the running instance; False if it did not answer
+        message = json.dumps({'action': action, 'urls': list(urls)}).encode('utf-8') + b'\n'
+        deadline = time.monotonic() + timeout
+        socket = QLocalSocket()
+        while True:
+            socket.connectToServer(self.name)
+            if socket.waitForConnected(REPLY_TIMEOUT_MS):
+                break
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        socket.write(message)
+        if not socket.waitForBytesWritten(REPLY_TIMEOUT_MS):
+            return False
+        while not socket.canReadLine():
+            if not socket.waitForReadyRead(REPLY_TIMEOUT_MS):
+                return False
+        reply = bytes(socket.readLine()).strip()
+        socket.disconnectFromServer()
+        return reply == b'ok'
+
+    def listen(self):
+        # Called once the browser can take requests
+        if self._locked:
+            QLocalServer.removeServer(self.name)
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.UserAccessOption)
+        self._server.newConnection.connect(self.on_new_connection)
+        if not self._server.listen(self.name):
+            print(f"Could not listen for other launches: {self._server.errorString()}")
+            return False
+        return True
+
+    def release(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if self._locked:
+            self._lock.unlock()
+            self._locked = False
+
+    def on_new_connection(self):
+        while self._server.hasPendingConnections():
+            connection = self._server.nextPendingConnection()
+            connection.readyRead.connect(lambda connection=connection: self.on_ready_read(connection))
+            connection.disconnected.connect(connection.deleteLater)
+            self.on_ready_read(connection)
+
+    def on_ready_read(self, connection):
+        if not connection.canReadLine():
+            if connection.bytesAvailable() > MAX_MESSAGE:
+                connection.abort()
+            return
+        try:
+            request = json.loads(bytes(connection.readLine()))
+            urls = request['urls']
+            if (request['action'] not in ACTIONS or not isinstance(urls, list)
+                    or not all(isinstance(url, str) for url in urls)):
+                raise ValueError(request)
+        except (ValueError, KeyError, TypeError):
+            connection.write(b'error\n')
+            connection.flush()
+            return
+        self.received.emit({'action': request['action'], 'urls': urls})
+        connection.write(b'ok\n')
+        connection.flush()
@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+
+from adblock import DEFAULT_LIST_URL
+from batch import FORMATS
+from datasaver import parse_policy
+from instance import NEW_WINDOW, OPEN, SingleInstance, resolve_urls
+from processes import RUNAWAY_CPU, RUNAWAY_RSS_MB
+from responsiveness import STALL_THRESHOLD_MS
+
+# Everything a launch needs before the browser itself is imported: main.py
+# runs this ahead of QtWebEngine, so a launch that only hands its URLs to the
+# running browser never loads it
+
+
+def data_saver_policy(text):
+    try:
+        return parse_policy(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+
+def data_saver_site(text):
+    host, _, policy = text.partition(':')
+    if not host or not policy:
+        raise argparse.ArgumentTypeError("expected HOST:TYPE=ACTION,...")
+    return host, data_saver_policy(policy)
+
+
+
+def batch_formats(text):
+    formats = [part.strip() for part in text.split(',') if part.strip()]
+    unknown = [part for part in formats if part not in FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(f"expected some of {', '.join(FORMATS)}")
+    return formats
+
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="goon")
+    parser.add_argument("urls", nargs="*", metavar="URL",
+                        help="pages or files to open; handed to the running browser if there is one")
+    parser.add_argument("--new-window", action="store_true",
+                        help="bring the running browser forward with a new tab when no URL is given")
+    parser.add_argument("--new-instance", action="store_true",
+                        help="start a separate browser even if one is already running")
+    parser.add_argument("--easylist", default=DEFAULT_LIST_URL, metavar="PATH_OR_URL",
+                        help="local filter list or mirror URL to use instead of easylist.to")
+    parser.add_argument("--max-live-tabs", type=int, default=10, metavar="N",
+                        help="discard the least recently used background tabs beyond N loaded tabs")
+    parser.add_argument("--memory-budget", type=int, default=0, metavar="MB",
+                        help="discard background tabs while renderer memory exceeds MB (0 disables)")
+    parser.add_argument("--debug-scripts", action="store_true",
+                        help="print which user scripts were injected on every navigation")
+    parser.add_argument("--voice-backend", choices=["google", "vosk"], default="google",
+                        help="speech recognizer for voice search; vosk works offline")
+    parser.add_argument("--vosk-model", metavar="PATH",
+                        help="directory of the Vosk model used by --voice-backend vosk")
+    parser.add_argument("--history-days", type=int, default=90, metavar="DAYS",
+                        help="forget pages not visited for DAYS days")
+    parser.add_argument("--history-max-entries", type=int, default=1000000, metavar="N",
+                        help="keep at most N history entries, dropping the least frecent")
+    parser.add_argument("--restore", dest="restore", action="store_true", default=True,
+                        help="reopen the tabs from the last session (default)")
+    parser.add_argument("--no-restore", dest="restore", action="store_false",
+                        help="start with a single new tab instead of the last session")
+    parser.add_argument("--proxy", action="append", metavar="URL",
+                        help="add an http:// or socks5:// proxy to the VPN pool (repeatable)")
+    parser.add_argument("--proxy-bypass", action="append", metavar="PATTERN",
+                        help="never proxy this host, *.domain or CIDR range (repeatable)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each startup phase took once the window is painted")
+    parser.add_argument("--summary-backend", choices=["gemini", "ollama"], default="gemini",
+                        help="model used by Summarize Page; gemini reads GOOGLE_API_KEY")
+    parser.add_argument("--summary-model", metavar="NAME",
+                        help="model name to ask instead of the backend's default")
+    parser.add_argument("--summary-url", metavar="URL",
+                        help="address of the server used by --summary-backend ollama")
+    parser.add_argument("--max-downloads", type=int, default=3, metavar="N",
+                        help="run at most N downloads at once, queueing the rest")
+    parser.add_argument("--download-limit", type=int, default=0, metavar="KB/S",
+                        help="cap the total download bandwidth (0 for no limit)")
+    parser.add_argument("--data-saver", dest="data_saver", action="store_true", default=None,
+                        help="turn the data saver on (it stays as last set otherwise)")
+    parser.add_argument("--no-data-saver", dest="data_saver", action="store_false",
+                        help="turn the data saver off")
+    parser.add_argument("--data-saver-policy", type=data_saver_policy, metavar="TYPE=ACTION,...",
+                        help="default data saver policy, e.g. image=defer,media=block,font=block; "
+                             "types not listed are allowed")
+    parser.add_argument("--data-saver-site", type=data_saver_site, action="append", metavar="HOST:TYPE=ACTION,...",
+                        help="data saver policy for one site and its subdomains, types not listed are "
+                             "allowed (repeatable)")
+    parser.add_argument("--runaway-cpu", type=float, default=RUNAWAY_CPU, metavar="PERCENT",
+                        help="flag tabs whose renderer stays above PERCENT of a core")
+    parser.add_argument("--runaway-memory", type=int, default=RUNAWAY_RSS_MB, metavar="MB",
+                        help="flag tabs whose renderer stays above MB of resident memory")
+    parser.add_argument("--watch-stalls", action="store_true",
+                        help="log event-loop stalls with the GUI thread's stack to stalls.log in the profile "
+                             "directory and print lag percentiles on exit")
+    parser.add_argument("--stall-threshold", type=int, default=STALL_THRESHOLD_MS, metavar="MS",
+                        help="with --watch-stalls, what counts as a stall")
+    parser.add_argument("--dark-mode", action="store_true",
+                        help="start with dark mode on")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a window; needs --batch, and the browser must not be running")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="with --headless, render every URL listed in FILE (one per line) and exit")
+    parser.add_argument("--batch-output", default="batch-output", metavar="DIR",
+                        help="directory for rendered pages and their manifest.jsonl")
+    parser.add_argument("--batch-format", type=batch_formats, default=["pdf"], metavar="FORMAT,...",
+                        help=f"what to save for each page: {', '.join(FORMATS)} (default pdf)")
+    parser.add_argument("--batch-concurrency", type=int, default=4, metavar="N",
+                        help="render N pages at a time")
+    parser.add_argument("--batch-timeout", type=float, default=30.0, metavar="SECONDS",
+                        help="give up on a page that is not loaded and rendered in SECONDS")
+    parser.add_argument("--batch-retries", type=int, default=1, metavar="N",
+                        help="try a failed or timed out page N more times")
+    # Leave Qt's own options (e.g. -platform) for QApplication
+    args = parser.parse_known_args(argv[1:])[0]
+    if args.headless != bool(args.batch):
+        parser.error("--headless and --batch go together")
+    # Relative paths mean files in the directory the launch came from, which
+    # the running browser does not know
+    args.urls = resolve_urls(args.urls, os.getcwd())
+    return args
+
+
+def claim_instance(args):
+    # The lock of the first browser, or None with --new-instance; a later
+    # launch hands its URLs to the running browser and exits here. A
+    # --headless batch renders with the same profile directory and history,
+    # which two browsers cannot share, so it needs the lock for itself.
+    if args.new_instance and not args.headless:
+        return None
+    instance = SingleInstance()
+    if instance.acquire():
+        return instance
+    if args.headless:
+        print("A browser is already running with this profile; close it before running a --headless batch")
+        sys.exit(1)
+    if instance.forward(args.urls, NEW_WINDOW if args.new_window else OPEN):
+        sys.exit(0)
+    print("The running browser, or a --headless batch, did not answer; close it or pass --new-instance")
+    sys.exit(1)
@@ -1,25 +1,425 @@
 import sys
-import speech_recognition as sr
-import darkdetect
+import os
+import time
+# Taken before the heavy imports below so --profile-startup can time them
+STARTED_AT = time.perf_counter()
+from launch import claim_instance, parse_args
+if __name__ == "__main__":
+    # Settled before QtWebEngine is imported, so a launch that only hands its
+    # URLs to the running browser exits without loading it
+    LAUNCH_ARGS = parse_args(sys.argv)
+    INSTANCE = claim_instance(LAUNCH_ARGS)
+import json
+import secrets
+import signal
+import threading
+from collections import OrderedDict
 from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QTabWidget, QWidget, QMainWindow, 
-                             QAction, QToolBar, QDialog, QListWidget, QStyleFactory, QFrame, QLabel, QMessageBox)
+                             QAction, QToolBar, QDialog, QListView, QStyleFactory, QFrame, QLabel, QMessageBox,
+                             QCompleter, QFileDialog, QTableWidget, QTableWidgetItem, QHeaderView, QPlainTextEdit,
+                             QSpinBox, QListWidget, QListWidgetItem)
 from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings, QWebEngineProfile, QWebEnginePage
-from PyQt5.QtWebEngineCore import QWebEngineUrlRequestInterceptor
-from PyQt5.QtCore import QUrl, Qt, QTimer
-from PyQt5.QtGui import QIcon, QFont
-from PyQt5.QtNetwork import QNetworkProxy, QNetworkProxyFactory, QNetworkAccessManager, QNetworkReply
-from adblockparser import AdblockRules
-import requests
-import google.generativeai as genai
+from PyQt5.QtWebEngineCore import (QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo, QWebEngineUrlScheme,
+                                   QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob)
+from PyQt5.QtCore import QUrl, Qt, QTimer, QStandardPaths, QBuffer
+from PyQt5.QtGui import QFont
+from PyQt5.QtNetwork import (QNetworkProxy, QNetworkProxyFactory, QNetworkAccessManager, QNetworkReply,
+                             QNetworkCookie)
+from adblock import AdblockEngine, RuleCache, fetch_rule_list, DEFAULT_LIST_URL
+from batch import BatchRenderer, read_url_list
+from voice import VoiceSession, Speaker, RecognitionError, create_backend, parse_voice_command
+from datasaver import DataSaver, SavedBytes, ALLOW, BLOCK, DEFER, SAVER_TYPES
+from downloads import DownloadManager, RUNNING, PAUSED, QUEUED, FAILED, DONE
+from history import HistoryStore
+from icons import IconRegistry
+from instance import NEW_WINDOW
+from newtab import NEW_TAB_URL, SCHEME, TOP_SITES, ThumbnailCache, render_new_tab, top_sites
+from session import SessionStore
+from processes import ProcessSampler, ReloadBudget, RUNAWAY_CPU, RUNAWAY_RSS_MB
+from proxies import ProxyPool, ProxyRelay, DEFAULT_PROXIES, DEFAULT_BYPASS
+from responsiveness import StallWatchdog
+from startup import StartupTimeline
+from tabindex import TabIndexer
+from speculation import SpeculativeLoader
+from telemetry import RequestTelemetry, SITE, HOST, TYPE, TAB_ID
+from summarize import SummaryCache, SummaryError, SummaryJob, summary_key
+from summarize import create_backend as create_summary_backend
+from spotlight import FuzzyIndex, PaletteEntry, PaletteModel, ACTION, TAB, RECENT, SEARCH
+from userscripts import (UserScript, UserScriptRegistry, DOCUMENT_CREATION, DOCUMENT_READY,
+                         APPLICATION_WORLD)
 import urllib.parse
-import subprocess
+
+YOUTUBE_FULLSCREEN_JS = """
+(function() {
+    var style = document.createElement('style');
+    style.textContent = `
+        .ytp-fullscreen-button { display: none !important; }
+        .custom-fullscreen-button {
+            position: absolute;
+            bottom: 0;
+            right: 0;
+            width: 48px;
+            height: 48px;
+            background-color: rgba(0, 0, 0, 0.5);
+            color: white;
+            display: flex;
+            justify-content: center;
+            align-items: center;
+            cursor: pointer;
+            z-index: 1000;
+        }
+    `;
+    document.head.appendChild(style);
+    
+    var button = document.createElement('div');
+    button.className = 'custom-fullscreen-button';
+    button.innerHTML = '⛶';
+    button.onclick = function() {
+        var video = document.querySelector('video');
+        if (video) {
+            if (video.requestFullscreen) {
+                video.requestFullscreen();
+            } else if (video.webkitRequestFullscreen) {
+                video.webkitRequestFullscreen();
+            }
+        }
+    };
+    
+    var observer = new MutationObserver(function(mutations) {
+        var videoContainer = document.querySelector('.html5-video-player');
+        if (videoContainer && !videoContainer.querySelector('.custom-fullscreen-button')) {
+            videoContainer.appendChild(button);
+            observer.disconnect();
+        }
+    });
+    
+    observer.observe(document.body, { childList: true, subtree: true });
+})();
+"""
+
+# Marker fragment set by search_and_play_youtube; only those result pages autoplay
+YOUTUBE_AUTOPLAY_HASH = "#goon-autoplay"
+
+YOUTUBE_AUTOPLAY_JS = """
+(function() {
+    if (location.hash !== '%s') {
+        return;
+    }
+    function playFirst() {
+        var videos = document.querySelectorAll('a#video-title');
+        if (videos.length > 0) {
+            videos[0].click();
+            return true;
+        }
+        return false;
+    }
+    if (playFirst()) {
+        return;
+    }
+    // Results render asynchronously, so wait for the first one to appear
+    var observer = new MutationObserver(function() {
+        if (playFirst()) {
+            observer.disconnect();
+        }
+    });
+    observer.observe(document.body, { childList: true, subtree: true });
+    setTimeout(function() { observer.disconnect(); }, 10000);
+})();
+""" % YOUTUBE_AUTOPLAY_HASH
+
+# Dark mode is one stylesheet keyed on a class on <html>, so toggling it is a
+# single class flip per tab instead of restyling every node
+DARK_MODE_CLASS = "goon-dark"
+# Runtime toggles reach frames as messages; only ones carrying this token,
+# new for every run of the browser, are obeyed
+DARK_MODE_TOKEN = secrets.token_hex(16)
+
+DARK_MODE_CSS = """
+html.goon-dark { color-scheme: dark; }
+html.goon-dark, html.goon-dark body,
+html.goon-dark *:not(img):not(video):not(canvas):not(svg):not(svg *) {
+    background-color: #181818 !important;
+    color: #FFFFFF !important;
+    border-color: #303030 !important;
+}
+html.goon-dark a, html.goon-dark a * { color: #3EA6FF !important; }
+html.goon-dark input, html.goon-dark textarea, html.goon-dark select {
+    background-color: #212121 !important;
+    color: #FFFFFF !important;
+}
+"""
+
+DARK_MODE_JS = """
+(function() {
+    var enabled = %s;
+    function apply() {
+        var root = document.documentElement;
+        if (!root) {
+            return false;
+        }
+        if (!document.getElementById('goon-dark-style')) {
+            var style = document.createElement('style');
+            style.id = 'goon-dark-style';
+            style.textContent = %s;
+            root.appendChild(style);
+        }
+        root.classList.toggle('%s', enabled);
+        return true;
+    }
+    if (!apply()) {
+        // At document creation <html> may not exist yet; wait for it once
+        var observer = new MutationObserver(function() {
+            if (apply()) {
+                observer.disconnect();
+            }
+        });
+        observer.observe(document, { childList: true });
+    }
+    // Runtime toggles arrive as messages so frames of any origin get them;
+    // they are only taken from the top window and with this run's token, so
+    // a frame, or a page that never saw a toggle, cannot post one
+    var token = %s;
+    window.addEventListener('message', function(event) {
+        var data = event.data;
+        if (event.source === window.top && data && data.goonDarkModeToken === token
+                && typeof data.goonDarkMode === 'boolean') {
+            enabled = data.goonDarkMode;
+            apply();
+        }
+    });
+})();
+"""
+
+# Flips dark mode in an open page: the main document at once, then every
+# frame, nested ones included, through the listener DARK_MODE_JS installs
+DARK_MODE_TOGGLE_JS = """
+(function(enabled) {
+    if (document.documentElement) {
+        document.documentElement.classList.toggle('%s', enabled);
+    }
+    (function post(frame) {
+        for (var i = 0; i < frame.frames.length; i++) {
+            frame.frames[i].postMessage({ goonDarkMode: enabled, goonDarkModeToken: %s }, '*');
+            post(frame.frames[i]);
+        }
+    })(window);
+})(%s);
+"""
+
+# Element-hiding stylesheet for the page's site, see WebPage
+COSMETIC_FILTERS_JS = """
+(function() {
+    var css = %s;
+    function apply() {
+        var root = document.documentElement;
+        if (!root) {
+            return false;
+        }
+        var style = document.createElement('style');
+        style.id = 'goon-cosmetic-filters';
+        style.textContent = css;
+        root.appendChild(style);
+        return true;
+    }
+    if (!apply()) {
+        var observer = new MutationObserver(function() {
+            if (apply()) {
+                observer.disconnect();
+            }
+        });
+        observer.observe(document, { childList: true });
+    }
+})();
+"""
+
+# The readable text of a page: its text blocks in order, leaving out
+# navigation, headers, footers and forms; run in the application world so
+# page scripts cannot interfere
+READABLE_TEXT_JS = """
+(function() {
+    var blocks = 'h1, h2, h3, h4, h5, h6, p, li, blockquote, pre, figcaption, td, dd, dt';
+    var skip = 'nav, header, footer, aside, form, [role=navigation], [aria-hidden=true]';
+    var root = document.querySelector('article, main, [role=main]') || document.body;
+    if (!root) {
+        return {title: document.title, text: ''};
+    }
+    var lines = [];
+    root.querySelectorAll(blocks).forEach(function(element) {
+        var parent = element.parentElement && element.parentElement.closest(blocks);
+        if ((parent && root.contains(parent)) || element.closest(skip)) {
+            return;
+        }
+        var text = element.innerText.trim();
+        if (text) {
+            lines.push(text);
+        }
+    });
+    return {title: document.title, text: lines.length ? lines.join('\\n') : root.innerText};
+})();
+"""
+
+# Data saver on the page side: deferred images and frames get native lazy
+# loading, media never preloads, and blocked media gets a click-to-load
+# button that tells the page's interceptor to let its sources through
+DATA_SAVER_ALLOW = "goon-data-saver-allow:"
+
+DATA_SAVER_JS = """
+(function() {
+    var config = %s;
+    function placeholder(element) {
+        var button = document.createElement('button');
+        button.textContent = 'Data saver: click to load this ' + element.tagName.toLowerCase();
+        button.style.cssText = 'display: block; padding: 12px 20px; margin: 8px 0; border: 0; ' +
+            'border-radius: 10px; background: #FFA45B; color: #FFFFFF; font-size: 14px; cursor: pointer;';
+        button.addEventListener('click', function(event) {
+            event.preventDefault();
+            event.stopPropagation();
+            var sources = [element.getAttribute('src')];
+            element.querySelectorAll('source').forEach(function(source) {
+                sources.push(source.getAttribute('src'));
+            });
+            sources.forEach(function(source) {
+                if (source) {
+                    console.log('%s' + new URL(source, document.baseURI).href);
+                }
+            });
+            button.remove();
+            element.style.display = element.dataset.goonDisplay;
+            element.preload = 'auto';
+            element.load();
+        });
+        element.dataset.goonDisplay = element.style.display;
+        element.style.display = 'none';
+        element.parentNode.insertBefore(button, element);
+    }
+    function apply() {
+        if (config.lazyImages) {
+            document.querySelectorAll('img:not([loading])').forEach(function(image) {
+                image.loading = 'lazy';
+            });
+        }
+        if (config.lazyFrames) {
+            document.querySelectorAll('iframe:not([loading])').forEach(function(frame) {
+                frame.loading = 'lazy';
+            });
+        }
+        if (config.media !== 'allow') {
+            document.querySelectorAll('video:not([data-goon-data-saver]), audio:not([data-goon-data-saver])')
+                .forEach(function(element) {
+                    element.dataset.goonDataSaver = '1';
+                    element.preload = 'none';
+                    element.autoplay = false;
+                    if (config.media === 'block' && element.parentNode) {
+                        placeholder(element);
+                    }
+                });
+        }
+    }
+    new MutationObserver(apply).observe(document, { childList: true, subtree: true });
+})();
+"""
+
+_data_saver_scripts = {}
+
+def data_saver_script(policy):
+    # One script per distinct policy; None when it would change nothing
+    key = tuple(sorted(policy.items()))
+    if key not in _data_saver_scripts:
+        config = {
+            'lazyImages': policy.get('image') == DEFER,
+            'lazyFrames': policy.get('subdocument') == DEFER,
+            'media': policy.get('media', ALLOW),
+        }
+        script = None
+        if config['lazyImages'] or config['lazyFrames'] or config['media'] != ALLOW:
+            script = UserScript("data-saver", DATA_SAVER_JS % (json.dumps(config), DATA_SAVER_ALLOW),
+                                ["<all_urls>"], DOCUMENT_CREATION).to_qt_script()
+        _data_saver_scripts[key] = script
+    return _data_saver_scripts[key]
+
+class DataSaverInterceptor(QWebEngineUrlRequestInterceptor):
+    # One per page, so what it blocks is counted for that tab; the page's
+    # interceptor runs it on the GUI thread after the ad-block decision
+    def __init__(self, data_saver, parent=None):
+        super().__init__(parent)
+        self.data_saver = data_saver
+        self.saved = SavedBytes()
+        # Media the user clicked to load
+        self.allowed = set()
+
+    def interceptRequest(self, info):
+        data_saver = self.data_saver
+        if not data_saver.enabled:
+            return
+        resource_type = RESOURCE_TYPE_OPTIONS.get(info.resourceType())
+        if resource_type not in SAVER_TYPES:
+            return
+        if data_saver.action(info.firstPartyUrl().host(), resource_type) != BLOCK:
+            return
+        if self.allowed and info.requestUrl().toString() in self.allowed:
+            return
+        info.block(True)
+        self.saved.add(resource_type)
+
+class PageInterceptor(QWebEngineUrlRequestInterceptor):
+    # Installed on each page rather than on the profile, so every request is
+    # known to come from this page's tab: the shared ad-block rules decide
+    # and record it for the tab, then the data saver sees what is left
+    def __init__(self, adblock, data_saver, parent=None):
+        super().__init__(parent)
+        self.adblock = adblock
+        self.data_saver = DataSaverInterceptor(data_saver, self)
+        # id() of the BrowserTab showing the page; None for prerendered and
+        # batch pages until one is shown in a tab
+        self.tab = None
+
+    def interceptRequest(self, info):
+        if not self.adblock.interceptRequest(info, self.tab):
+            self.data_saver.interceptRequest(info)
+
+class WebPage(QWebEnginePage):
+    # Cosmetic filters and the data saver depend on the site, so a
+    # profile-wide script cannot carry them; the page swaps its own scripts
+    # in before each main-frame navigation, in time for the new document's
+    # creation
+    def __init__(self, profile, cosmetic_script, data_saver, adblock, parent=None):
+        super().__init__(profile, parent)
+        self.cosmetic_script = cosmetic_script
+        self.data_saver = data_saver
+        self.interceptor = PageInterceptor(adblock, data_saver, self)
+        self.data_saver_interceptor = self.interceptor.data_saver
+        self.setUrlRequestInterceptor(self.interceptor)
+
+    def acceptNavigationRequest(self, url, navigation_type, is_main_frame):
+        if is_main_frame:
+            scripts = self.scripts()
+            for name in ("cosmetic-filters", "data-saver"):
+                previous = scripts.findScript(name)
+                if not previous.isNull():
+                    scripts.remove(previous)
+            script = self.cosmetic_script(url.host())
+            if script is not None:
+                scripts.insert(script)
+            if self.data_saver.enabled:
+                script = data_saver_script(self.data_saver.policy_for(url.host()))
+                if script is not None:
+                    scripts.insert(script)
+        return super().acceptNavigationRequest(url, navigation_type, is_main_frame)
+
+    def javaScriptConsoleMessage(self, level, message, line, source):
+        if message.startswith(DATA_SAVER_ALLOW):
+            self.data_saver_interceptor.allowed.add(message[len(DATA_SAVER_ALLOW):])
+        else:
+            super().javaScriptConsoleMessage(level, message, line, source)
 
 class WebView(QWebEngineView):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.settings().setAttribute(QWebEngineSettings.FullScreenSupportEnabled, True)
         self.page().fullScreenRequested.connect(self.handle_fullscreen_request)
+        # Page last recorded in history, without its fragment
+        self.visited_url = None
 
     def handle_fullscreen_request(self, request):
         request.accept()
@@ -28,28 +428,316 @@ class WebView(QWebEngineView):
         else:
             self.showNormal()
 
-class CustomProxyFactory(QNetworkProxyFactory):
-    def __init__(self, proxy):
-        super().__init__()
-        self.proxy = proxy
+class BrowserTab(QWidget):
+    # Lifecycle of a tab's renderer: UNLOADED tabs have never created a view,
+    # DISCARDED ones had theirs released to stay within the memory budget,
+    # CRASHED ones still have a view but its renderer process died
+    UNLOADED = 'unloaded'
+    LIVE = 'live'
+    DISCARDED = 'discarded'
+    CRASHED = 'crashed'
 
-    def queryProxy(self, query=None):
-        return [self.proxy]
+    def __init__(self, url, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.view = None
+        self.state = self.UNLOADED
+        self.url = url
+        self.title = "New Tab"
+        self.zoom = 1.0
+        self.scroll_position = QtCore.QPointF()
+        self.last_active = 0.0
+        # Renderer health, see BrowserApp.check_processes()
+        self.runaway = False
+        self.killed = False
+        self.reload_budget = ReloadBudget()
+        self.reload_timer = None
+
+    def status(self):
+        if self.runaway:
+            return "Using a lot of CPU or memory"
+        return {
+            self.UNLOADED: "Not loaded yet",
+            self.LIVE: "Loaded",
+            self.DISCARDED: "Discarded to save memory, click to reload",
+            self.CRASHED: "Renderer stopped, reload to bring it back",
+        }[self.state]
+
+    def session_state(self):
+        url, zoom, position = self.url, self.zoom, self.scroll_position
+        if self.view is not None:
+            if not self.view.url().isEmpty():
+                url = self.view.url()
+            zoom = self.view.zoomFactor()
+            # Until a restored page has loaded, its saved position still applies
+            if position.isNull():
+                position = self.view.page().scrollPosition()
+        return {'url': url.toString(), 'title': self.title, 'zoom': zoom, 'scroll': [position.x(), position.y()]}
+
+    @classmethod
+    def from_session_state(cls, state, parent=None):
+        tab = cls(QUrl(state['url']), parent)
+        tab.title = state.get('title') or state['url']
+        tab.zoom = state.get('zoom', 1.0)
+        tab.scroll_position = QtCore.QPointF(*state.get('scroll', (0, 0)))
+        return tab
+
+    def attach_view(self, view):
+        self.view = view
+        self.layout().addWidget(view)
+        self.state = self.LIVE
+
+    def discard_view(self):
+        view = self.view
+        self.url = view.url() if not view.url().isEmpty() else self.url
+        self.zoom = view.zoomFactor()
+        self.scroll_position = view.page().scrollPosition()
+        self.view = None
+        self.state = self.DISCARDED
+        self.layout().removeWidget(view)
+        view.deleteLater()
+
+def renderer_rss(pids):
+    # Resident memory of the given renderer processes in bytes (Linux only)
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            pass
+    return total
+
+class HistoryCompleter(QCompleter):
+    # Lookups run on a worker thread; only the newest typed text is looked up
+    # and stale answers are dropped, so typing never waits on the database
+    results_ready = QtCore.pyqtSignal(str, list)
+    predicted = QtCore.pyqtSignal(str, object)
+
+    def __init__(self, history, line_edit):
+        super().__init__(line_edit)
+        self.history = history
+        self.line_edit = line_edit
+        self.model = QtCore.QStringListModel(self)
+        self.setModel(self.model)
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+        self._pending = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+        self.results_ready.connect(self.show_results)
+        line_edit.textEdited.connect(self.request)
+        line_edit.setCompleter(self)
+
+    def request(self, text):
+        with self._lock:
+            self._pending = text
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                text, self._pending = self._pending, None
+                self._wakeup.clear()
+            if text is None:
+                continue
+            try:
+                urls = [url for url, _ in self.history.complete(text)]
+                prediction = self.history.predict(text)
+            except Exception as e:
+                print(f"History lookup failed: {e}")
+                continue
+            self.results_ready.emit(text, urls)
+            self.predicted.emit(text, prediction)
+
+    def show_results(self, text, urls):
+        if text != self.line_edit.text():
+            return
+        self.model.setStringList(urls)
+        if urls:
+            self.complete()
+        else:
+            self.popup().hide()
+
+class EasyListUpdater(QtCore.QObject):
+    rules_updated = QtCore.pyqtSignal(object)
+
+    def __init__(self, source, cache, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.cache = cache
+        self.thread = None
+
+    def refresh(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        if not self.cache.is_stale(self.cache.load_meta(), self.source):
+            return
+        # Plain daemon thread so a slow download never holds up shutdown
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            lines, meta = fetch_rule_list(self.source, self.cache.load_meta())
+        except Exception as e:
+            print(f"Could not refresh ad-block rules from {self.source}: {e}")
+            return
+        if lines is None:
+            self.cache.save_meta(meta)
+            print("Ad-block rules are up to date")
+            return
+        start = time.perf_counter()
+        rules = AdblockEngine(lines)
+        self.cache.save(rules, meta)
+        print(f"Compiled {len(rules)} ad-block rules in {(time.perf_counter() - start) * 1000:.1f} ms")
+        self.rules_updated.emit(rules)
 
 class BrowserApp(QMainWindow):
-    def __init__(self):
+    recent_urls_loaded = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, adblock_source=DEFAULT_LIST_URL, max_live_tabs=10, memory_budget_mb=0,
+                 debug_scripts=False, voice_backend='google', vosk_model=None,
+                 history_retention_days=90, history_max_entries=1000000, restore_session=True,
+                 startup_timeline=None, proxies=None, proxy_bypass=None, runaway_cpu=RUNAWAY_CPU,
+                 runaway_memory_mb=RUNAWAY_RSS_MB, summary_backend='gemini', summary_model=None, summary_url=None,
+                 max_downloads=3, download_limit_kb=0, data_saver=None, data_saver_policy=None,
+                 data_saver_sites=None, urls=None, headless=False, stall_threshold_ms=None):
         super().__init__()
+        self.startup_timeline = startup_timeline
+        self.started = False
+        # A headless browser only lends its profile to batch rendering; it
+        # never shows a window or touches the saved session
+        self.headless = headless
+
+        # Visits are queued here and written in batches on a background thread
+        data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        os.makedirs(data_dir, exist_ok=True)
+        self.history = HistoryStore(os.path.join(data_dir, 'history.sqlite'),
+                                    retention_days=history_retention_days, max_entries=history_max_entries)
+        self.history_compact_timer = QTimer(self)
+        self.history_compact_timer.timeout.connect(self.history.compact)
+
+        # The tab set is saved shortly after every change, with a full
+        # snapshot on a timer to catch scrolling, which has no signal
+        self.session_store = SessionStore(data_dir)
+        self.restoring_session = False
+        self.session_save_timer = QTimer(self)
+        self.session_save_timer.setSingleShot(True)
+        self.session_save_timer.setInterval(1000)
+        self.session_save_timer.timeout.connect(self.save_session)
+        self.session_snapshot_timer = QTimer(self)
+        self.session_snapshot_timer.timeout.connect(self.snapshot_session)
+        if not headless:
+            self.session_snapshot_timer.start(30 * 1000)
+
+        # Voice capture, recognition and speech all run off the GUI thread
+        self.speaker = Speaker()
+        self.voice_backend_name = voice_backend
+        self.vosk_model = vosk_model
+        self._voice_backend = None
+        self.voice_session = None
+
+        self.debug_scripts = debug_scripts
+
+        # Page summaries are generated on a worker thread and cached by content
+        self.summary_backend_name = summary_backend
+        self.summary_model = summary_model
+        self.summary_url = summary_url
+        self._summary_backend = None
+        self.summary_job = None
+        self.summary_cache = SummaryCache(os.path.join(data_dir, 'summaries'))
+
+        # Downloads are fetched by our own manager rather than Qt's, so they
+        # can use parallel ranged connections and resume; it needs the
+        # browser's cookies, which are mirrored from the profile's store
+        self.cookies = {}
+        self.download_manager = DownloadManager(max_active=max_downloads, bandwidth=download_limit_kb * 1024,
+                                                header_source=self.download_headers, parent=self)
+        self.download_manager.added.connect(lambda download: self.show_downloads())
+        self.download_manager.finished.connect(self.on_download_finished)
+
+        # Background tabs beyond these budgets get their renderer discarded
+        self.max_live_tabs = max_live_tabs
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+
+        # Renderer CPU and memory are sampled from /proc on the sampler's
+        # thread; the timer only hands it the current PIDs and reads results
+        self.process_sampler = ProcessSampler(cpu_threshold=runaway_cpu, rss_threshold_mb=runaway_memory_mb)
+        self.process_timer = QTimer(self)
+        self.process_timer.timeout.connect(self.check_processes)
+
+        # Dark mode settings
+        self.dark_mode = False
 
-        # Initialize VPN settings early
+        # Recently visited pages offered by the spotlight palette, URL to
+        # palette entry, least recently visited first
+        self.recent_urls = OrderedDict()
+        self.max_recent_urls = 10000
+        self.recent_urls_loaded.connect(self.on_recent_urls_loaded, Qt.QueuedConnection)
+
+        # The new tab page is served from memory; top sites are refreshed in
+        # the background, first right after startup, and thumbnails captured
+        # from pages as they are shown. New tabs opened before the first
+        # refresh lands show no top sites rather than wait on the database.
+        self.thumbnails = ThumbnailCache(os.path.join(data_dir, 'thumbnails'))
+        self.top_sites = []
+        self.top_sites_timer = QTimer(self)
+        self.top_sites_timer.timeout.connect(self.refresh_top_sites)
+
+        # Data saver policies are kept between runs; the command line can
+        # switch it on or off and change the default or per-site policies
+        self.data_saver_path = os.path.join(data_dir, 'data-saver.json')
+        self.data_saver = DataSaver.load(self.data_saver_path)
+        if data_saver is not None:
+            self.data_saver.enabled = data_saver
+        if data_saver_policy:
+            self.data_saver.set_default(data_saver_policy)
+        for host, policy in data_saver_sites or ():
+            self.data_saver.set_site_policy(host, policy)
+
+        # Event-loop stalls are only watched for when asked to; the log keeps
+        # the GUI thread's stack from during each one
+        self.watchdog = None
+        if stall_threshold_ms:
+            self.watchdog = StallWatchdog(os.path.join(data_dir, 'stalls.log'), stall_threshold_ms, parent=self)
+            self.watchdog.stalled.connect(
+                lambda ms: print(f"Event loop stalled for {ms:.0f} ms, see {self.watchdog.log.path}"))
+
+        # The text of loaded tabs is indexed on a worker thread for Find in
+        # Tabs; a tab is read a moment after it loads, and loads that follow
+        # each other quickly are read once
+        self.tab_indexer = TabIndexer(parent=self)
+        self.index_pending = set()
+        self.index_timer = QTimer(self)
+        self.index_timer.setSingleShot(True)
+        self.index_timer.setInterval(1000)
+        self.index_timer.timeout.connect(self.index_pending_tabs)
+
+        # Element-hiding scripts by host, see cosmetic_script()
+        self.cosmetic_scripts = OrderedDict()
+
+        # Every request the ad-block interceptor sees is counted here
+        self.telemetry = RequestTelemetry()
+
+        # Initialize VPN settings early; the relay is only started when the VPN is
         self.vpn_enabled = False
         self.proxy = QNetworkProxy()
+        self.proxy_pool = ProxyPool(proxies or DEFAULT_PROXIES,
+                                    DEFAULT_BYPASS if proxy_bypass is None else DEFAULT_BYPASS + proxy_bypass)
+        self.proxy_relay = None
+
+        # Buttons and tabs share one pre-scaled QIcon per image and size
+        self.icons = IconRegistry(os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), 'icons'))
 
         self.setWindowTitle('Goon Browser')  # Changed the window title here
         self.setStyleSheet("""
             QMainWindow { background-color: #FFF1E6; }
             QWidget { color: #333333; }
         """)
-        self.showMaximized()
 
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -84,6 +772,8 @@ class BrowserApp(QMainWindow):
             }
         """)
         self.url_input.returnPressed.connect(self.load_url)
+        self.url_completer = HistoryCompleter(self.history, self.url_input)
+        self.url_completer.activated[str].connect(lambda url: self.load_url())
         top_layout.addWidget(self.url_input)
 
         # Action buttons
@@ -96,7 +786,7 @@ class BrowserApp(QMainWindow):
         # Helper function to create buttons
         def create_button(icon_path, function):
             btn = QPushButton()
-            btn.setIcon(QIcon(icon_path))
+            btn.setIcon(self.icons.icon(icon_path, icon_size))
             btn.setIconSize(QtCore.QSize(icon_size, icon_size))
             btn.setStyleSheet("background-color: transparent; border: none;")
             btn.setFixedSize(icon_size + 10, icon_size + 10)
@@ -135,13 +825,15 @@ class BrowserApp(QMainWindow):
         left_sidebar.setStyleSheet("background-color: #FFA45B; border-radius: 10px;")
         sidebar_layout = QVBoxLayout(left_sidebar)
         sidebar_items = [
-            ('pie_chart.png', 'Pie Chart'),
-            ('stats.png', 'Stats'),
-            ('calendar.png', 'Calendar')
+            ('pie_chart.png', 'Pie Chart', self.show_pie_chart),
+            ('stats.png', 'Stats', self.show_stats),
+            ('calendar.png', 'Calendar', None)
         ]
-        for icon, text in sidebar_items:
+        for icon, text, function in sidebar_items:
             item = QPushButton(text)
-            item.setIcon(QIcon(icon))
+            item.setIcon(self.icons.icon(icon, item.iconSize().width()))
+            if function is not None:
+                item.clicked.connect(function)
             item.setStyleSheet("""
                 QPushButton {
                     background-color: #FF6B6B;
@@ -175,8 +867,15 @@ class BrowserApp(QMainWindow):
             }
         """)
         self.tab_widget.tabCloseRequested.connect(self.close_tab)
+        self.tab_widget.currentChanged.connect(self.on_current_tab_changed)
+        self.tab_widget.tabBar().tabMoved.connect(self.schedule_session_save)
         content_layout.addWidget(self.tab_widget)
 
+        # Page summaries stream in here, see summarize_page()
+        self.summary_panel = SummaryPanel(self)
+        self.summary_panel.cancel_requested.connect(self.cancel_summary)
+        content_layout.addWidget(self.summary_panel)
+
         main_layout.addWidget(content_area)
 
         # Bottom bar
@@ -199,25 +898,76 @@ class BrowserApp(QMainWindow):
             """)
             bottom_layout.addWidget(btn)
         main_layout.addWidget(bottom_bar)
+        self.mark_startup("window")
 
-        # Load ad-blocking rules
-        self.load_adblock_rules()
-
-        # Add initial tab
-        self.add_new_tab()
+        self.create_web_profile()
+        self.mark_startup("profile")
 
-        # Dark mode settings
-        self.dark_mode = False
-        self.youtube_fullscreen_script = """
-        (function() {
-            var videoElement = document.querySelector('video');
-            if (videoElement) {
-                videoElement.webkitRequestFullscreen();
-            }
-        })();
-        """
+        # Warms up, and prerenders, where the URL bar predicts the user is going
+        self.speculative_loader = SpeculativeLoader(self.web_profile, self.create_prerender_page, renderer_rss,
+                                                    parent=self)
+        self.url_completer.predicted.connect(self.speculative_loader.update)
+        self.url_input.textEdited.connect(self.speculative_loader.check)
 
-        self.spotlight_search = SpotlightSearch(self)
+        # Load ad-blocking rules
+        self.load_adblock_rules(adblock_source)
+        self.setup_user_scripts()
+        self.mark_startup("ad-block rules")
+
+        # Bring back the previous session, or start from a single tab
+        session = self.session_store.load() if restore_session and not headless else None
+        if session:
+            self.restore_session(session)
+        elif not urls and not headless:
+            self.add_new_tab()
+        if urls:
+            self.open_multiple_tabs(urls)
+        self.mark_startup("first tab")
+
+        if self.memory_budget:
+            self.memory_budget_timer = QTimer(self)
+            self.memory_budget_timer.timeout.connect(self.enforce_tab_budget)
+            self.memory_budget_timer.start(30 * 1000)
+
+        # Built on first use, see spotlight()
+        self.spotlight_search = None
+        self.stats_panel = None
+        self.pie_chart_panel = None
+        self.task_manager = None
+        self.downloads_panel = None
+        self.find_in_tabs = None
+
+    def mark_startup(self, phase):
+        if self.startup_timeline is not None:
+            self.startup_timeline.mark(phase)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.started:
+            self.started = True
+            self.mark_startup("first paint")
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        # Work that can wait until the window is on screen
+        if self.startup_timeline is not None:
+            print(self.startup_timeline.report(), flush=True)
+        self.adblock_updater.refresh()
+        self.adblock_refresh_timer.start(60 * 60 * 1000)
+        self.history.compact()
+        self.history_compact_timer.start(24 * 60 * 60 * 1000)
+        self.refresh_top_sites()
+        self.top_sites_timer.start(5 * 60 * 1000)
+        self.process_sampler.start()
+        if self.watchdog is not None:
+            self.watchdog.start()
+        self.process_timer.start(int(self.process_sampler.interval * 1000))
+        for download in self.download_manager.restore(self.download_directory()):
+            print(f"Found the unfinished download {download.name}")
+
+    def create_web_profile(self):
+        # Create a custom QWebEngineProfile
+        self.web_profile = QWebEngineProfile("AdBlockProfile", self)
 
         # Modify the web profile settings
         self.web_profile.settings().setAttribute(QWebEngineSettings.JavascriptEnabled, True)
@@ -228,31 +978,94 @@ class BrowserApp(QMainWindow):
         self.web_profile.settings().setAttribute(QWebEngineSettings.AllowRunningInsecureContent, True)
         self.web_profile.settings().setAttribute(QWebEngineSettings.AllowGeolocationOnInsecureOrigins, True)
 
+        self.scheme_handler = NewTabSchemeHandler(self)
+        self.web_profile.installUrlSchemeHandler(SCHEME.encode(), self.scheme_handler)
+
+        self.web_profile.downloadRequested.connect(self.on_download_requested)
+        cookie_store = self.web_profile.cookieStore()
+        cookie_store.cookieAdded.connect(self.on_cookie_added)
+        cookie_store.cookieRemoved.connect(self.on_cookie_removed)
+        cookie_store.loadAllCookies()
+
     def current_web_view(self):
-        return self.tab_widget.currentWidget()
+        tab = self.tab_widget.currentWidget()
+        return tab.view if tab is not None else None
 
-    def add_new_tab(self, url=None):
+    def web_views(self):
+        # Live views only; unloaded and discarded tabs pick up state on restore
+        for i in range(self.tab_widget.count()):
+            web_view = self.tab_widget.widget(i).view
+            if web_view is not None:
+                yield web_view
+
+    def tab_icon(self):
+        return self.icons.icon("tab_icon.png", self.tab_widget.iconSize().width())
+
+    def add_new_tab(self, url=None, background=False):
         if url is None:
-            url = QUrl("https://duckduckgo.com/")
+            url = QUrl(NEW_TAB_URL)
         elif isinstance(url, str):
             url = QUrl(url)
         elif not isinstance(url, QUrl):
-            url = QUrl("https://duckduckgo.com/")
+            url = QUrl(NEW_TAB_URL)
         
+        # The view itself is only created once the tab is first activated
+        tab = BrowserTab(url, self)
+        index = self.tab_widget.addTab(tab, self.tab_icon(), "New Tab")
+        self.update_tab_state(tab)
+        if not background:
+            self.tab_widget.setCurrentIndex(index)
+        self.schedule_session_save()
+        # A background tab has no view yet, so callers get the tab itself
+        return tab
+
+    def new_tab_page(self):
+        tabs = []
+        for i in range(self.tab_widget.count()):
+            tab = self.tab_widget.widget(i)
+            url = tab.view.url() if tab.view is not None and not tab.view.url().isEmpty() else tab.url
+            if url.scheme() != SCHEME:
+                tabs.append((id(tab), url.toString(), tab.title))
+        return render_new_tab(self.top_sites, tabs, self.thumbnails)
+
+    def refresh_top_sites(self):
+        def run():
+            try:
+                self.top_sites = top_sites(self.history.top(TOP_SITES * 8))
+            except Exception as e:
+                print(f"Could not read top sites: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def switch_to_tab(self, tab_id):
+        for i in range(self.tab_widget.count()):
+            if str(id(self.tab_widget.widget(i))) == tab_id:
+                self.tab_widget.setCurrentIndex(i)
+                return
+
+    def capture_thumbnail(self, web_view, url):
+        # Only the visible view has anything on screen to grab
+        if web_view is not self.current_web_view() or web_view.url().toString() != url:
+            return
+        image = web_view.grab().toImage()
+        if not image.isNull():
+            self.thumbnails.put(url, image)
+
+    def create_web_view(self, tab):
         web_view = WebView(self)
-        web_view.setPage(QWebEnginePage(self.web_profile, web_view))
-        web_view.load(url)
+        page = WebPage(self.web_profile, self.cosmetic_script, self.data_saver, self.adblock_interceptor, web_view)
+        page.interceptor.tab = id(tab)
+        web_view.setPage(page)
         web_view.loadFinished.connect(self.update_url_bar)
-        
-        # Apply VPN settings to the new tab if enabled
-        if self.vpn_enabled:
-            proxy_factory = CustomProxyFactory(self.proxy)
-            web_view.page().profile().setProxyFactory(proxy_factory)
-        
-        index = self.tab_widget.addTab(web_view, QIcon("tab_icon.png"), "New Tab")
-        self.tab_widget.setCurrentIndex(index)
+        web_view.titleChanged.connect(lambda title, tab=tab: self.on_title_changed(tab, title))
+        web_view.urlChanged.connect(lambda url, view=web_view: self.record_visit(view, url))
+        web_view.urlChanged.connect(self.schedule_session_save)
         
         web_view.loadFinished.connect(lambda ok, view=web_view: self.on_load_finished(ok, view))
+        web_view.loadFinished.connect(lambda ok, tab=tab: self.update_tab_state(tab))
+        web_view.loadStarted.connect(lambda tab=tab, view=web_view: self.on_load_started(tab, view))
+        web_view.loadFinished.connect(lambda ok, tab=tab: self.schedule_tab_index(tab, ok))
+        web_view.renderProcessTerminated.connect(
+            lambda status, code, tab=tab, view=web_view: self.on_render_process_terminated(tab, view, status, code))
         
         # Modify the web view settings
         settings = web_view.settings()
@@ -263,19 +1076,309 @@ class BrowserApp(QMainWindow):
         settings.setAttribute(QWebEngineSettings.LocalStorageEnabled, True)
         settings.setAttribute(QWebEngineSettings.AllowRunningInsecureContent, True)
         settings.setAttribute(QWebEngineSettings.AllowGeolocationOnInsecureOrigins, True)
-        
+
+        restoring = (tab.state == BrowserTab.DISCARDED or tab.zoom != 1.0
+                     or not tab.scroll_position.isNull())
+        tab.attach_view(web_view)
+        web_view.setZoomFactor(tab.zoom)
+        if restoring:
+            # Only the first load after a restore jumps back; later loads keep
+            # whatever zoom and scroll the user or the page set
+            def restore_when_loaded(ok):
+                web_view.loadFinished.disconnect(restore_when_loaded)
+                self.restore_tab_position(tab)
+            web_view.loadFinished.connect(restore_when_loaded)
+        web_view.load(tab.url)
+        self.update_tab_state(tab)
         return web_view
 
+    def schedule_tab_index(self, tab, ok):
+        if ok:
+            self.index_pending.add(tab)
+            self.index_timer.start()
+
+    def index_pending_tabs(self):
+        # Only the text is read here; tokenizing and indexing happen on the
+        # indexer's thread
+        pending, self.index_pending = self.index_pending, set()
+        for tab in pending:
+            if tab.view is None or tab.view.url().scheme() == SCHEME:
+                continue
+            url = tab.view.url().toString()
+            tab.view.page().toPlainText(
+                lambda text, tab=tab, url=url: self.tab_indexer.update(id(tab), url, tab.title, text))
+
+    def find_in_tab(self, tab_id, text):
+        # Switches to the tab and highlights the text, once the page is back
+        # if the tab had no view
+        for i in range(self.tab_widget.count()):
+            tab = self.tab_widget.widget(i)
+            if id(tab) != tab_id:
+                continue
+            loaded = tab.view is not None
+            self.tab_widget.setCurrentIndex(i)
+            view = tab.view
+            if view is None or not text:
+                return
+            if loaded:
+                view.findText(text)
+            else:
+                def find_when_loaded(ok):
+                    view.loadFinished.disconnect(find_when_loaded)
+                    view.findText(text)
+                view.loadFinished.connect(find_when_loaded)
+            return
+
+    def restore_tab_position(self, tab):
+        if tab.view is None:
+            return
+        tab.view.setZoomFactor(tab.zoom)
+        position = tab.scroll_position
+        tab.scroll_position = QtCore.QPointF()
+        if not position.isNull():
+            tab.view.page().runJavaScript(f"window.scrollTo({position.x()}, {position.y()});")
+
+    def on_current_tab_changed(self, index):
+        tab = self.tab_widget.widget(index)
+        if tab is None or self.restoring_session:
+            return
+        tab.last_active = time.monotonic()
+        if tab.view is None:
+            self.create_web_view(tab)
+        self.update_url_bar()
+        self.enforce_tab_budget()
+        self.schedule_session_save()
+
+    def on_title_changed(self, tab, title):
+        tab.title = title or tab.url.toString()
+        self.telemetry.tab_titles[id(tab)] = tab.title
+        self.update_tab_state(tab)
+        self.schedule_session_save()
+        if tab.view is not None:
+            self.history.update_title(tab.view.url().toString(), title)
+
+    def update_tab_state(self, tab):
+        index = self.tab_widget.indexOf(tab)
+        if index < 0:
+            return
+        self.tab_widget.setTabText(index, tab.title)
+        # Tabs without a renderer are greyed out in the tab bar, runaway ones are red
+        if tab.runaway:
+            color = QtGui.QColor("#C62828")
+        elif tab.state == BrowserTab.LIVE:
+            color = QtGui.QColor()
+        else:
+            color = QtGui.QColor("#8A8A8A")
+        self.tab_widget.tabBar().setTabTextColor(index, color)
+        tooltip = f"{tab.title}\n{tab.status()}"
+        saved = self.tab_data_saved(tab)
+        if saved is not None and saved.total_requests:
+            tooltip += f"\nData saver: {saved.total_requests} requests, about {format_size(saved.total_bytes)} saved"
+        self.tab_widget.setTabToolTip(index, tooltip)
+
+    def tab_data_saved(self, tab):
+        # What the data saver blocked in this tab, None if it has no page
+        if tab.view is None:
+            return None
+        return tab.view.page().data_saver_interceptor.saved
+
+    def toggle_data_saver(self):
+        self.data_saver.enabled = not self.data_saver.enabled
+        self.save_data_saver()
+        print(f"Data saver {'on' if self.data_saver.enabled else 'off'}; reload pages to apply it")
+
+    def toggle_data_saver_for_site(self):
+        # Exempts the current site from the data saver, or undoes that
+        web_view = self.current_web_view()
+        host = web_view.url().host() if web_view is not None else ''
+        if not host:
+            return
+        if host in self.data_saver.sites:
+            self.data_saver.set_site_policy(host, None)
+            print(f"Data saver uses the default policy on {host}")
+        else:
+            self.data_saver.set_site_policy(host, {resource_type: ALLOW for resource_type in SAVER_TYPES})
+            print(f"Data saver allows everything on {host}")
+        self.save_data_saver()
+        web_view.reload()
+
+    def save_data_saver(self):
+        try:
+            self.data_saver.save(self.data_saver_path)
+        except OSError as e:
+            print(f"Could not save data saver settings: {e}")
+
+    def discard_tab(self, tab):
+        if tab.view is None or tab is self.tab_widget.currentWidget():
+            return
+        # A discarded tab is reloaded when it is next shown, not by a pending timer
+        if tab.reload_timer is not None:
+            tab.reload_timer.stop()
+        tab.discard_view()
+        self.update_tab_state(tab)
+
+    def enforce_tab_budget(self):
+        current = self.tab_widget.currentWidget()
+        tabs = [self.tab_widget.widget(i) for i in range(self.tab_widget.count())]
+        # Never discard the visible tab or one that is playing audio
+        candidates = sorted(
+            (tab for tab in tabs
+             if tab.view is not None and tab is not current and not tab.view.page().recentlyAudible()),
+            key=lambda tab: tab.last_active)
+        live_count = sum(1 for tab in tabs if tab.view is not None)
+        while candidates and live_count > self.max_live_tabs:
+            self.discard_tab(candidates.pop(0))
+            live_count -= 1
+        if self.memory_budget and candidates:
+            pids = {tab.view.page().renderProcessPid() for tab in tabs if tab.view is not None}
+            if renderer_rss(pids) > self.memory_budget:
+                # Memory is only re-measured on the next check, so free one tab at a time
+                self.discard_tab(candidates[0])
+
+    def tab_processes(self):
+        # (tab, renderer PID) for every tab, 0 for tabs without a renderer.
+        # Tabs of the same site may share one renderer process.
+        tabs = [self.tab_widget.widget(i) for i in range(self.tab_widget.count())]
+        return [(tab, tab.view.page().renderProcessPid() if tab.view is not None else 0) for tab in tabs]
+
+    def check_processes(self):
+        processes = self.tab_processes()
+        self.process_sampler.watch(pid for _, pid in processes)
+        samples = self.process_sampler.samples()
+        for tab, pid in processes:
+            sample = samples.get(pid)
+            runaway = sample is not None and sample.runaway
+            if runaway == tab.runaway:
+                continue
+            tab.runaway = runaway
+            self.update_tab_state(tab)
+            if runaway:
+                print(f"Tab {tab.title!r} is running away: renderer {pid} at {sample.cpu:.0f}% CPU, "
+                      f"{sample.rss // (1024 * 1024)} MB")
+
+    def kill_tab_process(self, tab):
+        pid = tab.view.page().renderProcessPid() if tab.view is not None else 0
+        if not pid:
+            return
+        # Every tab in that renderer goes down with it; none of them is
+        # reloaded automatically since this was asked for
+        for other, other_pid in self.tab_processes():
+            if other_pid == pid:
+                other.killed = True
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError as e:
+            print(f"Could not kill renderer {pid}: {e}")
+
+    def reload_tab(self, tab):
+        tab.killed = False
+        if tab.view is None:
+            self.create_web_view(tab)
+            return
+        tab.state = BrowserTab.LIVE
+        tab.view.reload()
+        self.update_tab_state(tab)
+
+    def on_load_started(self, tab, web_view):
+        # Reloading from the toolbar or navigating brings a crashed view's
+        # renderer back just like reload_tab does
+        if tab.view is not web_view or tab.state != BrowserTab.CRASHED:
+            return
+        if tab.reload_timer is not None:
+            tab.reload_timer.stop()
+        tab.state = BrowserTab.LIVE
+        self.update_tab_state(tab)
+
+    def on_render_process_terminated(self, tab, web_view, status, exit_code):
+        # A discarded or replaced view's renderer going away is expected
+        if tab.view is not web_view or status == QWebEnginePage.NormalTerminationStatus:
+            return
+        tab.state = BrowserTab.CRASHED
+        tab.runaway = False
+        self.update_tab_state(tab)
+        if tab.killed:
+            tab.killed = False
+            return
+        delay = tab.reload_budget.next_delay()
+        if delay is None:
+            print(f"Renderer for {tab.title!r} keeps dying (exit code {exit_code}), leaving it stopped")
+            return
+        print(f"Renderer for {tab.title!r} died (exit code {exit_code}), reloading in {delay:.0f} s")
+        # Owned by the tab so a pending reload goes away with it
+        if tab.reload_timer is None:
+            tab.reload_timer = QTimer(tab)
+            tab.reload_timer.setSingleShot(True)
+            tab.reload_timer.timeout.connect(lambda tab=tab: self.reload_tab(tab))
+        tab.reload_timer.start(int(delay * 1000))
+
     def open_multiple_tabs(self, urls):
+        urls = list(urls)
+        first_index = self.tab_widget.count()
         for url in urls:
-            self.add_new_tab(url)
+            self.add_new_tab(url, background=True)
+        if urls:
+            self.tab_widget.setCurrentIndex(first_index)
+
+    def open_forwarded(self, request):
+        # URLs and actions sent by a later launch of the browser
+        if request['urls']:
+            self.open_multiple_tabs(request['urls'])
+        elif request['action'] == NEW_WINDOW:
+            self.add_new_tab()
+        self.setWindowState(self.windowState() & ~Qt.WindowMinimized)
+        self.show()
+        self.raise_()
+        self.activateWindow()
 
     def close_tab(self, index):
         if self.tab_widget.count() > 1:
+            tab = self.tab_widget.widget(index)
+            self.index_pending.discard(tab)
+            self.tab_indexer.remove(id(tab))
+            self.telemetry.close_tab(id(tab))
             self.tab_widget.removeTab(index)
+            tab.deleteLater()
+            self.schedule_session_save()
         else:
             self.close()
 
+    def restore_session(self, session):
+        # Every tab comes back UNLOADED, so only the active one creates a view
+        # and restoring many tabs costs about as much as restoring one
+        self.restoring_session = True
+        try:
+            for state in session['tabs']:
+                tab = BrowserTab.from_session_state(state, self)
+                self.tab_widget.addTab(tab, self.tab_icon(), tab.title)
+                self.update_tab_state(tab)
+        finally:
+            self.restoring_session = False
+        active = min(max(0, session.get('active', 0)), self.tab_widget.count() - 1)
+        if self.tab_widget.currentIndex() == active:
+            self.on_current_tab_changed(active)
+        else:
+            self.tab_widget.setCurrentIndex(active)
+
+    def session_state(self):
+        tabs = [self.tab_widget.widget(i).session_state() for i in range(self.tab_widget.count())]
+        return {'tabs': tabs, 'active': self.tab_widget.currentIndex()}
+
+    def schedule_session_save(self):
+        if not self.restoring_session:
+            self.session_save_timer.start()
+
+    def save_session(self):
+        try:
+            self.session_store.save(self.session_state())
+        except OSError as e:
+            print(f"Could not save session: {e}")
+
+    def snapshot_session(self):
+        try:
+            self.session_store.snapshot(self.session_state())
+        except OSError as e:
+            print(f"Could not save session: {e}")
+
     def load_url(self):
         query = self.url_input.text()
         if not query.startswith(('http://', 'https://')):
@@ -286,66 +1389,212 @@ class BrowserApp(QMainWindow):
         
         current_view = self.current_web_view()
         if current_view:
-            current_view.setUrl(QUrl(query))
+            page = self.speculative_loader.take(query)
+            if page is not None:
+                self.swap_in_page(current_view, page)
+            else:
+                current_view.setUrl(QUrl(query))
+
+    def create_prerender_page(self):
+        return WebPage(self.web_profile, self.cosmetic_script, self.data_saver, self.adblock_interceptor, self)
+
+    def create_batch_view(self):
+        # Painted off screen so PNG captures have something to grab
+        view = QWebEngineView()
+        view.setPage(WebPage(self.web_profile, self.cosmetic_script, self.data_saver, self.adblock_interceptor,
+                             view))
+        view.setAttribute(Qt.WA_DontShowOnScreen)
+        view.resize(1280, 800)
+        view.show()
+        return view
+
+    def swap_in_page(self, web_view, page):
+        # Shows a page that was loaded off-screen; the view re-emits the new
+        # page's URL and title itself, but not loadFinished
+        old_page = web_view.page()
+        page.interceptor.tab = old_page.interceptor.tab
+        page.setParent(web_view)
+        page.setZoomFactor(old_page.zoomFactor())
+        page.fullScreenRequested.connect(web_view.handle_fullscreen_request)
+        web_view.setPage(page)
+        old_page.deleteLater()
+        self.update_url_bar()
+        self.on_load_finished(True, web_view)
 
     def update_url_bar(self):
         current_view = self.current_web_view()
         if current_view:
-            self.url_input.setText(current_view.url().toString())
+            url = current_view.url().toString()
+            self.url_input.setText("" if url == NEW_TAB_URL else url)
+
+    def summary_backend(self):
+        # Created on first use; the Gemini client is a heavy import
+        if self._summary_backend is None:
+            options = {}
+            if self.summary_model:
+                options['model'] = self.summary_model
+            if self.summary_url and self.summary_backend_name == 'ollama':
+                options['url'] = self.summary_url
+            self._summary_backend = create_summary_backend(self.summary_backend_name, **options)
+        return self._summary_backend
+
+    def summarize_page(self):
+        web_view = self.current_web_view()
+        if web_view is None:
+            return
+        self.cancel_summary()
+        self.summary_panel.begin(web_view.title() or web_view.url().toString())
+        web_view.page().runJavaScript(READABLE_TEXT_JS, APPLICATION_WORLD,
+                                      lambda result, url=web_view.url(): self.start_summary(url, result))
+
+    def start_summary(self, url, result):
+        # The user may have navigated away or closed the panel in the meantime
+        web_view = self.current_web_view()
+        if web_view is None or web_view.url() != url or not self.summary_panel.isVisible():
+            return
+        result = result or {}
+        title = result.get('title') or url.toString()
+        text = result.get('text') or ''
+        try:
+            backend = self.summary_backend()
+        except SummaryError as e:
+            self.summary_panel.finish(str(e))
+            return
+        cached = self.summary_cache.get(summary_key(backend, title, text))
+        if cached is not None:
+            self.summary_panel.finish("From cache", cached)
+            return
+        job = SummaryJob(backend, self.summary_cache, title, text, parent=self)
+        # Signals a cancelled job had already queued are dropped by the checks
+        job.progress.connect(lambda status, job=job: job is self.summary_job and self.summary_panel.set_status(status))
+        job.token.connect(lambda piece, job=job: job is self.summary_job and self.summary_panel.append(piece))
+        job.completed.connect(lambda summary, job=job: job is self.summary_job and self.summary_panel.finish("Done"))
+        job.failed.connect(lambda message, job=job: job is self.summary_job and self.summary_panel.finish(message))
+        job.finished.connect(lambda job=job: self.on_summary_finished(job))
+        self.summary_job = job
+        job.start()
+
+    def cancel_summary(self):
+        if self.summary_job is not None:
+            self.summary_job.cancel()
+            self.summary_job = None
+            self.summary_panel.finish("Stopped")
+
+    def on_summary_finished(self, job):
+        if job is self.summary_job:
+            self.summary_job = None
+        job.deleteLater()
+
+    def download_directory(self):
+        return QStandardPaths.writableLocation(QStandardPaths.DownloadLocation)
+
+    def on_download_requested(self, item):
+        url = item.url()
+        if url.scheme() in ('http', 'https') and not item.isSavePageDownload():
+            # Not accepting the item leaves the download to our manager
+            path = item.path() or os.path.join(self.download_directory(), url.fileName() or 'download')
+            self.download_manager.add(url.toString(), path)
+        else:
+            # blob:, data: and saved pages only exist inside the browser
+            item.accept()
+
+    def on_download_finished(self, download):
+        if download.state == DONE:
+            print(f"Downloaded {download.url} to {download.path}")
+
+    def on_cookie_added(self, cookie):
+        key = (cookie.domain(), cookie.path(), bytes(cookie.name()))
+        self.cookies[key] = QNetworkCookie(cookie)
+
+    def on_cookie_removed(self, cookie):
+        self.cookies.pop((cookie.domain(), cookie.path(), bytes(cookie.name())), None)
+
+    def download_headers(self, url):
+        # Called from download threads; the cookie dict is only replaced
+        # item by item on the GUI thread, so a copy of its values is safe
+        parts = urllib.parse.urlsplit(url)
+        host = parts.hostname or ''
+        path = parts.path or '/'
+        now = QtCore.QDateTime.currentDateTime()
+        pairs = []
+        for cookie in list(self.cookies.values()):
+            domain = cookie.domain()
+            if domain.startswith('.'):
+                matches = host == domain[1:] or host.endswith(domain)
+            else:
+                matches = host == domain
+            if (not matches or not path.startswith(cookie.path() or '/')
+                    or (cookie.isSecure() and parts.scheme != 'https')
+                    or (not cookie.isSessionCookie() and cookie.expirationDate() < now)):
+                continue
+            pairs.append(f"{bytes(cookie.name()).decode('latin-1')}={bytes(cookie.value()).decode('latin-1')}")
+        headers = {'User-Agent': self.web_profile.httpUserAgent()}
+        if pairs:
+            headers['Cookie'] = '; '.join(pairs)
+        return headers
+
+    def voice_backend(self):
+        # Created on first use; offline models can take a while to load
+        if self._voice_backend is None:
+            options = {'model_path': self.vosk_model} if self.voice_backend_name == 'vosk' and self.vosk_model else {}
+            self._voice_backend = create_backend(self.voice_backend_name, **options)
+        return self._voice_backend
 
     def voice_search(self):
-        recognizer = sr.Recognizer()
+        # A second click while listening cancels the session
+        if self.voice_session is not None:
+            self.voice_session.cancel()
+            return
         try:
-            with sr.Microphone() as source:
-                self.speak("Listening... How can I help you?")
-                print("Listening... Speak now.")
-                recognizer.adjust_for_ambient_noise(source, duration=1)
-                audio = recognizer.listen(source, timeout=5, phrase_time_limit=5)
-                print("Processing speech...")
-                
-            try:
-                query = recognizer.recognize_google(audio)
-                print(f"You said: {query}")
-                self.process_voice_command(query)
-            except sr.UnknownValueError:
-                self.speak("I'm sorry, I couldn't understand that. Please try again.")
-                print("Could not understand audio. Please try again.")
-            except sr.RequestError as e:
-                self.speak("I'm having trouble connecting to the speech recognition service.")
-                print(f"Could not request results from Google Speech Recognition service; {e}")
-        except Exception as e:
-            self.speak("An error occurred. Please try again.")
-            print(f"An error occurred: {e}")
+            backend = self.voice_backend()
+        except RecognitionError as e:
+            self.speak(str(e))
+            print(f"Voice search unavailable: {e}")
+            return
+        session = VoiceSession(backend, self.speaker, parent=self)
+        session.listening.connect(lambda: self.url_input.setPlaceholderText("Listening..."))
+        session.partial.connect(self.url_input.setText)
+        session.recognized.connect(self.on_voice_recognized)
+        session.failed.connect(self.speak)
+        session.finished.connect(self.on_voice_finished)
+        self.voice_session = session
+        session.start()
+
+    def on_voice_recognized(self, query):
+        print(f"You said: {query}")
+        self.url_input.setText(query)
+        self.process_voice_command(query)
+
+    def on_voice_finished(self):
+        self.url_input.setPlaceholderText("")
+        self.voice_session = None
 
     def process_voice_command(self, query):
-        query = query.lower()
-        if "search for" in query:
-            search_term = query.replace("search for", "").strip()
-            self.speak(f"Searching for {search_term}")
-            self.perform_search(search_term)
-        elif "open" in query:
-            website = query.replace("open", "").strip()
-            self.speak(f"Opening {website}")
-            self.open_website(website)
-        elif "play" in query:
-            video = query.replace("play", "").strip()
-            self.speak(f"Playing {video} on YouTube")
-            self.search_and_play_youtube(video)
-        elif "what's the time" in query or "what is the time" in query:
+        action, argument = parse_voice_command(query)
+        if action == 'search':
+            self.speak(f"Searching for {argument}")
+            self.perform_search(argument)
+        elif action == 'open':
+            self.speak(f"Opening {argument}")
+            self.open_website(argument)
+        elif action == 'play':
+            self.speak(f"Playing {argument} on YouTube")
+            self.search_and_play_youtube(argument)
+        elif action == 'time':
             current_time = QtCore.QTime.currentTime().toString("hh:mm AP")
             self.speak(f"The current time is {current_time}")
-        elif "close tab" in query:
+        elif action == 'close_tab':
             self.speak("Closing the current tab")
             self.close_current_tab()
-        elif "new tab" in query:
+        elif action == 'new_tab':
             self.speak("Opening a new tab")
             self.add_new_tab()
         else:
             self.speak("Performing a web search for your query")
-            self.perform_search(query)
+            self.perform_search(argument)
 
     def speak(self, text):
-        subprocess.run(["say", text])
+        self.speaker.say(text)
 
     def open_website(self, website):
         if not website.startswith('http'):
@@ -374,38 +1623,24 @@ class BrowserApp(QMainWindow):
             self.load_url()
 
     def search_and_play_youtube(self, query):
+        # The autoplay user script clicks the first result on pages carrying the marker
         search_query = f'https://www.youtube.com/results?search_query={urllib.parse.quote_plus(query)}'
         
         current_view = self.current_web_view()
         if current_view:
-            current_view.load(QUrl(search_query))
-            current_view.loadFinished.connect(lambda: self.extract_and_play_youtube_video(current_view))
-
-    def extract_and_play_youtube_video(self, web_view):
-        web_view.page().runJavaScript("""
-            var videos = document.querySelectorAll('a#video-title');
-            if (videos.length > 0) {
-                videos[0].click();
-                return true;
-            }
-            return false;
-        """, lambda result: self.handle_youtube_autoplay(result, web_view))
-
-    def handle_youtube_autoplay(self, clicked, web_view):
-        if not clicked:
-            print("No videos found to autoplay.")
-        else:
-            print("Autoplaying first video result.")
+            current_view.load(QUrl(search_query + YOUTUBE_AUTOPLAY_HASH))
 
     def zoom_in(self):
         current_view = self.current_web_view()
         if current_view:
             current_view.setZoomFactor(current_view.zoomFactor() + 0.1)
+            self.schedule_session_save()
 
     def zoom_out(self):
         current_view = self.current_web_view()
         if current_view:
             current_view.setZoomFactor(current_view.zoomFactor() - 0.1)
+            self.schedule_session_save()
 
     def toggle_full_screen(self):
         if self.isFullScreen():
@@ -424,87 +1659,235 @@ class BrowserApp(QMainWindow):
                 QTabBar::tab { background-color: #212121; color: #FFFFFF; border: 1px solid #303030; }
                 QTabBar::tab:selected { background-color: #303030; }
             """)
-            self.dark_mode_btn.setIcon(QIcon("lightmode.png"))  # Assuming you have a light mode icon
+            self.dark_mode_btn.setIcon(self.icons.icon("lightmode.png", self.dark_mode_btn.iconSize().width()))
         else:
             self.setStyleSheet("")
-            self.dark_mode_btn.setIcon(QIcon("darkmode.jpeg"))
+            self.dark_mode_btn.setIcon(self.icons.icon("darkmode.jpeg", self.dark_mode_btn.iconSize().width()))
         
-        # Apply dark mode to all web views
-        for i in range(self.tab_widget.count()):
-            web_view = self.tab_widget.widget(i)
+        # New documents pick the mode up from the profile script, open ones flip their class
+        self.user_scripts.replace(self.dark_mode_script())
+        for web_view in self.web_views():
             self.apply_dark_mode_to_web_view(web_view)
 
-    def apply_dark_mode_to_web_view(self, web_view):
-        js = f"""
-        (function() {{
-            function applyDarkMode(node) {{
-                if (node.nodeType === Node.ELEMENT_NODE) {{
-                    node.style.setProperty('background-color', '{("#181818" if self.dark_mode else "#FFFFFF")}', 'important');
-                    node.style.setProperty('color', '{("#FFFFFF" if self.dark_mode else "#000000")}', 'important');
-                    node.style.setProperty('border-color', '{("#303030" if self.dark_mode else "#E5E5E5")}', 'important');
-                    
-                    if (node.tagName === 'A') {{
-                        node.style.setProperty('color', '{("#3EA6FF" if self.dark_mode else "#065FD4")}', 'important');
-                    }}
-                    
-                    if (node.tagName === 'INPUT' || node.tagName === 'TEXTAREA' || node.tagName === 'SELECT') {{
-                        node.style.setProperty('background-color', '{("#212121" if self.dark_mode else "#FFFFFF")}', 'important');
-                        node.style.setProperty('color', '{("#FFFFFF" if self.dark_mode else "#000000")}', 'important');
-                    }}
-                }}
-                
-                for (let child of node.childNodes) {{
-                    applyDarkMode(child);
-                }}
-            }}
-            
-            document.documentElement.style.colorScheme = '{("dark" if self.dark_mode else "light")}';
-            applyDarkMode(document.body);
-            
-            // Create a MutationObserver to apply dark mode to new elements
-            var observer = new MutationObserver(function(mutations) {{
-                mutations.forEach(function(mutation) {{
-                    mutation.addedNodes.forEach(applyDarkMode);
-                }});
-            }});
-            
-            observer.observe(document.body, {{ childList: true, subtree: true }});
-        }})();
-        """
-        
-        web_view.page().runJavaScript(js)
+    def dark_mode_script(self):
+        source = DARK_MODE_JS % ("true" if self.dark_mode else "false", json.dumps(DARK_MODE_CSS), DARK_MODE_CLASS,
+                                 json.dumps(DARK_MODE_TOKEN))
+        return UserScript("dark-mode", source, ["<all_urls>"], DOCUMENT_CREATION, subframes=True)
 
-    def load_adblock_rules(self):
-        # Load EasyList rules
-        easylist_url = "https://easylist.to/easylist/easylist.txt"
-        response = requests.get(easylist_url)
-        rules = AdblockRules(response.text.splitlines())
-        
-        # Create a custom QWebEngineProfile
-        self.web_profile = QWebEngineProfile("AdBlockProfile", self)
+    def apply_dark_mode_to_web_view(self, web_view):
+        enabled = "true" if self.dark_mode else "false"
+        toggle = DARK_MODE_TOGGLE_JS % (DARK_MODE_CLASS, json.dumps(DARK_MODE_TOKEN), enabled)
+        web_view.page().runJavaScript(toggle, APPLICATION_WORLD)
+
+    def load_adblock_rules(self, source):
+        # Start from the precompiled rules on disk so the first window never
+        # waits on the network; the list itself is refreshed in the background
+        start = time.perf_counter()
+        cache_dir = os.path.join(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation), 'adblock')
+        cache = RuleCache(cache_dir)
+        rules = cache.load() or AdblockEngine()
+        print(f"Loaded {len(rules)} ad-block rules from cache in {(time.perf_counter() - start) * 1000:.1f} ms")
         
-        # Apply rules to the profile
-        self.web_profile.setUrlRequestInterceptor(AdBlockInterceptor(rules))
+        # Shared by every page's interceptor, see PageInterceptor
+        self.adblock_interceptor = AdBlockInterceptor(rules, self.telemetry)
+
+        self.adblock_updater = EasyListUpdater(source, cache, self)
+        self.adblock_updater.rules_updated.connect(self.adblock_interceptor.set_rules)
+        self.adblock_updater.rules_updated.connect(self.cosmetic_scripts.clear)
+
+        # Check hourly, starting after the first paint; the list's expiry
+        # window decides whether anything is fetched
+        self.adblock_refresh_timer = QTimer(self)
+        self.adblock_refresh_timer.timeout.connect(self.adblock_updater.refresh)
+
+    def cosmetic_script(self, host):
+        # The stylesheet is cached per host by the rules; the script wrapping
+        # it is cached here so a navigation never re-encodes a large sheet
+        if not host:
+            return None
+        script = self.cosmetic_scripts.get(host)
+        if script is None:
+            css = self.adblock_interceptor.rules.cosmetic.stylesheet(host)
+            if not css:
+                return None
+            script = UserScript("cosmetic-filters", COSMETIC_FILTERS_JS % json.dumps(css),
+                                [f"*://{host}/*"], DOCUMENT_CREATION).to_qt_script()
+            self.cosmetic_scripts[host] = script
+            if len(self.cosmetic_scripts) > 64:
+                self.cosmetic_scripts.popitem(last=False)
+        else:
+            self.cosmetic_scripts.move_to_end(host)
+        return script
+
+    def closeEvent(self, event):
+        # Write out the final tab set and any visits still waiting in the queue
+        self.session_save_timer.stop()
+        self.snapshot_session()
+        print(f"Speculative loading: {self.speculative_loader.summary()}")
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            print(f"Responsiveness: {self.watchdog.summary()}")
+        self.process_sampler.stop()
+        # Running downloads leave a journal and pick up again on the next start
+        self.download_manager.shutdown()
+        # Downloads may go through the relay, so it closes after them
+        self.proxy_pool.stop()
+        if self.proxy_relay is not None:
+            self.proxy_relay.stop()
+            self.proxy_relay = None
+        self.history.close()
+        super().closeEvent(event)
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_D and event.modifiers() == Qt.ShiftModifier:
             self.show_spotlight_search()
+        elif event.key() == Qt.Key_Escape and event.modifiers() == Qt.ShiftModifier:
+            self.show_task_manager()
+        elif event.key() == Qt.Key_J and event.modifiers() == Qt.ControlModifier:
+            self.show_downloads()
+        elif event.key() == Qt.Key_F and event.modifiers() == Qt.ControlModifier:
+            self.show_find_in_tabs()
         else:
             super().keyPressEvent(event)
 
+    def spotlight(self):
+        # Nothing in the palette is needed to show the first page
+        if self.spotlight_search is None:
+            self.spotlight_search = SpotlightSearch(self)
+            self.spotlight_search.index.replace('actions', self.palette_actions())
+            self.load_recent_urls()
+        return self.spotlight_search
+
     def show_spotlight_search(self):
+        spotlight = self.spotlight()
+
         # Center the spotlight search on the screen
         screen_geometry = QtWidgets.QApplication.desktop().screenGeometry()
-        x = (screen_geometry.width() - self.spotlight_search.width()) // 2
-        y = (screen_geometry.height() - self.spotlight_search.height()) // 2
-        self.spotlight_search.move(x, y)
+        x = (screen_geometry.width() - spotlight.width()) // 2
+        y = (screen_geometry.height() - spotlight.height()) // 2
+        spotlight.move(x, y)
         
-        self.spotlight_search.search_input.clear()
-        self.spotlight_search.results_list.clear()
-        self.spotlight_search.show()
+        spotlight.index.replace('tabs', self.palette_tabs())
+        spotlight.search_input.clear()
+        spotlight.model.set_entries([])
+        spotlight.show()
         
         # Set focus to the search input after a short delay
-        QTimer.singleShot(100, self.spotlight_search.search_input.setFocus)
+        QTimer.singleShot(100, spotlight.search_input.setFocus)
+
+    def palette_actions(self):
+        return [
+            PaletteEntry(ACTION, "New Tab", "Open a new tab", lambda: self.add_new_tab()),
+            PaletteEntry(ACTION, "Close Tab", "Close the current tab", self.close_current_tab),
+            PaletteEntry(ACTION, "Zoom In", "Make the page bigger", self.zoom_in),
+            PaletteEntry(ACTION, "Zoom Out", "Make the page smaller", self.zoom_out),
+            PaletteEntry(ACTION, "Toggle VPN", "Route traffic through a proxy", self.vpn_btn.click),
+            PaletteEntry(ACTION, "Toggle Dark Mode", "Switch between light and dark pages", self.toggle_dark_mode),
+            PaletteEntry(ACTION, "Toggle Full Screen", "Enter or leave full screen", self.toggle_full_screen),
+            PaletteEntry(ACTION, "Voice Search", "Speak a command", self.voice_search),
+            PaletteEntry(ACTION, "Toggle Data Saver", "Block or defer images, media, fonts and frames",
+                         self.toggle_data_saver),
+            PaletteEntry(ACTION, "Data Saver Exception", "Turn the data saver off or back on for this site",
+                         self.toggle_data_saver_for_site),
+            PaletteEntry(ACTION, "Downloads", "Show downloads in progress", self.show_downloads),
+            PaletteEntry(ACTION, "Summarize Page", "Summarize the current page", self.summarize_page),
+            PaletteEntry(ACTION, "Task Manager", "CPU and memory used by each tab", self.show_task_manager),
+            PaletteEntry(ACTION, "Find in Tabs", "Search the text of every open tab", self.show_find_in_tabs),
+        ]
+
+    def palette_tabs(self):
+        entries = []
+        for i in range(self.tab_widget.count()):
+            tab = self.tab_widget.widget(i)
+            entries.append(PaletteEntry(TAB, tab.title, tab.url.toString(),
+                                        lambda tab=tab: self.tab_widget.setCurrentWidget(tab)))
+        return entries
+
+    def load_recent_urls(self):
+        # Seed the palette with the most frecent pages from history, least
+        # frecent first so they are the first to be evicted. The rows are
+        # read and indexed on a worker thread and swapped in on this one.
+        index = self.spotlight_search.index
+
+        def run():
+            try:
+                rows = self.history.top(self.max_recent_urls)
+            except Exception as e:
+                print(f"Could not read recent pages: {e}")
+                return
+            recent = OrderedDict((url, self.recent_entry(url, title)) for url, title in reversed(rows))
+            self.recent_urls_loaded.emit(recent, index.build(list(recent.values())))
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_recent_urls_loaded(self, recent, group):
+        # Pages visited while history was read, or still waiting in its
+        # queue, are more recent than any of it
+        index = self.spotlight_search.index
+        index.set_group('recent', group)
+        for url, entry in self.recent_urls.items():
+            if url in recent:
+                recent.move_to_end(url)
+            else:
+                recent[url] = entry
+                index.add('recent', entry)
+        while len(recent) > self.max_recent_urls:
+            _, evicted = recent.popitem(last=False)
+            index.remove('recent', evicted)
+        self.recent_urls = recent
+
+    def recent_entry(self, url, title):
+        return PaletteEntry(RECENT, title or url, url, lambda: self.add_new_tab(url))
+
+    def remember_recent_url(self, url, title):
+        if not url:
+            return
+        if url in self.recent_urls:
+            # Least recently visited pages are the first to be evicted
+            self.recent_urls.move_to_end(url)
+            return
+        entry = self.recent_entry(url, title)
+        self.recent_urls[url] = entry
+        evicted = None
+        if len(self.recent_urls) > self.max_recent_urls:
+            _, evicted = self.recent_urls.popitem(last=False)
+        if self.spotlight_search is None:
+            return
+        index = self.spotlight_search.index
+        if evicted is not None:
+            index.remove('recent', evicted)
+        index.add('recent', entry)
+
+    def show_stats(self):
+        if self.stats_panel is None:
+            self.stats_panel = StatsPanel(self.telemetry, self.speculative_loader, self.watchdog, self)
+        self.stats_panel.show()
+        self.stats_panel.raise_()
+
+    def show_pie_chart(self):
+        if self.pie_chart_panel is None:
+            self.pie_chart_panel = PieChartPanel(self.telemetry, self)
+        self.pie_chart_panel.show()
+        self.pie_chart_panel.raise_()
+
+    def show_downloads(self):
+        if self.downloads_panel is None:
+            self.downloads_panel = DownloadsPanel(self.download_manager, self)
+        self.downloads_panel.show()
+        self.downloads_panel.raise_()
+
+    def show_task_manager(self):
+        if self.task_manager is None:
+            self.task_manager = TaskManager(self)
+        self.task_manager.show()
+        self.task_manager.raise_()
+
+    def show_find_in_tabs(self):
+        if self.find_in_tabs is None:
+            self.find_in_tabs = FindInTabs(self)
+        self.find_in_tabs.show()
+        self.find_in_tabs.raise_()
+        self.find_in_tabs.search_input.setFocus()
+        self.find_in_tabs.search_input.selectAll()
 
     def go_home(self):
         self.load_url()  # This will load the default page
@@ -517,107 +1900,110 @@ class BrowserApp(QMainWindow):
             self.disable_vpn()
 
     def enable_vpn(self):
-        # For demonstration purposes, we're using a public HTTPS proxy
-        # In a real application, you'd want to use a proper VPN service
+        # QtWebEngine only honours the application proxy, so it points at a
+        # local relay; the relay sends each connection through the fastest
+        # healthy proxy in the pool, fails over, and applies the bypass rules
+        if self.proxy_relay is None:
+            self.proxy_relay = ProxyRelay(self.proxy_pool)
+            self.proxy_relay.start()
+        self.proxy_pool.start()
+
         self.proxy.setType(QNetworkProxy.HttpProxy)
-        self.proxy.setHostName("203.30.189.169")  # Example proxy IP
-        self.proxy.setPort(80)  # Example proxy port
-        
-        # Create a custom proxy factory
-        proxy_factory = CustomProxyFactory(self.proxy)
-        
-        # Set the proxy for the application
-        QNetworkProxyFactory.setApplicationProxyFactory(proxy_factory)
-        
-        # Apply proxy to all existing tabs
-        for i in range(self.tab_widget.count()):
-            web_view = self.tab_widget.widget(i)
-            web_view.page().profile().setProxyFactory(proxy_factory)
+        self.proxy.setHostName("127.0.0.1")
+        self.proxy.setPort(self.proxy_relay.port)
+        QNetworkProxy.setApplicationProxy(self.proxy)
+        self.download_manager.proxy = f"http://127.0.0.1:{self.proxy_relay.port}"
         
         self.vpn_btn.setStyleSheet("background-color: #4CAF50;")  # Green when enabled
-        print("VPN enabled")
+        print(f"VPN enabled with {len(self.proxy_pool.proxies)} proxies")
 
     def disable_vpn(self):
         # Reset to system proxy settings
+        self.proxy_pool.stop()
+        QNetworkProxy.setApplicationProxy(QNetworkProxy(QNetworkProxy.DefaultProxy))
         QNetworkProxyFactory.setUseSystemConfiguration(True)
-        
-        # Remove proxy from all existing tabs
-        for i in range(self.tab_widget.count()):
-            web_view = self.tab_widget.widget(i)
-            web_view.page().profile().setProxyFactory(None)
+        self.download_manager.proxy = None
         
         self.vpn_btn.setStyleSheet("")  # Reset to default style
         print("VPN disabled")
 
+    def setup_user_scripts(self):
+        self.user_scripts = UserScriptRegistry()
+        self.user_scripts.register(UserScript(
+            "youtube-fullscreen", YOUTUBE_FULLSCREEN_JS, ["*://*.youtube.com/*"], DOCUMENT_READY))
+        self.user_scripts.register(UserScript(
+            "youtube-autoplay", YOUTUBE_AUTOPLAY_JS, ["*://www.youtube.com/results*"], DOCUMENT_READY))
+        self.user_scripts.register(self.dark_mode_script())
+        self.user_scripts.install(self.web_profile)
+
+    def record_visit(self, web_view, url):
+        # Every URL the view moves to is a visit, pushState navigations of
+        # single-page apps included, but moving to a fragment of the page last
+        # recorded is not; the title follows through on_title_changed
+        if url.scheme() not in ('http', 'https'):
+            return
+        visited = url.adjusted(QUrl.RemoveFragment).toString()
+        if visited != web_view.visited_url:
+            web_view.visited_url = visited
+            self.history.record_visit(url.toString())
+
     def on_load_finished(self, ok, web_view):
+        if ok and web_view.url().scheme() in ('http', 'https'):
+            url = web_view.url().toString()
+            self.remember_recent_url(url, web_view.title())
+            if not self.thumbnails.is_fresh(url):
+                # Give the page a moment to paint before it is grabbed
+                QTimer.singleShot(500, lambda: self.capture_thumbnail(web_view, url))
         if ok:
-            current_url = web_view.url().toString()
-            if "youtube.com" in current_url:
-                self.setup_youtube_fullscreen(web_view)
-            if self.dark_mode:
-                self.apply_dark_mode_to_web_view(web_view)
-
-    def setup_youtube_fullscreen(self, web_view):
-        web_view.page().runJavaScript("""
-        (function() {
-            var style = document.createElement('style');
-            style.textContent = `
-                .ytp-fullscreen-button { display: none !important; }
-                .custom-fullscreen-button {
-                    position: absolute;
-                    bottom: 0;
-                    right: 0;
-                    width: 48px;
-                    height: 48px;
-                    background-color: rgba(0, 0, 0, 0.5);
-                    color: white;
-                    display: flex;
-                    justify-content: center;
-                    align-items: center;
-                    cursor: pointer;
-                    z-index: 1000;
-                }
-            `;
-            document.head.appendChild(style);
-            
-            var button = document.createElement('div');
-            button.className = 'custom-fullscreen-button';
-            button.innerHTML = '⛶';
-            button.onclick = function() {
-                var video = document.querySelector('video');
-                if (video) {
-                    if (video.requestFullscreen) {
-                        video.requestFullscreen();
-                    } else if (video.webkitRequestFullscreen) {
-                        video.webkitRequestFullscreen();
-                    }
-                }
-            };
-            
-            var observer = new MutationObserver(function(mutations) {
-                var videoContainer = document.querySelector('.html5-video-player');
-                if (videoContainer && !videoContainer.querySelector('.custom-fullscreen-button')) {
-                    videoContainer.appendChild(button);
-                    observer.disconnect();
-                }
-            });
-            
-            observer.observe(document.body, { childList: true, subtree: true });
-        })();
-        """)
+            if self.debug_scripts:
+                current_url = web_view.url().toString()
+                injected = self.user_scripts.matching(current_url)
+                names = ", ".join(script.name for script in injected)
+                print(f"{len(injected)} user scripts injected into {current_url}: {names}")
+
+# Qt resource types mapped onto the filter option names used by EasyList
+RESOURCE_TYPE_OPTIONS = {
+    QWebEngineUrlRequestInfo.ResourceTypeMainFrame: 'document',
+    QWebEngineUrlRequestInfo.ResourceTypeSubFrame: 'subdocument',
+    QWebEngineUrlRequestInfo.ResourceTypeStylesheet: 'stylesheet',
+    QWebEngineUrlRequestInfo.ResourceTypeScript: 'script',
+    QWebEngineUrlRequestInfo.ResourceTypeImage: 'image',
+    QWebEngineUrlRequestInfo.ResourceTypeFavicon: 'image',
+    QWebEngineUrlRequestInfo.ResourceTypeFontResource: 'font',
+    QWebEngineUrlRequestInfo.ResourceTypeObject: 'object',
+    QWebEngineUrlRequestInfo.ResourceTypePluginResource: 'object',
+    QWebEngineUrlRequestInfo.ResourceTypeMedia: 'media',
+    QWebEngineUrlRequestInfo.ResourceTypeXhr: 'xmlhttprequest',
+    QWebEngineUrlRequestInfo.ResourceTypePing: 'ping',
+}
 
 class AdBlockInterceptor(QWebEngineUrlRequestInterceptor):
-    def __init__(self, rules):
+    def __init__(self, rules, telemetry=None):
         super().__init__()
         self.rules = rules
+        self.telemetry = telemetry
 
-    def interceptRequest(self, info):
-        url = info.requestUrl().toString()
-        if self.rules.should_block(url):
+    def set_rules(self, rules):
+        # A single attribute store, so requests in flight see either the old
+        # or the new rule set, never a mix of both
+        self.rules = rules
+
+    def interceptRequest(self, info, tab=None):
+        # Called by each page's PageInterceptor with the page's tab; returns
+        # whether the request was blocked
+        start = time.perf_counter_ns()
+        request_url = info.requestUrl()
+        url = request_url.toString()
+        resource_type = RESOURCE_TYPE_OPTIONS.get(info.resourceType(), 'other')
+        first_party_host = info.firstPartyUrl().host() or None
+        blocked = self.rules.should_block(url, resource_type, first_party_host)
+        if blocked:
             info.block(True)
-        else:
-            # Allow all content types
-            info.setHttpHeader(b"Accept", b"*/*")
+        if self.telemetry is not None:
+            # Requests are attributed to the tab and to the site in it (the first party)
+            self.telemetry.record(tab, first_party_host, request_url.host(), resource_type, blocked,
+                                  time.perf_counter_ns() - start)
+        return blocked
 
 class SpotlightSearch(QDialog):
     def __init__(self, parent=None):
@@ -629,35 +2015,561 @@ class SpotlightSearch(QDialog):
         layout = QVBoxLayout(self)
         
         self.search_input = QLineEdit(self)
-        self.search_input.setPlaceholderText("Search...")
+        self.search_input.setPlaceholderText("Search tabs, actions and recent pages...")
         layout.addWidget(self.search_input)
         
-        self.results_list = QListWidget(self)
+        # Open tabs, browser actions and recent URLs, searched on every keystroke
+        self.index = FuzzyIndex()
+        self.model = PaletteModel(self)
+        self.results_list = QListView(self)
+        self.results_list.setModel(self.model)
+        self.results_list.setUniformItemSizes(True)
         layout.addWidget(self.results_list)
         
-        self.search_input.textChanged.connect(self.update_results)
-        self.results_list.itemActivated.connect(self.open_result)
+        # Keystrokes that arrive in one event-loop pass (fast typing, paste)
+        # are coalesced into a single search
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(0)
+        self.update_timer.timeout.connect(self.update_results)
+        
+        self.search_input.textChanged.connect(self.update_timer.start)
+        self.search_input.returnPressed.connect(self.open_current_result)
+        self.results_list.activated.connect(self.open_result)
         
         self.setFixedSize(400, 500)
 
-    def update_results(self, text):
-        self.results_list.clear()
+    def update_results(self):
+        text = self.search_input.text().strip()
+        entries = self.index.search(text) if text else []
         if text:
-            # Here you can implement your search logic
-            # For now, we'll just add some dummy results
-            self.results_list.addItems([f"Result {i} for {text}" for i in range(1, 6)])
-
-    def open_result(self, item):
-        # Here you can implement what happens when a result is selected
-        print(f"Opening: {item.text()}")
+            browser = self.parent()
+            entries.append(PaletteEntry(SEARCH, f'Search the web for "{text}"',
+                                        callback=lambda: browser.perform_search(text)))
+        self.model.set_entries(entries)
+        if entries:
+            self.results_list.setCurrentIndex(self.model.index(0))
+
+    def open_current_result(self):
+        self.update_timer.stop()
+        self.update_results()
+        self.open_result(self.results_list.currentIndex())
+
+    def open_result(self, index):
+        entry = self.model.entry(index.row())
         self.accept()
+        if entry is not None and entry.callback is not None:
+            entry.callback()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
             self.close()
+        elif event.key() in (Qt.Key_Up, Qt.Key_Down) and self.model.rowCount():
+            step = -1 if event.key() == Qt.Key_Up else 1
+            row = (self.results_list.currentIndex().row() + step) % self.model.rowCount()
+            self.results_list.setCurrentIndex(self.model.index(row))
+        else:
+            super().keyPressEvent(event)
+
+class FindInTabs(QDialog):
+    # Searches the text index of all open tabs as you type; choosing a hit
+    # switches to that tab and highlights the match
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+        self.setWindowTitle("Find in Tabs")
+        self.resize(520, 420)
+
+        layout = QVBoxLayout(self)
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("Find text in open tabs...")
+        layout.addWidget(self.search_input)
+        self.results_list = QListWidget(self)
+        self.results_list.setWordWrap(True)
+        layout.addWidget(self.results_list)
+        self.status = QLabel(self)
+        layout.addWidget(self.status)
+
+        self.hits = []
+        self.search_input.textChanged.connect(self.search)
+        self.search_input.returnPressed.connect(lambda: self.open_hit(self.results_list.currentRow()))
+        self.results_list.itemActivated.connect(lambda item: self.open_hit(self.results_list.row(item)))
+        browser.tab_indexer.results_ready.connect(self.show_results)
+
+    def search(self, text):
+        if text.strip():
+            self.browser.tab_indexer.search(text)
+        else:
+            self.show_results(text, [])
+
+    def show_results(self, query, hits):
+        # Answers to text that has been typed over are dropped
+        if query != self.search_input.text():
+            return
+        self.hits = hits
+        self.results_list.clear()
+        for hit in hits:
+            item = QListWidgetItem(f"{hit.title}\n{hit.snippet or hit.url}")
+            item.setToolTip(hit.url)
+            self.results_list.addItem(item)
+        if hits:
+            self.results_list.setCurrentRow(0)
+        indexed = len(self.browser.tab_indexer.index)
+        if query.strip():
+            self.status.setText(f"{len(hits)} tabs match, {indexed} tabs indexed")
+        else:
+            self.status.setText(f"{indexed} tabs indexed")
+
+    def open_hit(self, row):
+        if 0 <= row < len(self.hits):
+            hit = self.hits[row]
+            self.hide()
+            self.browser.find_in_tab(hit.tab_id, hit.needle)
+
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key_Up, Qt.Key_Down) and self.results_list.count():
+            step = -1 if event.key() == Qt.Key_Up else 1
+            self.results_list.setCurrentRow((self.results_list.currentRow() + step) % self.results_list.count())
         else:
             super().keyPressEvent(event)
 
+class StatsPanel(QDialog):
+    # Live request counters; refreshed once a second while open
+    TABLES = [("Tabs", TAB_ID), ("Sites", SITE), ("Hosts", HOST), ("Resource types", TYPE)]
+
+    def __init__(self, telemetry, speculative_loader=None, watchdog=None, parent=None):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.speculative_loader = speculative_loader
+        self.watchdog = watchdog
+        self.setWindowTitle("Stats")
+        self.resize(520, 480)
+
+        layout = QVBoxLayout(self)
+        self.summary = QLabel(self)
+        layout.addWidget(self.summary)
+
+        self.tabs = QTabWidget(self)
+        self.tables = []
+        for title, field in self.TABLES:
+            table = QTableWidget(0, 3, self)
+            table.setHorizontalHeaderLabels([title[:-1].capitalize(), "Requests", "Blocked"])
+            table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+            table.verticalHeader().setVisible(False)
+            table.setEditTriggers(QTableWidget.NoEditTriggers)
+            self.tabs.addTab(table, title)
+            self.tables.append((field, table))
+        self.tabs.currentChanged.connect(self.refresh)
+        layout.addWidget(self.tabs)
+
+        export_btn = QPushButton("Export JSON...", self)
+        export_btn.clicked.connect(self.export)
+        layout.addWidget(export_btn)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        total, blocked = self.telemetry.totals()
+        share = blocked * 100 / total if total else 0.0
+        p50 = self.telemetry.decision_percentile(50) / 1000
+        p99 = self.telemetry.decision_percentile(99) / 1000
+        summary = (f"{total} requests, {blocked} blocked ({share:.1f}%)\n"
+                   f"Ad-block decision time: p50 under {p50:.1f} µs, p99 under {p99:.1f} µs")
+        if self.speculative_loader is not None:
+            summary += f"\nSpeculative loading: {self.speculative_loader.summary()}"
+        if self.watchdog is not None:
+            summary += f"\nResponsiveness: {self.watchdog.summary()}"
+        self.summary.setText(summary)
+        # Only the visible table is rebuilt
+        field, table = self.tables[self.tabs.currentIndex()]
+        rows = self.telemetry.top(field, limit=100)
+        table.setRowCount(len(rows))
+        for row, (name, allowed, blocked) in enumerate(rows):
+            for column, value in enumerate((name or "(none)", allowed + blocked, blocked)):
+                item = table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    table.setItem(row, column, item)
+                item.setText(str(value))
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Stats", "goon-stats.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            self.telemetry.export_json(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Stats", f"Could not write {path}: {e}")
+
+class SummaryPanel(QFrame):
+    cancel_requested = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedWidth(320)
+        self.setStyleSheet("background-color: #FFF1E6; border-radius: 10px;")
+        layout = QVBoxLayout(self)
+
+        header = QHBoxLayout()
+        self.title = QLabel("Summary", self)
+        self.title.setStyleSheet("font-size: 14px; font-weight: bold;")
+        self.title.setWordWrap(True)
+        header.addWidget(self.title, 1)
+        self.stop_btn = QPushButton("Stop", self)
+        self.stop_btn.clicked.connect(self.cancel_requested)
+        header.addWidget(self.stop_btn)
+        close_btn = QPushButton("Close", self)
+        close_btn.clicked.connect(self.close_panel)
+        header.addWidget(close_btn)
+        layout.addLayout(header)
+
+        self.status = QLabel(self)
+        self.status.setWordWrap(True)
+        layout.addWidget(self.status)
+        self.text = QPlainTextEdit(self)
+        self.text.setReadOnly(True)
+        layout.addWidget(self.text)
+        self.hide()
+
+    def begin(self, title):
+        self.title.setText(title)
+        self.status.setText("Reading the page...")
+        self.text.clear()
+        self.stop_btn.show()
+        self.show()
+
+    def set_status(self, status):
+        self.status.setText(status)
+
+    def append(self, piece):
+        self.text.moveCursor(QtGui.QTextCursor.End)
+        self.text.insertPlainText(piece)
+
+    def finish(self, status, summary=None):
+        if summary is not None:
+            self.text.setPlainText(summary)
+        self.status.setText(status)
+        self.stop_btn.hide()
+
+    def close_panel(self):
+        self.cancel_requested.emit()
+        self.hide()
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class DownloadsPanel(QDialog):
+    COLUMNS = ["File", "Progress", "Speed", "Time Left", "Status"]
+
+    def __init__(self, manager, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.setWindowTitle("Downloads")
+        self.resize(720, 360)
+
+        layout = QVBoxLayout(self)
+        header = QHBoxLayout()
+        self.summary = QLabel(self)
+        header.addWidget(self.summary, 1)
+        header.addWidget(QLabel("Limit (KB/s, 0 for none):", self))
+        self.limit = QSpinBox(self)
+        self.limit.setRange(0, 1000000)
+        self.limit.setSingleStep(100)
+        self.limit.setValue(int(manager.bucket.rate // 1024))
+        self.limit.valueChanged.connect(lambda value: self.manager.set_bandwidth(value * 1024))
+        header.addWidget(self.limit)
+        layout.addLayout(header)
+
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
+        self.table.itemSelectionChanged.connect(self.update_buttons)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        self.pause_btn = QPushButton("Pause", self)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        buttons.addWidget(self.pause_btn)
+        self.cancel_btn = QPushButton("Cancel", self)
+        self.cancel_btn.clicked.connect(self.cancel)
+        buttons.addWidget(self.cancel_btn)
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(500)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        downloads = list(self.manager.downloads)
+        running = sum(1 for download in downloads if download.state == RUNNING)
+        self.summary.setText(f"{running} running, {format_size(self.manager.throughput())}/s")
+        self.table.setRowCount(len(downloads))
+        for row, download in enumerate(downloads):
+            received = download.received
+            if download.size:
+                progress = (f"{format_size(received)} of {format_size(download.size)} "
+                            f"({received * 100 // download.size}%)")
+            else:
+                progress = format_size(received)
+            speed = f"{format_size(download.throughput())}/s" if download.state == RUNNING else "-"
+            eta = download.eta()
+            eta = f"{int(eta) // 60}:{int(eta) % 60:02d}" if eta is not None else "-"
+            status = download.state.capitalize()
+            if download.state == RUNNING and len(download.segments) > 1:
+                status += f" ({len(download.segments)} connections)"
+            elif download.state == FAILED:
+                status += f": {download.error}"
+            for column, value in enumerate((download.name, progress, speed, eta, status)):
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    self.table.setItem(row, column, item)
+                item.setText(value)
+        self.update_buttons()
+
+    def selected(self):
+        row = self.table.currentRow()
+        downloads = self.manager.downloads
+        if 0 <= row < len(downloads) and self.table.selectionModel().hasSelection():
+            return downloads[row]
+        return None
+
+    def update_buttons(self):
+        download = self.selected()
+        active = download is not None and download.state in (QUEUED, RUNNING, PAUSED, FAILED)
+        self.pause_btn.setEnabled(active)
+        self.pause_btn.setText("Resume" if download is not None and download.state in (PAUSED, FAILED) else "Pause")
+        self.cancel_btn.setEnabled(active)
+
+    def toggle_pause(self):
+        download = self.selected()
+        if download is None:
+            return
+        if download.state in (PAUSED, FAILED):
+            self.manager.resume(download)
+        else:
+            self.manager.pause(download)
+        self.refresh()
+
+    def cancel(self):
+        download = self.selected()
+        if download is not None:
+            self.manager.cancel(download)
+            self.refresh()
+
+class TaskManager(QDialog):
+    COLUMNS = ["Tab", "Process", "CPU", "Memory", "Data Saved", "Status"]
+
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+        self.rows = []
+        self.setWindowTitle("Task Manager")
+        self.resize(640, 400)
+
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
+        self.table.itemSelectionChanged.connect(self.update_buttons)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        self.kill_btn = QPushButton("Kill Process", self)
+        self.kill_btn.clicked.connect(self.kill)
+        buttons.addWidget(self.kill_btn)
+        self.reload_btn = QPushButton("Reload", self)
+        self.reload_btn.clicked.connect(self.reload)
+        buttons.addWidget(self.reload_btn)
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        samples = self.browser.process_sampler.samples()
+        self.rows = self.browser.tab_processes()
+        self.table.setRowCount(len(self.rows))
+        for row, (tab, pid) in enumerate(self.rows):
+            sample = samples.get(pid)
+            cpu = f"{sample.cpu:.0f}%" if sample is not None else "-"
+            memory = f"{sample.rss // (1024 * 1024)} MB" if sample is not None else "-"
+            color = QtGui.QColor("#C62828") if tab.runaway else QtGui.QColor()
+            saved = self.browser.tab_data_saved(tab)
+            saved = format_size(saved.total_bytes) if saved is not None and saved.total_requests else "-"
+            for column, value in enumerate((tab.title, pid or "-", cpu, memory, saved, tab.status())):
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    self.table.setItem(row, column, item)
+                item.setText(str(value))
+                item.setForeground(color)
+        self.update_buttons()
+
+    def selected(self):
+        # (tab, pid) of the selected row, or None
+        row = self.table.currentRow()
+        if 0 <= row < len(self.rows) and self.table.selectionModel().hasSelection():
+            return self.rows[row]
+        return None
+
+    def update_buttons(self):
+        selected = self.selected()
+        self.kill_btn.setEnabled(selected is not None and bool(selected[1]))
+        self.reload_btn.setEnabled(selected is not None)
+
+    def kill(self):
+        selected = self.selected()
+        if selected is not None:
+            self.browser.kill_tab_process(selected[0])
+            self.refresh()
+
+    def reload(self):
+        selected = self.selected()
+        if selected is not None:
+            self.browser.reload_tab(selected[0])
+            self.refresh()
+
+PIE_COLORS = ['#FF6B6B', '#FFA45B', '#FFD93D', '#6BCB77', '#4D96FF', '#9B72CF', '#C0C0C0', '#8A8A8A']
+
+class PieChart(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.slices = []
+        self.setMinimumSize(480, 260)
+
+    def set_slices(self, values):
+        self.slices = sorted(values.items(), key=lambda item: item[1], reverse=True)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        total = sum(value for _, value in self.slices)
+        if not total:
+            painter.drawText(self.rect(), Qt.AlignCenter, "Nothing blocked yet")
+            return
+        side = min(self.width() * 2 // 5, self.height()) - 20
+        pie = QtCore.QRect(10, (self.height() - side) // 2, side, side)
+        # Angles are in 1/16ths of a degree, counter-clockwise from 3 o'clock
+        angle = 90 * 16
+        for i, (name, value) in enumerate(self.slices):
+            span = -round(value * 360 * 16 / total)
+            color = QtGui.QColor(PIE_COLORS[i % len(PIE_COLORS)])
+            painter.setBrush(color)
+            painter.drawPie(pie, angle, span)
+            angle += span
+            y = pie.top() + i * 22
+            painter.drawRect(pie.right() + 20, y, 14, 14)
+            painter.drawText(pie.right() + 42, y + 12, f"{name}: {value} ({value * 100 / total:.0f}%)")
+
+class PieChartPanel(QDialog):
+    def __init__(self, telemetry, parent=None):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.setWindowTitle("Blocked by category")
+        layout = QVBoxLayout(self)
+        self.chart = PieChart(self)
+        layout.addWidget(self.chart)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        self.chart.set_slices(self.telemetry.blocked_by_type())
+
+class NewTabSchemeHandler(QWebEngineUrlSchemeHandler):
+    # Serves goon:// from memory: the new tab page, its thumbnails, and
+    # goon://tab/<id> links, which switch to that tab instead of loading
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        host = url.host()
+        if host == 'newtab':
+            self.reply(job, b'text/html', self.browser.new_tab_page())
+        elif host == 'thumbnail':
+            data = self.browser.thumbnails.get(url.path().strip('/').removesuffix('.jpg'))
+            if data is None:
+                job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            else:
+                self.reply(job, b'image/jpeg', data)
+        elif host == 'tab':
+            self.browser.switch_to_tab(url.path().strip('/'))
+            job.fail(QWebEngineUrlRequestJob.RequestAborted)
+        else:
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+
+    @staticmethod
+    def reply(job, content_type, data):
+        # The buffer belongs to the job so it lives exactly as long as the reply
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        job.reply(content_type, buffer)
+
+def register_url_schemes():
+    # Has to happen before the QApplication is created
+    scheme = QWebEngineUrlScheme(SCHEME.encode())
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.LocalScheme
+                    | QWebEngineUrlScheme.LocalAccessAllowed)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
 # Add this function to handle network errors
 def handle_network_error(reply):
     error = reply.error()
@@ -672,18 +2584,79 @@ def handle_network_error(reply):
     else:
         print(f"Network error occurred: {reply.errorString()}")
 
-def main():
+def run_batch(args):
+    # Renders the URL list with the browser's profile, ad blocking, data
+    # saver and dark mode, without a window; exits 1 if any page failed
+    try:
+        urls = read_url_list(args.batch)
+    except OSError as e:
+        print(f"Could not read {args.batch}: {e}")
+        return 1
+    register_url_schemes()
+    app = QtWidgets.QApplication(sys.argv)
+    app.setApplicationName("Goon")
+    browser = BrowserApp(adblock_source=args.easylist, debug_scripts=args.debug_scripts,
+                         restore_session=False, proxies=args.proxy, proxy_bypass=args.proxy_bypass,
+                         data_saver=args.data_saver, data_saver_policy=args.data_saver_policy,
+                         data_saver_sites=args.data_saver_site, headless=True)
+    if args.dark_mode:
+        browser.toggle_dark_mode()
+    # Cached rules are in use already; a newer list replaces them mid-batch
+    browser.adblock_updater.refresh()
+    renderer = BatchRenderer(urls, args.batch_output, browser.create_batch_view, formats=args.batch_format,
+                             concurrency=args.batch_concurrency, timeout=args.batch_timeout,
+                             retries=args.batch_retries)
+    renderer.finished.connect(app.quit)
+    QTimer.singleShot(0, renderer.start)
+    app.exec_()
+    browser.history.close()
+    return 1 if renderer.failed else 0
+
+def main(args, instance):
+    if args.headless:
+        # Held for the whole batch, so no browser starts on the profile meanwhile
+        status = run_batch(args)
+        instance.release()
+        sys.exit(status)
+    urls = args.urls
+    timeline = None
+    if args.profile_startup:
+        timeline = StartupTimeline(STARTED_AT)
+        timeline.mark("imports")
+    register_url_schemes()
     app = QtWidgets.QApplication(sys.argv)
     app.setStyle(QStyleFactory.create('Fusion'))
     app.setApplicationName("Goon")
+    if timeline is not None:
+        timeline.mark("QApplication")
     
     # Set up global network access manager
     network_manager = QNetworkAccessManager()
     network_manager.finished.connect(handle_network_error)
     
-    browser = BrowserApp()
-    browser.show()
-    sys.exit(app.exec_())
+    browser = BrowserApp(adblock_source=args.easylist, max_live_tabs=args.max_live_tabs,
+                         memory_budget_mb=args.memory_budget, debug_scripts=args.debug_scripts,
+                         voice_backend=args.voice_backend, vosk_model=args.vosk_model,
+                         history_retention_days=args.history_days, history_max_entries=args.history_max_entries,
+                         restore_session=args.restore, startup_timeline=timeline,
+                         proxies=args.proxy, proxy_bypass=args.proxy_bypass,
+                         runaway_cpu=args.runaway_cpu, runaway_memory_mb=args.runaway_memory,
+                         summary_backend=args.summary_backend, summary_model=args.summary_model,
+                         summary_url=args.summary_url, max_downloads=args.max_downloads,
+                         download_limit_kb=args.download_limit, data_saver=args.data_saver,
+                         data_saver_policy=args.data_saver_policy, data_saver_sites=args.data_saver_site,
+                         urls=urls, stall_threshold_ms=args.stall_threshold if args.watch_stalls else None)
+    if args.dark_mode:
+        browser.toggle_dark_mode()
+    # Shown only once the widget tree is complete, so the first frame is the real one
+    browser.showMaximized()
+    if instance is not None:
+        instance.received.connect(browser.open_forwarded)
+        instance.listen()
+    status = app.exec_()
+    if instance is not None:
+        instance.release()
+    sys.exit(status)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(LAUNCH_ARGS, INSTANCE)
\ No newline at end of file
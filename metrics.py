@@ -0,0 +1,6 @@
+def percentile(values, fraction):
+    # Nearest-rank percentile, fraction in [0, 1]; 0.0 for no values
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
@@ -0,0 +1,166 @@
+import hashlib
+import html
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from PyQt5.QtCore import QBuffer, QIODevice, Qt
+
+SCHEME = 'goon'
+NEW_TAB_URL = 'goon://newtab'
+TOP_SITES = 8
+
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_HEIGHT = 200
+THUMBNAIL_QUALITY = 70
+# A page is captured again only once its thumbnail is this old
+THUMBNAIL_MAX_AGE = 10 * 60
+
+NEW_TAB_HTML = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>New Tab</title>
+<style>
+    body { margin: 0; padding: 40px; background: #FFF1E6; color: #333333; font-family: sans-serif; }
+    form { max-width: 640px; margin: 0 auto 40px; }
+    input { width: 100%%; box-sizing: border-box; padding: 12px 20px; border: 0; border-radius: 20px;
+            font-size: 16px; background: #FFFFFF; }
+    h2 { font-size: 14px; font-weight: normal; color: #8A8A8A; margin: 24px 0 12px; }
+    .grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(160px, 1fr)); gap: 16px; }
+    .tile { display: block; text-decoration: none; color: inherit; background: #FFD7BA; border-radius: 10px;
+            overflow: hidden; }
+    .tile img, .glyph { display: block; width: 100%%; aspect-ratio: 8 / 5; object-fit: cover; }
+    .glyph { display: flex; align-items: center; justify-content: center; background: #FFA45B; color: #FFFFFF;
+             font-size: 40px; }
+    .tile span, li a { display: block; padding: 6px 10px; white-space: nowrap; overflow: hidden;
+                       text-overflow: ellipsis; font-size: 13px; }
+    ul { list-style: none; padding: 0; margin: 0; }
+    li a { color: inherit; text-decoration: none; border-radius: 5px; }
+    li a:hover, .tile:hover { background: #FF6B6B; color: #FFFFFF; }
+</style>
+</head>
+<body>
+<form action="https://duckduckgo.com/" method="get"><input name="q" placeholder="Search" autofocus></form>
+%s
+</body>
+</html>
+"""
+
+
+def thumbnail_key(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:20]
+
+
+def thumbnail_url(key):
+    return f'{SCHEME}://thumbnail/{key}.jpg'
+
+
+def top_sites(rows, limit=TOP_SITES):
+    # The most frecent page of each of the first `limit` sites in rows, which
+    # come from HistoryStore.top() ordered by frecency
+    sites = OrderedDict()
+    for url, title in rows:
+        host = urlsplit(url).hostname
+        if host and host not in sites:
+            sites[host] = (url, title)
+            if len(sites) == limit:
+                break
+    return list(sites.values())
+
+
+def render_new_tab(sites, tabs, thumbnails):
+    # sites are (url, title) pairs and tabs (tab id, url, title) triples;
+    # thumbnails says which URLs have a picture
+    sections = []
+    if sites:
+        tiles = []
+        for url, title in sites:
+            label = html.escape(title or urlsplit(url).hostname or url)
+            key = thumbnail_key(url)
+            if key in thumbnails:
+                picture = f'<img src="{thumbnail_url(key)}" alt="">'
+            else:
+                letter = (urlsplit(url).hostname or '?').removeprefix('www.')[:1].upper()
+                picture = f'<div class="glyph">{html.escape(letter)}</div>'
+            tiles.append(f'<a class="tile" href="{html.escape(url)}" title="{html.escape(url)}">'
+                         f'{picture}<span>{label}</span></a>')
+        sections.append(f'<h2>Top sites</h2><div class="grid">{"".join(tiles)}</div>')
+    if tabs:
+        items = ''.join(f'<li><a href="{SCHEME}://tab/{tab_id}" title="{html.escape(url)}">'
+                        f'{html.escape(title or url)}</a></li>' for tab_id, url, title in tabs)
+        sections.append(f'<h2>Open tabs</h2><ul>{items}</ul>')
+    return (NEW_TAB_HTML % '\n'.join(sections)).encode('utf-8')
+
+
+class ThumbnailCache:
+    # Downscaled JPEG captures of visited pages, kept in memory and mirrored
+    # to disk; the least recently shown ones are evicted beyond max_entries
+    def __init__(self, directory, max_entries=64):
+        self.directory = directory
+        self.max_entries = max_entries
+        # key -> [JPEG bytes or None until read from disk, captured at]
+        self._entries = OrderedDict()
+        try:
+            files = sorted(os.scandir(directory), key=lambda entry: entry.stat().st_mtime)
+        except OSError:
+            files = []
+        for entry in files:
+            if entry.name.endswith('.jpg'):
+                self._entries[entry.name[:-4]] = [None, entry.stat().st_mtime]
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.jpg')
+
+    def is_fresh(self, url):
+        entry = self._entries.get(thumbnail_key(url))
+        return entry is not None and time.time() - entry[1] < THUMBNAIL_MAX_AGE
+
+    def put(self, url, image):
+        # Keeps the top of the page at the thumbnail's width
+        image = image.scaledToWidth(THUMBNAIL_WIDTH, Qt.SmoothTransformation)
+        image = image.copy(0, 0, THUMBNAIL_WIDTH, min(THUMBNAIL_HEIGHT, image.height()))
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        if not image.save(buffer, 'JPEG', THUMBNAIL_QUALITY):
+            return None
+        data = bytes(buffer.data())
+        key = thumbnail_key(url)
+        self._entries[key] = [data, time.time()]
+        self._entries.move_to_end(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(key) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Could not save thumbnail: {e}")
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            try:
+                os.remove(self._path(evicted))
+            except OSError:
+                pass
+        return key
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] is None:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    entry[0] = f.read()
+            except OSError:
+                del self._entries[key]
+                return None
+        self._entries.move_to_end(key)
+        return entry[0]
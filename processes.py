@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+# A renderer is flagged as runaway once it stays over either threshold for
+# this many samples in a row, so a single busy page load does not count
+RUNAWAY_CPU = 90.0
+RUNAWAY_RSS_MB = 1024
+RUNAWAY_SAMPLES = 3
+
+# cpu is percent of one core since the previous sample, rss is in bytes
+ProcessSample = namedtuple('ProcessSample', 'pid cpu rss runaway')
+
+
+def read_process(pid):
+    # (CPU time in seconds, resident bytes) from /proc (Linux only), or None
+    # once the process is gone
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+        with open(f'/proc/{pid}/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    # The command name may contain spaces and brackets, the fields after it
+    # cannot; utime and stime are the 14th and 15th fields
+    fields = stat.rpartition(')')[2].split()
+    try:
+        ticks = int(fields[11]) + int(fields[12])
+    except (ValueError, IndexError):
+        return None
+    return ticks / os.sysconf('SC_CLK_TCK'), pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class ProcessSampler:
+    # Samples CPU and memory of the watched renderer processes on its own
+    # thread. The GUI thread hands over the PIDs with watch() and reads the
+    # latest samples(); both swap a whole object, so neither side locks.
+    def __init__(self, interval=2.0, cpu_threshold=RUNAWAY_CPU, rss_threshold_mb=RUNAWAY_RSS_MB,
+                 sustain=RUNAWAY_SAMPLES):
+        self.interval = interval
+        self.cpu_threshold = cpu_threshold
+        self.rss_threshold = rss_threshold_mb * 1024 * 1024
+        self.sustain = sustain
+        self._pids = frozenset()
+        self._samples = {}
+        self._previous = {}
+        self._over = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, pids):
+        self._pids = frozenset(pid for pid in pids if pid > 0)
+
+    def samples(self):
+        # pid -> ProcessSample from the most recent pass
+        return self._samples
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        now = time.monotonic()
+        samples = {}
+        previous = {}
+        over = {}
+        for pid in self._pids:
+            usage = read_process(pid)
+            if usage is None:
+                continue
+            cpu_time, rss = usage
+            cpu = 0.0
+            if pid in self._previous:
+                last_cpu_time, last_at = self._previous[pid]
+                if now > last_at:
+                    cpu = (cpu_time - last_cpu_time) * 100 / (now - last_at)
+            previous[pid] = (cpu_time, now)
+            over[pid] = self._over.get(pid, 0) + 1 if cpu > self.cpu_threshold or rss > self.rss_threshold else 0
+            samples[pid] = ProcessSample(pid, cpu, rss, over[pid] >= self.sustain)
+        # Processes that went away are forgotten here
+        self._previous = previous
+        self._over = over
+        self._samples = samples
+        return samples
+
+
+class ReloadBudget:
+    # Bounds automatic reloads after a renderer dies: at most `limit` within
+    # `window` seconds, each waiting twice as long as the one before, so a
+    # page that crashes its renderer on load is not reloaded forever
+    def __init__(self, limit=3, window=300, delay=1.0):
+        self.limit = limit
+        self.window = window
+        self.delay = delay
+        self.reloads = []
+
+    def next_delay(self):
+        # Seconds to wait before reloading, or None when the budget is spent
+        now = time.monotonic()
+        self.reloads = [at for at in self.reloads if now - at < self.window]
+        if len(self.reloads) >= self.limit:
+            return None
+        self.reloads.append(now)
+        return self.delay * 2 ** (len(self.reloads) - 1)
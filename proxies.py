@@ -0,0 +1,328 @@
+import ipaddress
+import selectors
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+HTTP = 'http'
+SOCKS5 = 'socks5'
+
+DEFAULT_PROXIES = ['http://203.30.189.169:80']
+DEFAULT_BYPASS = ['<local>', 'localhost', '127.0.0.0/8', '::1']
+PROBE_TARGET = ('duckduckgo.com', 443)
+
+MAX_HEAD = 64 * 1024
+
+
+class ProxyError(Exception):
+    pass
+
+
+def _recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ProxyError("proxy closed the connection")
+        data += chunk
+    return data
+
+
+def _read_head(sock):
+    # Returns (request or response head, bytes read past it)
+    data = b''
+    while b'\r\n\r\n' not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ProxyError("connection closed before the headers ended")
+        data += chunk
+        if len(data) > MAX_HEAD:
+            raise ProxyError("headers too large")
+    head, _, rest = data.partition(b'\r\n\r\n')
+    return head + b'\r\n\r\n', rest
+
+
+class UpstreamProxy:
+    def __init__(self, scheme, host, port):
+        if scheme not in (HTTP, SOCKS5):
+            raise ValueError(f"Unsupported proxy type {scheme}")
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        # None until the first probe
+        self.healthy = None
+        self.latency = None
+        self.failures = 0
+
+    @classmethod
+    def parse(cls, spec):
+        # "socks5://host:port", "http://host:port" or a bare "host:port" (HTTP)
+        if '://' not in spec:
+            spec = f'{HTTP}://{spec}'
+        parts = urlsplit(spec)
+        scheme = 'socks5' if parts.scheme in ('socks', 'socks5', 'socks5h') else parts.scheme
+        if not parts.hostname:
+            raise ValueError(f"Invalid proxy {spec}")
+        return cls(scheme, parts.hostname, parts.port or (1080 if scheme == SOCKS5 else 8080))
+
+    def __str__(self):
+        return f'{self.scheme}://{self.host}:{self.port}'
+
+    def open(self, host, port, tunnel, timeout):
+        # A socket that reaches host:port through this proxy. Plain HTTP
+        # requests to an HTTP proxy are not tunnelled: the caller forwards
+        # the absolute-URI request over the returned socket as is.
+        sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        try:
+            if self.scheme == SOCKS5:
+                self._socks5_connect(sock, host, port)
+            elif tunnel:
+                self._http_connect(sock, host, port)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    def _http_connect(sock, host, port):
+        sock.sendall(f'CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n'.encode('ascii'))
+        head, _ = _read_head(sock)
+        status_line = head.split(b'\r\n', 1)[0]
+        status = status_line.split()
+        if len(status) < 2 or not status[1].startswith(b'2'):
+            raise ProxyError(f"proxy refused CONNECT: {status_line.decode('latin-1')}")
+
+    @staticmethod
+    def _socks5_connect(sock, host, port):
+        sock.sendall(b'\x05\x01\x00')
+        if _recv_exactly(sock, 2) != b'\x05\x00':
+            raise ProxyError("SOCKS5 proxy wants authentication")
+        # Let the proxy resolve names, so DNS goes through it as well
+        name = host.encode('idna')
+        sock.sendall(b'\x05\x01\x00\x03' + bytes([len(name)]) + name + struct.pack('!H', port))
+        reply = _recv_exactly(sock, 4)
+        if reply[1] != 0:
+            raise ProxyError(f"SOCKS5 connect failed with code {reply[1]}")
+        address_length = {1: 4, 4: 16}.get(reply[3])
+        if address_length is None:
+            address_length = _recv_exactly(sock, 1)[0]
+        _recv_exactly(sock, address_length + 2)
+
+
+class BypassRules:
+    # Hosts that never go through a proxy: "example.com" (exact),
+    # "*.example.com" or ".example.com" (subdomains), IP networks in CIDR
+    # notation, and "<local>" for dotless intranet names
+    def __init__(self, patterns=()):
+        self.hosts = set()
+        self.suffixes = []
+        self.networks = []
+        self.local = False
+        for pattern in patterns:
+            pattern = pattern.strip().lower()
+            if not pattern:
+                continue
+            if pattern == '<local>':
+                self.local = True
+                continue
+            try:
+                self.networks.append(ipaddress.ip_network(pattern, strict=False))
+                continue
+            except ValueError:
+                pass
+            if pattern.startswith('*.') or pattern.startswith('.'):
+                self.suffixes.append('.' + pattern.lstrip('*.'))
+            else:
+                self.hosts.add(pattern)
+
+    def matches(self, host):
+        host = host.lower().strip('[]')
+        if host in self.hosts or any(host.endswith(suffix) for suffix in self.suffixes):
+            return True
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return self.local and '.' not in host
+        return any(address in network for network in self.networks)
+
+
+class ProxyPool:
+    # Upstreams are probed concurrently in the background; connections go
+    # through the fastest healthy one and fall over to the next on failure
+    def __init__(self, proxies, bypass=DEFAULT_BYPASS, probe_target=PROBE_TARGET, timeout=5.0,
+                 probe_interval=60.0):
+        self.proxies = [proxy if isinstance(proxy, UpstreamProxy) else UpstreamProxy.parse(proxy)
+                        for proxy in proxies]
+        self.bypass = bypass if isinstance(bypass, BypassRules) else BypassRules(bypass)
+        self.probe_target = probe_target
+        self.timeout = timeout
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.probe_all()
+            self._wakeup.wait(self.probe_interval)
+            self._wakeup.clear()
+
+    def probe(self, proxy):
+        start = time.perf_counter()
+        try:
+            proxy.open(*self.probe_target, tunnel=True, timeout=self.timeout).close()
+        except (OSError, ProxyError):
+            with self._lock:
+                proxy.healthy = False
+                proxy.latency = None
+            return False
+        with self._lock:
+            proxy.healthy = True
+            proxy.latency = time.perf_counter() - start
+            proxy.failures = 0
+        return True
+
+    def probe_all(self):
+        if not self.proxies:
+            return
+        with ThreadPoolExecutor(max_workers=min(16, len(self.proxies))) as executor:
+            list(executor.map(self.probe, self.proxies))
+
+    def ranked(self):
+        # Healthy proxies by latency, then unprobed ones, then the ones that
+        # failed as a last resort
+        with self._lock:
+            return sorted(self.proxies, key=lambda proxy: (
+                {True: 0, None: 1, False: 2}[proxy.healthy],
+                proxy.latency if proxy.latency is not None else float('inf'),
+                proxy.failures))
+
+    def best(self):
+        ranked = self.ranked()
+        return ranked[0] if ranked and ranked[0].healthy else None
+
+    def report_failure(self, proxy):
+        with self._lock:
+            proxy.healthy = False
+            proxy.latency = None
+            proxy.failures += 1
+        # Re-probe now rather than at the next interval
+        self._wakeup.set()
+
+    def open(self, host, port, tunnel):
+        # Returns (socket, proxy or None when the host is bypassed)
+        if self.bypass.matches(host):
+            return socket.create_connection((host, port), timeout=self.timeout), None
+        for proxy in self.ranked():
+            try:
+                sock = proxy.open(host, port, tunnel, self.timeout)
+            except (OSError, ProxyError) as e:
+                print(f"Proxy {proxy} failed, trying the next one: {e}")
+                self.report_failure(proxy)
+                continue
+            return sock, proxy
+        raise ProxyError("no proxy in the pool is reachable")
+
+
+def _relay(left, right):
+    # Copies bytes both ways until either side closes
+    for sock in (left, right):
+        sock.settimeout(None)
+    selector = selectors.DefaultSelector()
+    selector.register(left, selectors.EVENT_READ, right)
+    selector.register(right, selectors.EVENT_READ, left)
+    try:
+        while True:
+            for key, _ in selector.select():
+                data = key.fileobj.recv(65536)
+                if not data:
+                    return
+                key.data.sendall(data)
+    except OSError:
+        pass
+    finally:
+        selector.close()
+
+
+class _RelayHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        client = self.request
+        pool = self.server.pool
+        try:
+            head, rest = _read_head(client)
+            method, target, _ = head.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+            if method == 'CONNECT':
+                host, _, port = target.rpartition(':')
+                host, port, tunnel = host.strip('[]'), int(port), True
+            else:
+                parts = urlsplit(target)
+                host, port, tunnel = parts.hostname, parts.port or 80, False
+                # One request per connection: the next one may be for another host
+                head = self._close_after_response(head)
+            if not host:
+                raise ProxyError(f"cannot route {target}")
+        except (OSError, ValueError, ProxyError):
+            return
+
+        try:
+            upstream, _ = pool.open(host, port, tunnel)
+        except (OSError, ProxyError) as e:
+            client.sendall(f'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nX-Proxy-Error: {e}\r\n\r\n'
+                           .encode('latin-1', 'replace'))
+            return
+        with upstream:
+            if tunnel:
+                client.sendall(b'HTTP/1.1 200 Connection Established\r\n\r\n')
+                if rest:
+                    upstream.sendall(rest)
+            else:
+                upstream.sendall(head + rest)
+            _relay(client, upstream)
+
+    @staticmethod
+    def _close_after_response(head):
+        lines = head[:-4].split(b'\r\n')
+        kept = [line for line in lines[1:]
+                if not line.lower().startswith((b'connection:', b'proxy-connection:', b'keep-alive:'))]
+        return b'\r\n'.join([lines[0]] + kept + [b'Connection: close']) + b'\r\n\r\n'
+
+
+class ProxyRelay(socketserver.ThreadingTCPServer):
+    # Local HTTP proxy in front of the pool. QtWebEngine only honours the
+    # application proxy, so it points here once and upstream choice,
+    # failover and bypass rules are decided per connection.
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, pool, host='127.0.0.1', port=0):
+        super().__init__((host, port), _RelayHandler)
+        self.pool = pool
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt
+
+from metrics import percentile
+
+STALL_THRESHOLD_MS = 100
+# How often the event loop is asked to check in
+HEARTBEAT_MS = 50
+# Lag of the most recent heartbeats kept for the percentiles
+LAG_SAMPLES = 20000
+# At most this many stacks are captured during one stall
+MAX_STACKS = 20
+# The log is rolled over to a single .1 backup past this size
+MAX_LOG_BYTES = 1024 * 1024
+
+
+class StallLog:
+    # Append-only text log of stalls that rolls over to one backup file
+    def __init__(self, path, max_bytes=MAX_LOG_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def write(self, duration_ms, stacks):
+        lines = [f"{time.strftime('%Y-%m-%d %H:%M:%S')} event loop stalled for {duration_ms:.0f} ms"]
+        if not stacks:
+            lines.append("  no Python code was running on the GUI thread")
+        for stack, count in stacks.most_common():
+            lines.append(f"  seen in {count} of {sum(stacks.values())} samples:")
+            lines.extend('    ' + line for line in stack.rstrip().splitlines())
+        try:
+            if os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + '.1')
+        except OSError:
+            pass
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n\n')
+        except OSError as e:
+            print(f"Could not write the stall log: {e}")
+
+
+class StallWatchdog(QtCore.QObject):
+    # A heartbeat timer on the GUI thread measures how late the event loop
+    # runs it; a sampler thread notices when it is overdue by the threshold
+    # and captures the GUI thread's Python stack while the stall lasts, so
+    # the log shows what was blocking rather than what ran afterwards. Only
+    # exists when enabled, so switched off it costs nothing.
+    stalled = QtCore.pyqtSignal(float)
+
+    def __init__(self, log_path, threshold_ms=STALL_THRESHOLD_MS, interval_ms=HEARTBEAT_MS, parent=None):
+        super().__init__(parent)
+        self.log = StallLog(log_path)
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.lags = deque(maxlen=LAG_SAMPLES)
+        self.stalls = 0
+        self.longest = 0.0
+        self.timer = QtCore.QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.beat)
+        self._gui_thread = threading.get_ident()
+        self._last_beat = None
+        self._lock = threading.Lock()
+        # Stacks captured since the last heartbeat, by text
+        self._stacks = Counter()
+        self._running = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._running.is_set():
+            return
+        self._gui_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._running.set()
+        self.timer.start()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        self.timer.stop()
+
+    def beat(self):
+        now = time.monotonic()
+        lag = max(0.0, now - self._last_beat - self.interval)
+        self._last_beat = now
+        with self._lock:
+            stacks, self._stacks = self._stacks, Counter()
+        self.lags.append(lag)
+        if lag >= self.threshold:
+            self.stalls += 1
+            self.longest = max(self.longest, lag)
+            self.log.write(lag * 1000, stacks)
+            self.stalled.emit(lag * 1000)
+
+    def _sample(self):
+        # Polls at a fraction of the threshold; each stack costs a walk of
+        # the GUI thread's frames, taken only while it is overdue
+        poll = max(self.threshold / 4, 0.005)
+        while self._running.is_set():
+            time.sleep(poll)
+            last_beat = self._last_beat
+            if time.monotonic() - last_beat - self.interval < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._gui_thread)
+            if frame is None:
+                continue
+            stack = ''.join(traceback.format_stack(frame))
+            del frame
+            with self._lock:
+                # A heartbeat in the meantime means this stall is over
+                if last_beat == self._last_beat and sum(self._stacks.values()) < MAX_STACKS:
+                    self._stacks[stack] += 1
+
+    def summary(self):
+        lags = list(self.lags)
+        if not lags:
+            return "no heartbeats yet"
+        return (f"event loop lag p50 {percentile(lags, 0.5) * 1000:.1f} ms, "
+                f"p95 {percentile(lags, 0.95) * 1000:.1f} ms, p99 {percentile(lags, 0.99) * 1000:.1f} ms; "
+                f"{self.stalls} stalls over {self.threshold * 1000:.0f} ms, longest {self.longest * 1000:.0f} ms")
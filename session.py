@@ -0,0 +1,50 @@
+import json
+import os
+
+SESSION_FORMAT = 1
+
+
+class SessionStore:
+    # The current session is rewritten on every change; a second copy is taken
+    # periodically so a crash mid-write still leaves a usable snapshot behind
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'session.json')
+        self.snapshot_path = os.path.join(directory, 'session.snapshot.json')
+
+    def load(self):
+        for path in (self.path, self.snapshot_path):
+            session = self._read(path)
+            if session is not None:
+                return session
+        return None
+
+    def save(self, session):
+        self._write(self.path, session)
+
+    def snapshot(self, session):
+        self._write(self.path, session)
+        self._write(self.snapshot_path, session)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(session, dict) or session.get('format') != SESSION_FORMAT or not session.get('tabs'):
+            return None
+        return session
+
+    def _write(self, path, session):
+        os.makedirs(self.directory, exist_ok=True)
+        data = json.dumps(dict(session, format=SESSION_FORMAT)).encode('utf-8')
+        # Write-then-rename, flushed to disk first so the rename never exposes
+        # an empty file after a power loss
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
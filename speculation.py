@@ -0,0 +1,143 @@
+import html
+import time
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import QUrl
+from PyQt5.QtWebEngineWidgets import QWebEnginePage
+
+from history import strip_url
+
+# Confidence needed before doing anything: the predicted site's share of the
+# frecency of every site matching the typed prefix, its visit count and how
+# much of the host has been typed
+PRECONNECT_SHARE = 0.5
+PRECONNECT_VISITS = 2
+PRECONNECT_CHARS = 2
+PRERENDER_SHARE = 0.8
+PRERENDER_VISITS = 5
+PRERENDER_CHARS = 3
+
+# An origin is not warmed again within this many seconds
+PRECONNECT_TTL = 60
+
+
+def same_destination(typed_url, predicted_url):
+    return strip_url(typed_url).rstrip('/') == strip_url(predicted_url).rstrip('/')
+
+
+class SpeculativeLoader(QtCore.QObject):
+    # Warms connections to, and prerenders, the site the URL bar predicts.
+    # One hidden page holds <link rel=preconnect> hints so Chromium resolves
+    # and connects in the shared profile's socket pool; at most one hidden
+    # page prerenders, and it is handed to the current tab on Enter.
+    def __init__(self, profile, page_factory, memory_usage, memory_cap_mb=256, parent=None):
+        super().__init__(parent)
+        self.profile = profile
+        self.page_factory = page_factory
+        self.memory_usage = memory_usage
+        self.memory_cap = memory_cap_mb * 1024 * 1024
+        self._preconnect_page = None
+        self._preconnected = {}
+        self._page = None
+        self._url = None
+        self._started_at = 0.0
+        self._loaded_at = None
+
+        self.predictions = 0
+        self.preconnects = 0
+        self.prerenders = 0
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.prerenders if self.prerenders else 0.0
+
+    def summary(self):
+        return (f"{self.preconnects} preconnects, {self.hits} of {self.prerenders} prerenders used "
+                f"({self.hit_rate:.0%}), {self.time_saved:.1f} s saved")
+
+    def check(self, text):
+        # Called on every keystroke: a prerender the text no longer leads to
+        # is dropped straight away rather than when the lookup catches up
+        if self._page is not None and not strip_url(self._url).startswith(strip_url(text.strip())):
+            self.cancel()
+
+    def update(self, text, prediction):
+        self.check(text)
+        if prediction is None:
+            return
+        self.predictions += 1
+        typed = len(strip_url(text.strip()))
+        if (prediction.share >= PRECONNECT_SHARE and prediction.visits >= PRECONNECT_VISITS
+                and typed >= PRECONNECT_CHARS):
+            self.preconnect(prediction.origin)
+        if (prediction.share >= PRERENDER_SHARE and prediction.visits >= PRERENDER_VISITS
+                and typed >= PRERENDER_CHARS):
+            self.prerender(prediction.url)
+
+    def preconnect(self, origin):
+        now = time.monotonic()
+        if now - self._preconnected.get(origin, -PRECONNECT_TTL) < PRECONNECT_TTL:
+            return
+        self._preconnected = {o: at for o, at in self._preconnected.items() if now - at < PRECONNECT_TTL}
+        self._preconnected[origin] = now
+        if self._preconnect_page is None:
+            self._preconnect_page = QWebEnginePage(self.profile, self)
+        links = ''.join(f'<link rel="dns-prefetch" href="{html.escape(o)}"><link rel="preconnect" href="{html.escape(o)}">'
+                        for o in self._preconnected)
+        self._preconnect_page.setHtml(f'<!doctype html><html><head>{links}</head></html>', QUrl('about:blank'))
+        self.preconnects += 1
+
+    def prerender(self, url):
+        if self._page is not None:
+            if self._url == url:
+                return
+            self.cancel()
+        page = self.page_factory()
+        page.setAudioMuted(True)
+        page.loadFinished.connect(self._on_loaded)
+        self._page = page
+        self._url = url
+        self._started_at = time.monotonic()
+        self._loaded_at = None
+        self.prerenders += 1
+        page.load(QUrl(url))
+
+    def _on_loaded(self, ok):
+        if self._page is None:
+            return
+        if not ok:
+            self.cancel()
+            return
+        self._loaded_at = time.monotonic()
+        if self.memory_usage({self._page.renderProcessPid()}) > self.memory_cap:
+            print(f"Dropping prerender of {self._url}: over the {self.memory_cap // (1024 * 1024)} MB cap")
+            self.cancel()
+
+    def take(self, url):
+        # The prerendered page if url is where it leads, else None; any
+        # other prerender is cancelled since it was not used
+        if self._page is None:
+            return None
+        if not same_destination(url, self._url):
+            self.cancel()
+            return None
+        page = self._page
+        page.loadFinished.disconnect(self._on_loaded)
+        page.setAudioMuted(False)
+        self.hits += 1
+        self.time_saved += (self._loaded_at or time.monotonic()) - self._started_at
+        self._page = None
+        self._url = None
+        return page
+
+    def cancel(self):
+        if self._page is None:
+            return
+        self.misses += 1
+        self._page.loadFinished.disconnect(self._on_loaded)
+        self._page.deleteLater()
+        self._page = None
+        self._url = None
@@ -0,0 +1,218 @@
+import bisect
+import heapq
+import re
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Entry kinds, ranked so actions beat tabs beat history on equal match quality
+ACTION = 'action'
+TAB = 'tab'
+RECENT = 'recent'
+SEARCH = 'search'
+
+_KIND_BOOST = {ACTION: 3.0, TAB: 2.0, RECENT: 0.0, SEARCH: 0.0}
+_KIND_LABELS = {ACTION: 'Action', TAB: 'Tab', RECENT: 'Recent', SEARCH: 'Search'}
+
+# Match quality of a query term against an entry token
+_EXACT = 3.0
+_PREFIX = 2.0
+_SUBSEQUENCE = 1.0
+
+
+class PaletteEntry:
+    __slots__ = ('kind', 'title', 'detail', 'callback', 'score', 'tokens')
+
+    def __init__(self, kind, title, detail='', callback=None, boost=0.0):
+        self.kind = kind
+        self.title = title
+        self.detail = detail
+        self.callback = callback
+        # Static part of the ranking and the token set are computed once, so a
+        # keystroke never lowercases or splits entry text
+        self.score = boost + _KIND_BOOST.get(kind, 0.0) - (len(title) + len(detail)) * 0.01
+        self.tokens = frozenset(_TOKEN_RE.findall(f"{title} {detail}".lower()))
+
+
+class _TokenIndex:
+    # Inverted index over the tokens of one group of entries
+    def __init__(self, entries, limit, cache_size):
+        self.limit = limit
+        self.cache_size = cache_size
+        self.entries = []
+        self.postings = {}
+        # Removed entries leave an empty slot so other entry ids never move
+        self.removed = 0
+        self._ids = {}
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._term_cache = {}
+        # (leading terms, their intersected matches) of the previous query; while
+        # only the last word is being typed, the earlier words are not redone
+        self._leading = ((), None)
+        for entry in entries:
+            self.add(entry)
+        # Sort now rather than on the first keystroke
+        self._vocabulary = sorted(self.postings)
+        self._vocabulary_dirty = False
+
+    def add(self, entry):
+        entry_id = len(self.entries)
+        self.entries.append(entry)
+        self._ids[entry] = entry_id
+        postings = self.postings
+        for token in entry.tokens:
+            if token in postings:
+                postings[token].append(entry_id)
+            else:
+                postings[token] = [entry_id]
+        self._vocabulary_dirty = True
+        self._term_cache = {}
+        self._leading = ((), None)
+
+    def remove(self, entry):
+        # Only the postings of the entry's own tokens are touched; ids grow
+        # with age, so the oldest entry is found at the front of each list
+        entry_id = self._ids.pop(entry)
+        self.entries[entry_id] = None
+        postings = self.postings
+        for token in entry.tokens:
+            postings[token].remove(entry_id)
+        self.removed += 1
+        self._term_cache = {}
+        self._leading = ((), None)
+
+    def _term_matches(self, term):
+        # entry id -> best quality of term against any of the entry's tokens
+        matches = self._term_cache.get(term)
+        if matches is not None:
+            return matches
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self.postings)
+            self._vocabulary_dirty = False
+        vocabulary = self._vocabulary
+        postings = self.postings
+        matches = {}
+        lo = bisect.bisect_left(vocabulary, term)
+        hi = bisect.bisect_left(vocabulary, term + '\uffff')
+        for token in vocabulary[lo:hi]:
+            quality = _EXACT if token == term else _PREFIX
+            for entry_id in postings[token]:
+                if matches.get(entry_id, 0.0) < quality:
+                    matches[entry_id] = quality
+
+        # Subsequence matches ("gthb" -> "github") among tokens sharing the first
+        # character, only once the term is long enough to be meaningful
+        if len(term) >= 3 and len(matches) < self.limit:
+            subsequence = re.compile('.*?'.join(map(re.escape, term)))
+            lo = bisect.bisect_left(vocabulary, term[0])
+            hi = bisect.bisect_left(vocabulary, term[0] + '\uffff')
+            for token in vocabulary[lo:hi]:
+                match = subsequence.match(token)
+                if match is None:
+                    continue
+                quality = _SUBSEQUENCE - (match.end() - len(term)) * 0.05
+                for entry_id in postings[token]:
+                    if matches.get(entry_id, -1.0) < quality:
+                        matches[entry_id] = quality
+
+        if len(self._term_cache) >= self.cache_size:
+            self._term_cache.pop(next(iter(self._term_cache)))
+        self._term_cache[term] = matches
+        return matches
+
+    @staticmethod
+    def _intersect(left, right):
+        if len(left) > len(right):
+            left, right = right, left
+        return {entry_id: quality + right[entry_id] for entry_id, quality in left.items() if entry_id in right}
+
+    def search(self, terms):
+        # Returns the best (score, entry) pairs for the given query terms
+        leading_terms, leading = self._leading
+        if tuple(terms[:-1]) != leading_terms:
+            leading = None
+            for term in terms[:-1]:
+                matches = self._term_matches(term)
+                leading = matches if leading is None else self._intersect(leading, matches)
+            self._leading = (tuple(terms[:-1]), leading)
+
+        matches = self._term_matches(terms[-1])
+        if leading is not None:
+            matches = self._intersect(leading, matches)
+        entries = self.entries
+        top = heapq.nlargest(self.limit, matches.items(), key=lambda item: item[1] + entries[item[0]].score)
+        return [(quality + entries[entry_id].score, entry_id, entries[entry_id]) for entry_id, quality in top]
+
+
+class FuzzyIndex:
+    # Entries are kept in named groups (actions, tabs, recent pages) so one
+    # group can be rebuilt without re-indexing the others
+    def __init__(self, limit=50, cache_size=64):
+        self.limit = limit
+        self.cache_size = cache_size
+        self._groups = {}
+
+    def __len__(self):
+        return sum(len(group.entries) - group.removed for group in self._groups.values())
+
+    def build(self, entries):
+        # A group can be built off the GUI thread and put in place with set_group
+        return _TokenIndex(entries, self.limit, self.cache_size)
+
+    def set_group(self, group, index):
+        self._groups[group] = index
+
+    def replace(self, group, entries):
+        self.set_group(group, self.build(entries))
+
+    def remove(self, group, entry):
+        index = self._groups[group]
+        index.remove(entry)
+        # Empty slots are reclaimed in one rebuild once they are half the group
+        if index.removed * 2 > len(index.entries):
+            self.replace(group, [entry for entry in index.entries if entry is not None])
+
+    def add(self, group, entry):
+        if group not in self._groups:
+            self._groups[group] = _TokenIndex((), self.limit, self.cache_size)
+        self._groups[group].add(entry)
+
+    def search(self, query):
+        terms = _TOKEN_RE.findall(query.lower())
+        if not terms:
+            return []
+        results = []
+        for group in self._groups.values():
+            results.extend(group.search(terms))
+        return [entry for _, _, entry in heapq.nlargest(self.limit, results, key=lambda result: result[0])]
+
+
+class PaletteModel(QtCore.QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._entries = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._entries[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{entry.title}  —  {entry.detail}" if entry.detail else entry.title
+        if role == Qt.ToolTipRole:
+            return _KIND_LABELS.get(entry.kind, entry.kind)
+        return None
+
+    def entry(self, row):
+        return self._entries[row] if 0 <= row < len(self._entries) else None
+
+    def set_entries(self, entries):
+        # Only the visible top-N rows are handed to the view, never the index
+        self.beginResetModel()
+        self._entries = entries
+        self.endResetModel()
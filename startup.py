@@ -0,0 +1,26 @@
+import time
+
+
+class StartupTimeline:
+    # Marks taken between process start and the first painted frame; each
+    # report line shows the time since start and since the previous mark
+    def __init__(self, started_at=None):
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.marks = []
+
+    def mark(self, phase):
+        self.marks.append((phase, time.perf_counter()))
+
+    def elapsed(self, phase):
+        for name, at in self.marks:
+            if name == phase:
+                return (at - self.started_at) * 1000
+        return None
+
+    def report(self):
+        lines = ["Startup timeline:"]
+        previous = self.started_at
+        for phase, at in self.marks:
+            lines.append(f"  {(at - self.started_at) * 1000:8.1f} ms  +{(at - previous) * 1000:7.1f} ms  {phase}")
+            previous = at
+        return "\n".join(lines)
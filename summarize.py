@@ -0,0 +1,293 @@
+import abc
+import hashlib
+import json
+import os
+import threading
+import urllib.request
+
+from PyQt5 import QtCore
+
+# Pages are sent in chunks of at most this many tokens, leaving room in the
+# model's context for the prompt and the answer
+CHUNK_TOKENS = 6000
+# Chunk summaries that are still too long are summarized again, at most this
+# many times, before the rest is dropped
+MAX_ROUNDS = 3
+# Bump when the prompts change so cached summaries are not reused
+PROMPT_VERSION = 1
+
+CHUNK_PROMPT = ("Summarize part {index} of {count} of the web page titled {title!r} in a few sentences. "
+                "Keep names, numbers and conclusions.\n\n{text}")
+FINAL_PROMPT = ("Summarize the web page titled {title!r} in one short paragraph followed by at most five "
+                "bullet points.\n\n{text}")
+
+
+class SummaryError(Exception):
+    # The message is what the summary panel shows
+    pass
+
+
+class SummaryCancelled(Exception):
+    pass
+
+
+class SummaryBackend(abc.ABC):
+    name = None
+    model = None
+
+    @property
+    def identity(self):
+        # Summaries from different models are cached separately
+        return f"{self.name}:{self.model}"
+
+    def count_tokens(self, text):
+        # A rough estimate is enough to stay under the budget; asking the
+        # service would cost a round trip per chunk
+        return len(text) // 4 + 1
+
+    @abc.abstractmethod
+    def stream(self, prompt):
+        # Yields the answer in pieces as the model produces them
+        pass
+
+
+class GeminiBackend(SummaryBackend):
+    name = 'gemini'
+
+    def __init__(self, model='gemini-1.5-flash', api_key=None):
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise SummaryError("Summaries with Gemini need the google-generativeai package.")
+        api_key = api_key or os.environ.get('GOOGLE_API_KEY') or os.environ.get('GEMINI_API_KEY')
+        if not api_key:
+            raise SummaryError("Set GOOGLE_API_KEY to summarize pages with Gemini.")
+        genai.configure(api_key=api_key)
+        self.model = model
+        self._model = genai.GenerativeModel(model)
+
+    def stream(self, prompt):
+        try:
+            for chunk in self._model.generate_content(prompt, stream=True):
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise SummaryError(f"Gemini could not summarize this page: {e}")
+
+
+class OllamaBackend(SummaryBackend):
+    # Any server speaking Ollama's /api/generate streaming protocol, which
+    # includes a local model or a stub serving canned answers
+    name = 'ollama'
+
+    def __init__(self, model='llama3.2', url='http://127.0.0.1:11434', timeout=120):
+        self.model = model
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def stream(self, prompt):
+        body = json.dumps({'model': self.model, 'prompt': prompt, 'stream': True}).encode('utf-8')
+        request = urllib.request.Request(f'{self.url}/api/generate', body, {'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                # One JSON object per line, each carrying the next piece
+                for line in response:
+                    if not line.strip():
+                        continue
+                    message = json.loads(line)
+                    if message.get('error'):
+                        raise SummaryError(f"The summarizer failed: {message['error']}")
+                    if message.get('response'):
+                        yield message['response']
+                    if message.get('done'):
+                        return
+        except (OSError, ValueError) as e:
+            raise SummaryError(f"Could not get a summary from {self.url}: {e}")
+
+
+BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    OllamaBackend.name: OllamaBackend,
+}
+
+
+def create_backend(name, **options):
+    if name not in BACKENDS:
+        raise SummaryError(f"Unknown summarizer {name}.")
+    return BACKENDS[name](**options)
+
+
+def chunk_text(text, budget, count_tokens):
+    # Packs whole paragraphs into chunks under the budget; a paragraph that
+    # is too long on its own is cut on word boundaries
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in (p.strip() for p in text.split('\n')):
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens > budget:
+            words = paragraph.split()
+            step = max(1, len(words) * budget // tokens)
+            pieces = [' '.join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            pieces = [paragraph]
+        for piece in pieces:
+            tokens = count_tokens(piece)
+            if current and size + tokens > budget:
+                chunks.append('\n'.join(current))
+                current = []
+                size = 0
+            current.append(piece)
+            size += tokens
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+def _stream(backend, prompt, cancelled):
+    pieces = backend.stream(prompt)
+    try:
+        for piece in pieces:
+            if cancelled():
+                raise SummaryCancelled()
+            yield piece
+    finally:
+        # Closes the response so a cancelled request stops downloading
+        close = getattr(pieces, 'close', None)
+        if close is not None:
+            close()
+
+
+def summarize(backend, title, text, budget=CHUNK_TOKENS, on_token=None, on_progress=None, cancelled=None):
+    # Map-reduce over chunks: long pages are summarized part by part, then
+    # the part summaries are summarized; only that last answer is streamed
+    cancelled = cancelled or (lambda: False)
+    chunks = chunk_text(text, budget, backend.count_tokens)
+    if not chunks:
+        raise SummaryError("There is no text on this page to summarize.")
+    rounds = 0
+    while len(chunks) > 1 and rounds < MAX_ROUNDS:
+        rounds += 1
+        notes = []
+        for index, chunk in enumerate(chunks, 1):
+            if on_progress is not None:
+                on_progress(f"Reading part {index} of {len(chunks)}...")
+            prompt = CHUNK_PROMPT.format(index=index, count=len(chunks), title=title, text=chunk)
+            notes.append(''.join(_stream(backend, prompt, cancelled)))
+        chunks = chunk_text('\n'.join(notes), budget, backend.count_tokens)
+    if on_progress is not None:
+        on_progress("Summarizing...")
+    pieces = []
+    for piece in _stream(backend, FINAL_PROMPT.format(title=title, text=chunks[0]), cancelled):
+        pieces.append(piece)
+        if on_token is not None:
+            on_token(piece)
+    return ''.join(pieces)
+
+
+def summary_key(backend, title, text):
+    digest = hashlib.sha256()
+    for part in (str(PROMPT_VERSION), backend.identity, title, text):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    # One file per summary, named by the hash of what was summarized; the
+    # least recently read ones are dropped beyond max_entries
+    def __init__(self, directory, max_entries=500):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.txt')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                summary = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return summary
+
+    def put(self, key, summary):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(summary)
+        os.replace(tmp_path, path)
+        self.prune()
+
+    def prune(self):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.txt')]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class SummaryJob(QtCore.QObject):
+    # One page summary on a worker thread; pieces of the answer come back to
+    # the GUI thread through queued signals as the model produces them
+    progress = QtCore.pyqtSignal(str)
+    token = QtCore.pyqtSignal(str)
+    completed = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, backend, cache, title, text, budget=CHUNK_TOKENS, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.cache = cache
+        self.title = title
+        self.text = text
+        self.budget = budget
+        self.key = summary_key(backend, title, text)
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self):
+        try:
+            summary = summarize(self.backend, self.title, self.text, self.budget,
+                                on_token=self.token.emit, on_progress=self.progress.emit,
+                                cancelled=self._cancelled.is_set)
+            if self.cancelled:
+                return
+            try:
+                self.cache.put(self.key, summary)
+            except OSError as e:
+                print(f"Could not cache summary: {e}")
+            self.completed.emit(summary)
+        except SummaryCancelled:
+            pass
+        except SummaryError as e:
+            self.failed.emit(str(e))
+        except Exception as e:
+            print(f"An error occurred while summarizing: {e}")
+            self.failed.emit("An error occurred while summarizing this page.")
+        finally:
+            self.finished.emit()
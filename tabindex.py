@@ -0,0 +1,254 @@
+import bisect
+import heapq
+import math
+import re
+import sys
+import threading
+from array import array
+from collections import Counter, OrderedDict, namedtuple
+
+from PyQt5 import QtCore
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+# Text past this many characters of a page is not indexed
+MAX_DOCUMENT_CHARS = 200000
+# Estimated index size above which the least recently updated tabs are
+# dropped; 200 tabs of ordinary pages fit well within it
+MAX_INDEX_BYTES = 64 * 1024 * 1024
+# Rough cost of one posting (its packed entry and the tab's reference to the
+# term) and of a term no other tab has, used for the size estimate
+POSTING_BYTES = 16
+TERM_BYTES = 160
+SNIPPET_CHARS = 80
+
+# A posting is one unsigned 32-bit int: the tab's slot in the high bits and
+# how often the term occurs, capped, in the low ones
+_COUNT_BITS = 12
+_COUNT_MASK = (1 << _COUNT_BITS) - 1
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+TextHit = namedtuple('TextHit', 'tab_id url title score snippet needle')
+
+
+def tokenize(text):
+    return _WORD_RE.findall(text.lower())
+
+
+class _Document:
+    __slots__ = ('tab_id', 'slot', 'url', 'title', 'text', 'terms', 'length', 'size')
+
+    def __init__(self, tab_id, slot, url, title, text):
+        self.tab_id = tab_id
+        self.slot = slot
+        self.url = url
+        self.title = title
+        self.text = text
+        self.terms = ()
+        self.length = 0
+        self.size = 0
+
+
+class TextIndex:
+    # Inverted index of the text of open tabs, one document per tab. A tab is
+    # re-indexed by dropping its old postings and adding the new ones, so an
+    # update costs the size of that page, not of the whole index. Postings
+    # are packed into arrays and terms interned, which keeps 200 tabs of
+    # long pages in a few tens of megabytes. Not thread safe; TabIndexer
+    # gives it a thread of its own.
+    def __init__(self, max_bytes=MAX_INDEX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        # tab id -> _Document, least recently updated first
+        self.documents = OrderedDict()
+        # term -> array of postings
+        self.postings = {}
+        # slot -> _Document, with the slots of removed tabs reused
+        self._slots = []
+        self._free_slots = []
+        self._total_length = 0
+        self._vocabulary = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def update(self, tab_id, url, title, text):
+        text = text[:MAX_DOCUMENT_CHARS]
+        previous = self.documents.get(tab_id)
+        if previous is not None and previous.url == url and previous.title == title and previous.text == text:
+            self.documents.move_to_end(tab_id)
+            return False
+        self.remove(tab_id)
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._slots)
+            self._slots.append(None)
+        document = _Document(tab_id, slot, url, title, text)
+        # Title words count as part of the page so a tab can be found by name
+        counts = Counter(tokenize(text))
+        counts.update(tokenize(title))
+        terms = []
+        new_terms = 0
+        for term, count in counts.items():
+            # Every tab refers to the one interned copy of a term
+            term = sys.intern(term)
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = array('I')
+                new_terms += 1
+            postings.append(slot << _COUNT_BITS | min(count, _COUNT_MASK))
+            terms.append(term)
+        if new_terms:
+            self._vocabulary = None
+        document.terms = tuple(terms)
+        document.length = sum(counts.values())
+        document.size = len(text) + len(terms) * POSTING_BYTES + new_terms * TERM_BYTES
+        self.documents[tab_id] = document
+        self._slots[slot] = document
+        self.size += document.size
+        self._total_length += document.length
+        while self.size > self.max_bytes and len(self.documents) > 1:
+            self.remove(next(iter(self.documents)))
+        return True
+
+    def remove(self, tab_id):
+        document = self.documents.pop(tab_id, None)
+        if document is None:
+            return
+        slot = document.slot
+        for term in document.terms:
+            postings = self.postings[term]
+            if len(postings) == 1:
+                del self.postings[term]
+                self._vocabulary = None
+            else:
+                self.postings[term] = array('I', [posting for posting in postings
+                                                  if posting >> _COUNT_BITS != slot])
+        self._slots[slot] = None
+        self._free_slots.append(slot)
+        self.size -= document.size
+        self._total_length -= document.length
+
+    def _expand(self, term):
+        # The last word of a query is still being typed, so it matches
+        # every term it is a prefix of
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, term)
+        end = bisect.bisect_left(vocabulary, term + '\uffff')
+        return vocabulary[start:end]
+
+    def search(self, query, limit=20):
+        terms = tokenize(query)
+        if not terms or not self.documents:
+            return []
+        groups = [[term] for term in terms[:-1]] + [self._expand(terms[-1])]
+        count = len(self.documents)
+        average = self._total_length / count
+        documents = self._slots
+        scores = None
+        for group in groups:
+            group_scores = {}
+            for term in group:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for posting in postings:
+                    slot = posting >> _COUNT_BITS
+                    tf = posting & _COUNT_MASK
+                    length = documents[slot].length
+                    score = idf * tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * length / average))
+                    if score > group_scores.get(slot, 0.0):
+                        group_scores[slot] = score
+            # Every word of the query has to be on the page
+            if scores is None:
+                scores = group_scores
+            else:
+                scores = {slot: score + group_scores[slot] for slot, score in scores.items() if slot in group_scores}
+            if not scores:
+                return []
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [self._hit(documents[slot], score, query, terms) for slot, score in best]
+
+    def _hit(self, document, score, query, terms):
+        # The snippet is centred on the whole query if the page has it as a
+        # phrase, otherwise on the first of its words found in the text
+        text = document.text
+        lowered = text.lower()
+        needle = query.strip()
+        position = lowered.find(needle.lower())
+        if position < 0:
+            needle = ''
+            for term in terms:
+                match = re.search(r'\b' + re.escape(term) + r'[^\W_]*', lowered)
+                if match is not None:
+                    position = match.start()
+                    needle = text[position:match.end()]
+                    break
+        if position < 0:
+            return TextHit(document.tab_id, document.url, document.title, score, '', '')
+        start = max(0, position - SNIPPET_CHARS // 2)
+        end = start + SNIPPET_CHARS + len(needle)
+        snippet = ' '.join(text[start:end].split())
+        if start > 0:
+            snippet = '...' + snippet
+        if end < len(text):
+            snippet += '...'
+        return TextHit(document.tab_id, document.url, document.title, score, snippet, needle)
+
+
+class TabIndexer(QtCore.QObject):
+    # Owns a TextIndex on a worker thread. Updates for the same tab are
+    # coalesced so only the newest text of a busy tab is indexed, and only
+    # the newest query is answered; results come back as a queued signal.
+    results_ready = QtCore.pyqtSignal(str, list)
+
+    def __init__(self, max_bytes=MAX_INDEX_BYTES, parent=None):
+        super().__init__(parent)
+        self.index = TextIndex(max_bytes)
+        self._updates = OrderedDict()
+        self._query = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def update(self, tab_id, url, title, text):
+        with self._lock:
+            self._updates.pop(tab_id, None)
+            self._updates[tab_id] = (url, title, text)
+        self._wakeup.set()
+
+    def remove(self, tab_id):
+        with self._lock:
+            self._updates.pop(tab_id, None)
+            self._updates[tab_id] = None
+        self._wakeup.set()
+
+    def search(self, query):
+        with self._lock:
+            self._query = query
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                updates, self._updates = self._updates, OrderedDict()
+                query, self._query = self._query, None
+                self._wakeup.clear()
+            try:
+                for tab_id, update in updates.items():
+                    if update is None:
+                        self.index.remove(tab_id)
+                    else:
+                        self.index.update(tab_id, *update)
+                if query is not None:
+                    self.results_ready.emit(query, self.index.search(query))
+            except Exception as e:
+                print(f"Tab index failed: {e}")
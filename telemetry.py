@@ -0,0 +1,138 @@
+import json
+import time
+
+# Decision times are counted in power-of-two nanosecond buckets: bucket i
+# holds decisions that took less than 2**i ns (and at least 2**(i-1))
+HISTOGRAM_BUCKETS = 64
+
+# Fields of a counter key, in order
+SITE, HOST, TYPE, BLOCKED, TAB_ID = range(5)
+
+# Site and host of counters folded together to keep the table bounded
+OTHER = '(other)'
+
+
+class RequestTelemetry:
+    # Written by the pages' request interceptors, which Qt runs on the GUI
+    # thread, and read by the panels on that same thread, so it needs no
+    # lock. Every request still passes through record() before it starts,
+    # so that is kept to one dict update, one histogram bump and one ring
+    # slot store; the per-tab, per-site, per-host and per-type tables are
+    # folded out of the counters only when someone looks at them.
+    def __init__(self, capacity=4096, max_counters=50000):
+        self.capacity = capacity
+        self.max_counters = max_counters
+        self.started_at = time.time()
+        self.counts = {}
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+        # Tab id -> title, for the tabs still open
+        self.tab_titles = {}
+        self._ring = [None] * capacity
+        self._next = 0
+
+    def record(self, tab, site, host, resource_type, blocked, elapsed_ns):
+        key = (site, host, resource_type, blocked, tab)
+        counts = self.counts
+        counts[key] = counts.get(key, 0) + 1
+        if len(counts) > self.max_counters:
+            self._fold()
+        self.histogram[elapsed_ns.bit_length()] += 1
+        index = self._next
+        self._ring[index] = (time.time(), key, elapsed_ns)
+        self._next = index + 1 if index + 1 < self.capacity else 0
+
+    def close_tab(self, tab):
+        # A closed tab's counters are kept, under no tab
+        self.tab_titles.pop(tab, None)
+        self._merge([key for key in self.counts if key[TAB_ID] == tab], lambda key: key[:TAB_ID] + (None,))
+
+    def _fold(self):
+        # The least used half of the counters are merged into one per type
+        # and outcome, so totals and the per-type table stay exact
+        keys = sorted(self.counts, key=self.counts.get)[:len(self.counts) // 2]
+        self._merge(keys, lambda key: (OTHER, OTHER, key[TYPE], key[BLOCKED], None))
+
+    def _merge(self, keys, fold):
+        counts = self.counts
+        for key in keys:
+            count = counts.pop(key)
+            folded = fold(key)
+            counts[folded] = counts.get(folded, 0) + count
+
+    def recent(self):
+        # Oldest first
+        index = self._next
+        return [entry for entry in self._ring[index:] + self._ring[:index] if entry is not None]
+
+    def totals(self):
+        # (requests, blocked)
+        total = blocked = 0
+        for key, count in list(self.counts.items()):
+            total += count
+            if key[BLOCKED]:
+                blocked += count
+        return total, blocked
+
+    def table(self, field):
+        # name -> [allowed, blocked] for one key field
+        table = {}
+        for key, count in list(self.counts.items()):
+            row = table.get(key[field])
+            if row is None:
+                row = table[key[field]] = [0, 0]
+            row[1 if key[BLOCKED] else 0] += count
+        return table
+
+    def tab_title(self, tab):
+        if tab is None:
+            return '(closed or no tab)'
+        return self.tab_titles.get(tab) or f'Tab {tab}'
+
+    def top(self, field, limit=20):
+        # Rows of (name, allowed, blocked), busiest first; tabs by title
+        rows = [(name, allowed, blocked) for name, (allowed, blocked) in self.table(field).items()]
+        rows.sort(key=lambda row: row[1] + row[2], reverse=True)
+        rows = rows[:limit]
+        if field == TAB_ID:
+            rows = [(self.tab_title(tab), allowed, blocked) for tab, allowed, blocked in rows]
+        return rows
+
+    def blocked_by_type(self):
+        return {name: blocked for name, (_, blocked) in self.table(TYPE).items() if blocked}
+
+    def decision_percentile(self, pct):
+        # Upper bound in nanoseconds of the bucket holding the percentile
+        histogram = list(self.histogram)
+        target = sum(histogram) * pct / 100
+        seen = 0
+        for bucket, count in enumerate(histogram):
+            seen += count
+            if count and seen >= target:
+                return 2 ** bucket
+        return 0
+
+    def snapshot(self):
+        def table(field):
+            return {name: {'allowed': allowed, 'blocked': blocked}
+                    for name, (allowed, blocked) in self.table(field).items()}
+        total, blocked = self.totals()
+        return {
+            'started_at': self.started_at,
+            'exported_at': time.time(),
+            'total': total,
+            'blocked': blocked,
+            'by_tab': {str(tab): {'title': self.tab_title(tab), 'allowed': allowed, 'blocked': blocked}
+                       for tab, (allowed, blocked) in self.table(TAB_ID).items()},
+            'by_site': table(SITE),
+            'by_host': table(HOST),
+            'by_type': table(TYPE),
+            'decision_ns_histogram': {f'<{2 ** bucket}': count
+                                      for bucket, count in enumerate(list(self.histogram)) if count},
+            'recent': [{'time': at, 'tab': key[TAB_ID], 'site': key[SITE], 'host': key[HOST], 'type': key[TYPE],
+                        'blocked': key[BLOCKED], 'decision_ns': elapsed_ns}
+                       for at, key, elapsed_ns in self.recent()],
+        }
+
+    def export_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
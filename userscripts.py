@@ -0,0 +1,127 @@
+import re
+from urllib.parse import urlsplit
+
+from PyQt5.QtWebEngineWidgets import QWebEngineScript
+
+from adblock import domain_variants
+
+DOCUMENT_CREATION = QWebEngineScript.DocumentCreation
+DOCUMENT_READY = QWebEngineScript.DocumentReady
+DEFERRED = QWebEngineScript.Deferred
+
+MAIN_WORLD = QWebEngineScript.MainWorld
+APPLICATION_WORLD = QWebEngineScript.ApplicationWorld
+
+_MATCH_PATTERN_RE = re.compile(r'^(\*|https?|file|ftp)://(\*|\*\.[^/*]+|[^/*]*)(/.*)$')
+
+
+class MatchPattern:
+    # Chrome/Greasemonkey style match pattern, e.g. "*://*.youtube.com/watch*"
+    def __init__(self, pattern):
+        self.pattern = pattern
+        if pattern == '<all_urls>':
+            self.schemes = ('http', 'https', 'file', 'ftp')
+            self.host = '*'
+            self.path = re.compile('.*')
+            return
+        match = _MATCH_PATTERN_RE.match(pattern)
+        if not match:
+            raise ValueError(f"Invalid match pattern: {pattern}")
+        scheme, self.host, path = match.groups()
+        self.schemes = ('http', 'https') if scheme == '*' else (scheme,)
+        self.path = re.compile('.*'.join(re.escape(part) for part in path.split('*')) + '$')
+
+    def matches_path(self, scheme, path):
+        return scheme in self.schemes and self.path.match(path) is not None
+
+
+class UserScript:
+    def __init__(self, name, source, matches, injection_point=DOCUMENT_READY,
+                 world=APPLICATION_WORLD, subframes=False):
+        self.name = name
+        self.source = source
+        self.matches = [MatchPattern(pattern) for pattern in matches]
+        self.injection_point = injection_point
+        self.world = world
+        self.subframes = subframes
+
+    def to_qt_script(self):
+        # Chromium does the per-navigation URL filtering from the @match header
+        header = ['// ==UserScript==', f'// @name {self.name}']
+        header += [f'// @match {pattern.pattern}' for pattern in self.matches]
+        header.append('// ==/UserScript==')
+        script = QWebEngineScript()
+        script.setName(self.name)
+        script.setSourceCode('\n'.join(header) + '\n' + self.source)
+        script.setInjectionPoint(self.injection_point)
+        script.setWorldId(self.world)
+        script.setRunsOnSubFrames(self.subframes)
+        return script
+
+
+class UserScriptRegistry:
+    def __init__(self):
+        self.scripts = []
+        # Patterns are indexed by host so a lookup only walks the host's suffixes
+        self._exact_hosts = {}
+        self._wildcard_hosts = {}
+        self._any_host = []
+        self._profiles = set()
+
+    def register(self, script):
+        self.scripts.append(script)
+        for pattern in script.matches:
+            if pattern.host == '*':
+                self._any_host.append((pattern, script))
+            elif pattern.host.startswith('*.'):
+                self._wildcard_hosts.setdefault(pattern.host[2:], []).append((pattern, script))
+            else:
+                self._exact_hosts.setdefault(pattern.host, []).append((pattern, script))
+        for profile in self._profiles:
+            profile.scripts().insert(script.to_qt_script())
+        return script
+
+    def unregister(self, name):
+        self.scripts = [script for script in self.scripts if script.name != name]
+        for index in (self._exact_hosts, self._wildcard_hosts):
+            for key, entries in list(index.items()):
+                index[key] = [(pattern, script) for pattern, script in entries if script.name != name]
+        self._any_host = [(pattern, script) for pattern, script in self._any_host if script.name != name]
+        for profile in self._profiles:
+            collection = profile.scripts()
+            for script in collection.findScripts(name):
+                collection.remove(script)
+
+    def replace(self, script):
+        # Swapping a script only affects documents created from now on
+        self.unregister(script.name)
+        return self.register(script)
+
+    def install(self, profile):
+        # Scripts live on the profile, so every page created from it gets them
+        # without any per-tab or per-load work
+        if profile in self._profiles:
+            return
+        self._profiles.add(profile)
+        collection = profile.scripts()
+        for script in self.scripts:
+            if not collection.findScripts(script.name):
+                collection.insert(script.to_qt_script())
+
+    def matching(self, url):
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return []
+        host = (parts.hostname or '').lower()
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        candidates = list(self._exact_hosts.get(host, ()))
+        if host:
+            for variant in domain_variants(host):
+                candidates.extend(self._wildcard_hosts.get(variant, ()))
+        candidates.extend(self._any_host)
+        result = []
+        for pattern, script in candidates:
+            if script not in result and pattern.matches_path(parts.scheme, path):
+                result.append(script)
+        return result
@@ -0,0 +1,293 @@
+import abc
+import array
+import collections
+import json
+import math
+import queue
+import shutil
+import subprocess
+import threading
+
+from PyQt5 import QtCore
+
+
+def _speech_recognition():
+    # Imported on first use; it pulls in audio libraries startup never needs
+    import speech_recognition
+    return speech_recognition
+
+
+class RecognitionError(Exception):
+    # The message is what gets spoken back to the user
+    pass
+
+
+class RecognizerBackend(abc.ABC):
+    name = None
+
+    def start(self, sample_rate, sample_width):
+        pass
+
+    def feed(self, chunk):
+        # Returns the partial transcript so far, or None if the backend has none
+        return None
+
+    @abc.abstractmethod
+    def finish(self, audio):
+        # Returns the final transcript, or '' if nothing was understood
+        pass
+
+
+class GoogleBackend(RecognizerBackend):
+    name = 'google'
+
+    def __init__(self):
+        self.sr = _speech_recognition()
+        self.recognizer = self.sr.Recognizer()
+
+    def finish(self, audio):
+        sr = self.sr
+        try:
+            return self.recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            return ''
+        except sr.RequestError as e:
+            print(f"Could not request results from Google Speech Recognition service; {e}")
+            raise RecognitionError("I'm having trouble connecting to the speech recognition service.")
+
+
+class VoskBackend(RecognizerBackend):
+    # Runs fully offline and reports partial hypotheses while the user speaks
+    name = 'vosk'
+
+    def __init__(self, model_path='model'):
+        try:
+            from vosk import KaldiRecognizer, Model
+        except ImportError:
+            raise RecognitionError("Offline voice recognition needs the vosk package.")
+        self._recognizer_class = KaldiRecognizer
+        self.model = Model(model_path)
+        self._recognizer = None
+        self._segments = []
+
+    def start(self, sample_rate, sample_width):
+        if sample_width != 2:
+            raise RecognitionError("Offline voice recognition needs 16-bit audio.")
+        self._recognizer = self._recognizer_class(self.model, sample_rate)
+        self._segments = []
+
+    def feed(self, chunk):
+        if self._recognizer.AcceptWaveform(chunk):
+            text = json.loads(self._recognizer.Result()).get('text')
+            if text:
+                self._segments.append(text)
+            return ' '.join(self._segments)
+        partial = json.loads(self._recognizer.PartialResult()).get('partial')
+        return ' '.join(self._segments + ([partial] if partial else []))
+
+    def finish(self, audio):
+        text = json.loads(self._recognizer.FinalResult()).get('text')
+        return ' '.join(self._segments + ([text] if text else []))
+
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    VoskBackend.name: VoskBackend,
+}
+
+
+def create_backend(name, **options):
+    if name not in BACKENDS:
+        raise RecognitionError(f"Unknown voice recognizer {name}.")
+    return BACKENDS[name](**options)
+
+
+def chunk_energy(chunk):
+    # RMS of 16-bit little-endian samples; audioop is gone from newer Pythons
+    samples = array.array('h', chunk[:len(chunk) - len(chunk) % 2])
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def recognize_file(backend, path, chunk_size=4096):
+    # Feeds a recorded WAV/AIFF/FLAC file through a backend the same way the
+    # microphone loop does, so recognition can be checked against fixtures
+    sr = _speech_recognition()
+    with sr.AudioFile(path) as source:
+        audio = sr.Recognizer().record(source)
+    raw = audio.get_raw_data(convert_width=2)
+    backend.start(audio.sample_rate, 2)
+    for offset in range(0, len(raw), chunk_size):
+        backend.feed(raw[offset:offset + chunk_size])
+    return backend.finish(sr.AudioData(raw, audio.sample_rate, 2))
+
+
+def parse_voice_command(query):
+    # Maps a transcript to (action, argument); order matters, e.g. "search for"
+    # wins over "open" and anything unrecognised becomes a web search
+    query = query.lower()
+    if "search for" in query:
+        return 'search', query.replace("search for", "").strip()
+    if "open" in query:
+        return 'open', query.replace("open", "").strip()
+    if "play" in query:
+        return 'play', query.replace("play", "").strip()
+    if "what's the time" in query or "what is the time" in query:
+        return 'time', None
+    if "close tab" in query:
+        return 'close_tab', None
+    if "new tab" in query:
+        return 'new_tab', None
+    return 'web_search', query
+
+
+class Speaker:
+    # Speech output runs on its own thread so it never blocks the GUI; the
+    # queue keeps utterances in order instead of talking over each other
+    COMMANDS = [['say'], ['spd-say', '-w'], ['espeak-ng'], ['espeak']]
+
+    def __init__(self):
+        self.command = next((cmd for cmd in self.COMMANDS if shutil.which(cmd[0])), None)
+        self._queue = queue.Queue()
+        self._process = None
+        self._thread = None
+
+    def say(self, text, done=None):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put((text, done))
+
+    def say_and_wait(self, text):
+        done = threading.Event()
+        self.say(text, done)
+        done.wait()
+
+    def stop(self):
+        while True:
+            try:
+                _, done = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if done is not None:
+                done.set()
+        process = self._process
+        if process is not None:
+            process.terminate()
+
+    def _run(self):
+        while True:
+            text, done = self._queue.get()
+            try:
+                if self.command is None:
+                    print(text)
+                else:
+                    self._process = subprocess.Popen(self.command + [text])
+                    self._process.wait()
+            except OSError as e:
+                print(f"Could not speak: {e}")
+            finally:
+                self._process = None
+                if done is not None:
+                    done.set()
+
+
+class VoiceSession(QtCore.QObject):
+    # One capture-and-recognise round trip on a worker thread; results come
+    # back to the GUI thread through queued signals
+    listening = QtCore.pyqtSignal()
+    partial = QtCore.pyqtSignal(str)
+    recognized = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal()
+
+    PAUSE_SECONDS = 0.8
+    PREROLL_SECONDS = 0.3
+
+    def __init__(self, backend, speaker, timeout=5, phrase_time_limit=5, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.speaker = speaker
+        self.timeout = timeout
+        self.phrase_time_limit = phrase_time_limit
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+        self.speaker.stop()
+
+    def run(self):
+        try:
+            self.speaker.say_and_wait("Listening... How can I help you?")
+            if self.cancelled:
+                return
+            sr = _speech_recognition()
+            with sr.Microphone() as source:
+                self.backend.start(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+                self.listening.emit()
+                print("Listening... Speak now.")
+                audio = self.capture(source)
+            if self.cancelled:
+                return
+            if audio is None:
+                self.failed.emit("I didn't hear anything. Please try again.")
+                return
+            print("Processing speech...")
+            text = self.backend.finish(audio)
+            if self.cancelled:
+                return
+            if text:
+                self.recognized.emit(text)
+            else:
+                print("Could not understand audio. Please try again.")
+                self.failed.emit("I'm sorry, I couldn't understand that. Please try again.")
+        except RecognitionError as e:
+            self.failed.emit(str(e))
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            self.failed.emit("An error occurred. Please try again.")
+        finally:
+            self.finished.emit()
+
+    def capture(self, source):
+        sr = _speech_recognition()
+        recognizer = sr.Recognizer()
+        recognizer.adjust_for_ambient_noise(source, duration=0.5)
+        threshold = recognizer.energy_threshold
+        chunk_seconds = source.CHUNK / source.SAMPLE_RATE
+        preroll = collections.deque(maxlen=max(1, int(self.PREROLL_SECONDS / chunk_seconds)))
+        frames = []
+        waited = spoken = silence = 0.0
+        while not self.cancelled:
+            chunk = source.stream.read(source.CHUNK)
+            loud = chunk_energy(chunk) > threshold
+            if not frames:
+                if not loud:
+                    preroll.append(chunk)
+                    waited += chunk_seconds
+                    if waited > self.timeout:
+                        return None
+                    continue
+                pending = list(preroll) + [chunk]
+            else:
+                pending = [chunk]
+            silence = 0.0 if loud else silence + chunk_seconds
+            for frame in pending:
+                frames.append(frame)
+                spoken += chunk_seconds
+                text = self.backend.feed(frame)
+                if text:
+                    self.partial.emit(text)
+            if silence > self.PAUSE_SECONDS or spoken > self.phrase_time_limit:
+                break
+        return sr.AudioData(b''.join(frames), source.SAMPLE_RATE, source.SAMPLE_WIDTH)